@@ -7,14 +7,18 @@ import pandas as pd
 import numpy as np
 from flask import current_app
 import logging
+from advanced_pricing import AdvancedMLPricingModel, FEATURE_COLUMNS
+from drift import FeatureDriftMonitor, feature_row
+from streaming_stats import RunningStats
 
 logger = logging.getLogger(__name__)
 
 class AnalyticsService:
     """Advanced analytics service for business intelligence"""
 
-    def __init__(self, data_file='analytics_data.json'):
+    def __init__(self, data_file='analytics_data.json', model_dir='ml_models'):
         self.data_file = data_file
+        self.model_dir = model_dir
         self.analytics_data = self.load_data()
 
     def load_data(self) -> Dict[str, Any]:
@@ -107,19 +111,75 @@ class AnalyticsService:
         self.save_data()
 
     def track_model_performance(self, model_data: Dict[str, Any]):
-        """Track ML model performance"""
-        model_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'model_name': model_data.get('model_name'),
-            'prediction_accuracy': model_data.get('accuracy', 0),
-            'confidence_score': model_data.get('confidence', 0),
-            'input_features': model_data.get('features', {}),
-            'prediction_time': model_data.get('prediction_time', 0)
+        """Fold one prediction into its model's fixed-size summary
+
+        Accuracy, confidence and prediction time are kept as running statistics
+        and the input features as a drift summary against the model's training
+        distribution, so the stored data does not grow with traffic.
+        """
+        model_name = model_data.get('model_name') or 'unknown'
+        summaries = self.analytics_data['model_performance']
+        summary = summaries.get(model_name)
+
+        if not isinstance(summary, dict):
+            # Per-prediction lists from older versions are folded in once and dropped
+            legacy_entries = summary or []
+            summary = self._new_model_summary(model_name, model_data)
+            for entry in legacy_entries:
+                self._fold_model_prediction(summary, {
+                    'accuracy': entry.get('prediction_accuracy'),
+                    'confidence': entry.get('confidence_score'),
+                    'features': entry.get('input_features'),
+                    'prediction_time': entry.get('prediction_time')
+                })
+            summaries[model_name] = summary
+
+        self._fold_model_prediction(summary, model_data)
+        summary['last_prediction_at'] = datetime.now().isoformat()
+        self.save_data()
+
+    def _new_model_summary(self, model_name: str, model_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Empty summary, with drift measured against the model's saved feature profile when there is one"""
+        reference = model_data.get('reference') or self._saved_feature_profile(model_name)
+        columns = list(reference) if reference else list(FEATURE_COLUMNS)
+        return {
+            'predictions': 0,
+            'accuracy': RunningStats().to_state(),
+            'confidence': RunningStats().to_state(),
+            'prediction_time': RunningStats().to_state(),
+            'last_prediction_at': None,
+            'feature_drift': FeatureDriftMonitor(columns, reference, buffer_rows=1).to_state()
         }
 
-        self.analytics_data['model_performance'].setdefault(model_data.get('model_name', 'unknown'), [])
-        self.analytics_data['model_performance'][model_data.get('model_name')].append(model_entry)
-        self.save_data()
+    def _saved_feature_profile(self, model_name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.model_dir, f'{model_name}_metadata.json'), 'r') as f:
+                return json.load(f).get('feature_profile')
+        except (OSError, ValueError):
+            return None
+
+    def _fold_model_prediction(self, summary: Dict[str, Any], model_data: Dict[str, Any]):
+        summary['predictions'] += 1
+        for key in ('accuracy', 'confidence', 'prediction_time'):
+            if model_data.get(key) is not None:
+                summary[key] = RunningStats.from_state(summary[key]).update([model_data[key]]).to_state()
+
+        features = model_data.get('features')
+        if isinstance(features, dict) and features:
+            # The row the model sees, derived features included, rather than the raw request fields
+            row = dict(zip(FEATURE_COLUMNS, AdvancedMLPricingModel.prepare_feature_vector(features)))
+            monitor = FeatureDriftMonitor.from_state(summary['feature_drift'])
+            monitor.observe(feature_row(row, monitor.columns))
+            summary['feature_drift'] = monitor.to_state()
+
+    def get_model_drift(self) -> Dict[str, Any]:
+        """Drift report per tracked model"""
+        return {
+            model_name: dict(FeatureDriftMonitor.from_state(summary['feature_drift']).report(),
+                             predictions=summary['predictions'])
+            for model_name, summary in self.analytics_data['model_performance'].items()
+            if isinstance(summary, dict)
+        }
 
     def update_time_series_data(self, data_type: str, entry: Dict[str, Any]):
         """Update time series data for trends"""
@@ -459,7 +519,7 @@ class AnalyticsService:
             total_quotes = len(quotes)
             avg_value = np.mean([q.get('quote_range', {}).get('median', 0) for q in quotes])
 
-            insights.append(f"Generated {total_quotes} quotes with average value of ${avg_value:.".2f")
+            insights.append(f"Generated {total_quotes} quotes with average value of ${avg_value:.2f}")
 
         if sessions:
             conversion_rate = self.get_user_behavior_analytics().get('conversion_rate', 0)
@@ -474,7 +534,7 @@ class AnalyticsService:
         # Performance insights
         perf_data = self.get_performance_analytics()
         if perf_data.get('average_response_time'):
-            insights.append(f"Average API response time: {perf_data['average_response_time']".3f"}s")
+            insights.append(f"Average API response time: {perf_data['average_response_time']:.3f}s")
 
         return insights
 
@@ -1,7 +1,18 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from geo_pricing import GeoPricingEngine
-from integrations import IntegrationManager, QuickBooksIntegration, JobberIntegration, CRMIntegration
+from startup import StartupTracker
+
+# Track boot stages from the very first import so the breakdown covers Flask too
+startup = StartupTracker()
+
+with startup.stage('import flask'):
+    from flask import Flask, request, jsonify
+    from flask_cors import CORS
+with startup.stage('import app modules'):
+    from geo_pricing import GeoPricingEngine
+    from integrations import IntegrationManager, QuickBooksIntegration, JobberIntegration, CRMIntegration
+    from shared_state import preload_shared_state, process_memory_stats
+    from training_jobs import TrainingJobRunner
+import logging
+import os
 import random
 
 app = Flask(__name__)
@@ -10,6 +21,86 @@ CORS(app)
 # Initialize integration manager
 integration_manager = IntegrationManager()
 
+# Upper bounds on jobs per batch quote request and lines per bill of materials
+MAX_BATCH_JOBS = 10000
+MAX_BOM_LINES = 50000
+
+# Where trained advanced models, their registry and training jobs live, and the basic model's file
+ML_MODEL_DIR = os.environ.get('ML_MODEL_DIR', 'ml_models')
+ML_BASIC_MODEL_FILE = os.environ.get('ML_BASIC_MODEL_FILE', 'pricing_model.pkl')
+
+# Cores a /api/ml/train run may use (unset means all of them); a request can pass 'cores'
+ML_TRAINING_CORES = int(os.environ['ML_TRAINING_CORES']) if os.environ.get('ML_TRAINING_CORES') else None
+
+# Concurrent advanced-model quotes are predicted together once this many rows are queued
+# or the oldest has waited this long; a quote with no others in flight is not held back
+# (ML_BATCH_MAX_ROWS <= 1 disables batching)
+ML_BATCH_MAX_WAIT_MS = float(os.environ.get('ML_BATCH_MAX_WAIT_MS', '2'))
+ML_BATCH_MAX_ROWS = int(os.environ.get('ML_BATCH_MAX_ROWS', '16'))
+
+# Registered model to score in the background on live quotes, alongside the champion
+ML_SHADOW_CHALLENGER = os.environ.get('ML_SHADOW_CHALLENGER')
+ML_SHADOW_SAMPLE_RATE = float(os.environ.get('ML_SHADOW_SAMPLE_RATE', '1'))
+
+# AUTOQUOTER_STARTUP=staged serves requests as soon as the pricing tables are
+# compiled and loads the ML models in the background; /api/ready reports when
+# they are warm. The default ('eager') builds everything before serving.
+STARTUP_MODE = os.environ.get('AUTOQUOTER_STARTUP', 'eager')
+
+# Initialize pricing engine and watch pricing_data.json for changes (0 disables the watcher)
+with startup.stage('pricing engine'):
+    pricing_engine = GeoPricingEngine(
+        lazy_models=(STARTUP_MODE == 'staged'),
+        batch_max_wait_ms=ML_BATCH_MAX_WAIT_MS,
+        batch_max_rows=ML_BATCH_MAX_ROWS,
+        model_dir=ML_MODEL_DIR,
+        basic_model_file=ML_BASIC_MODEL_FILE
+    )
+PRICING_DATA_WATCH_INTERVAL = float(os.environ.get('PRICING_DATA_WATCH_INTERVAL', '5'))
+
+def start_configured_shadow():
+    """Start scoring ML_SHADOW_CHALLENGER, if set, in the process that serves requests
+
+    Not run at import: a spawned child re-imports this module, and the scorer
+    belongs in each serving process. Called from __main__ below and from
+    gunicorn's post_worker_init hook (see gunicorn.conf.py).
+    """
+    if not ML_SHADOW_CHALLENGER:
+        return None
+    try:
+        return pricing_engine.start_shadow(ML_SHADOW_CHALLENGER, ML_SHADOW_SAMPLE_RATE)
+    except ValueError as e:
+        logging.getLogger(__name__).warning(f"Shadow evaluation not started: {e}")
+        return None
+
+# Under a pre-forking server (see gunicorn.conf.py) load shared state once in the
+# master; the watcher thread is then started per worker after fork instead
+if os.environ.get('AUTOQUOTER_SHARED_PRELOAD') == '1':
+    with startup.stage('preload shared state'):
+        preload_shared_state(pricing_engine)
+elif PRICING_DATA_WATCH_INTERVAL > 0:
+    pricing_engine.start_watcher(PRICING_DATA_WATCH_INTERVAL)
+
+# Model training runs in a separate process; finished models are swapped in without a restart
+training_jobs = TrainingJobRunner(ML_MODEL_DIR, on_success=lambda job: pricing_engine.reload_advanced_models())
+
+if STARTUP_MODE != 'staged' or pricing_engine.models_ready:
+    startup.mark_ready()
+elif __name__ != '__main__':
+    # Imported by a WSGI server, which has already bound the listening socket
+    startup.start_warmup(pricing_engine)
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'healthy'})
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: ML models are loaded and warm"""
+    status = startup.status()
+    return jsonify(status), (200 if startup.ready else 503)
+
 @app.route('/api/quote', methods=['POST'])
 def generate_quote():
     data = request.json
@@ -24,9 +115,134 @@ def generate_quote():
         "job_type": job_type,
         "location": location,
         "quote_range": quote_range,
+        "ml_enhanced": quote_range.get("ml_enhanced", False),
         "fair_market_certificate": True
     })
 
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def batch_job_error(job):
+    """Why a batch job can't be priced, or None if its fields have usable types"""
+    if not isinstance(job, dict):
+        return 'must be an object'
+    if not isinstance(job.get('complexity', 'medium'), str):
+        return 'complexity must be a string'
+    square_feet = job.get('square_feet', 1000)
+    if not _is_number(square_feet) or square_feet <= 0:
+        return 'square_feet must be a positive number'
+    materials = job.get('materials') or {}
+    if not isinstance(materials, dict) or not all(_is_number(amount) for amount in materials.values()):
+        return 'materials must map material names to numeric amounts'
+    return None
+
+@app.route('/api/quote/batch', methods=['POST'])
+def generate_batch_quotes():
+    """Generate quotes for a whole backlog of jobs in one request"""
+    data = request.json or {}
+    jobs = data.get('jobs')
+
+    if not isinstance(jobs, list) or not jobs:
+        return jsonify({'error': 'A non-empty list of jobs is required'}), 400
+    if len(jobs) > MAX_BATCH_JOBS:
+        return jsonify({'error': f'At most {MAX_BATCH_JOBS} jobs per batch'}), 400
+    for index, job in enumerate(jobs):
+        error = batch_job_error(job)
+        if error is not None:
+            return jsonify({'error': f'Job {index}: {error}', 'job_index': index}), 400
+
+    try:
+        quote_ranges = pricing_engine.calculate_quotes(jobs)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        "count": len(quote_ranges),
+        "quotes": [
+            {
+                "job_type": job.get('job_type'),
+                "location": job.get('location'),
+                "quote_range": quote_range,
+                "fair_market_certificate": True
+            }
+            for job, quote_range in zip(jobs, quote_ranges)
+        ]
+    })
+
+@app.route('/api/quote/grid', methods=['POST'])
+def generate_price_grid():
+    """Price surface for one job across complexity, square footage and urgency"""
+    data = request.json or {}
+    ranges = data.get('ranges', {})
+
+    try:
+        grid = pricing_engine.calculate_price_grid(
+            data.get('job_type'),
+            data.get('location'),
+            materials=data.get('materials', {}),
+            complexity=ranges.get('complexity', data.get('complexity')),
+            square_feet=ranges.get('square_feet', data.get('square_feet')),
+            urgency=ranges.get('urgency', data.get('urgency'))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+
+    return jsonify(grid)
+
+@app.route('/api/materials/price', methods=['POST'])
+def price_bill_of_materials():
+    """Price a bill of materials against the material catalog"""
+    data = request.json or {}
+    location = data.get('location')
+    items = data.get('items')
+
+    if isinstance(items, dict):
+        items = [{'sku': sku, 'quantity': quantity} for sku, quantity in items.items()]
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'A non-empty list of line items is required'}), 400
+    if len(items) > MAX_BOM_LINES:
+        return jsonify({'error': f'At most {MAX_BOM_LINES} line items per request'}), 400
+    if not all(isinstance(item, dict) and isinstance(item.get('sku'), str) for item in items):
+        return jsonify({'error': 'Each line item needs a string sku'}), 400
+
+    try:
+        bill = pricing_engine.price_materials(location, items)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(bill)
+
+@app.route('/api/pricing/stats', methods=['GET'])
+def get_pricing_stats():
+    """Get compiled pricing table sizes, lookup timings, quote cache and prediction batching counters"""
+    batcher = pricing_engine.micro_batcher
+    return jsonify({
+        'tables': pricing_engine.get_table_stats(),
+        'cache': pricing_engine.quote_cache.stats(),
+        'micro_batching': batcher.stats() if batcher is not None else None,
+        'reload': pricing_engine.reload_stats,
+        'memory': process_memory_stats()
+    })
+
+@app.route('/api/pricing/locations/<location>', methods=['GET'])
+def resolve_pricing_location(location):
+    """Show which pricing region a state code or ZIP code resolves to"""
+    return jsonify(pricing_engine.resolve_location(location))
+
+@app.route('/api/pricing/reload', methods=['POST'])
+def reload_pricing_data():
+    """Reload pricing_data.json and swap in the new pricing tables"""
+    try:
+        result = pricing_engine.reload_data(force=True)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid pricing data: {e}'}), 400
+    except OSError as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(result)
+
 @app.route('/api/dashboard/stats')
 def get_dashboard_stats():
     # Mock data - in real app, this would come from database
@@ -213,21 +429,111 @@ def track_api_call():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def training_summary(results):
+    """Training metrics and timings per model, without the fitted (unserializable) estimators"""
+    return {
+        name: {key: float(value) if value is not None else None
+               for key, value in result.items() if key != 'model'}
+        for name, result in results.items()
+    }
+
 @app.route('/api/ml/train', methods=['POST'])
 def train_ml_models():
-    """Train advanced ML models"""
-    from advanced_pricing import AdvancedMLPricingModel
+    """Queue a background training job for the advanced ML models"""
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'train')
+
+    if mode not in ('train', 'search'):
+        return jsonify({'error': "mode must be 'train' or 'search'"}), 400
+
+    try:
+        # 'search' runs a time-budgeted hyperparameter search instead of the fixed candidates
+        job = training_jobs.submit({
+            'mode': mode,
+            'cores': data.get('cores', ML_TRAINING_CORES),
+            'num_samples': int(data.get('num_samples', 15000)),
+            'time_budget': float(data.get('time_budget', 300))
+        })
+
+        return jsonify({
+            'status': 'queued',
+            'job': job,
+            'status_url': f"/api/ml/jobs/{job['id']}"
+        }), 202
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ml/jobs', methods=['GET'])
+def list_training_jobs():
+    """Get training jobs started by this worker, newest first"""
+    return jsonify({'jobs': training_jobs.recent()})
+
+@app.route('/api/ml/jobs/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """Get a training job's state and progress"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown training job {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/api/ml/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_training_job(job_id):
+    """Cancel a queued or running training job"""
     try:
-        ml_model = AdvancedMLPricingModel()
-        results, best_model = ml_model.train_models()
+        job = training_jobs.cancel(job_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    if job is None:
+        return jsonify({'error': f'Unknown training job {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/api/ml/retrain', methods=['POST'])
+def retrain_ml_models():
+    """Update the trained models with new priced jobs, or queue a full retrain that includes them"""
+    data = request.get_json(silent=True) or {}
+    rows = data.get('rows')
+
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'error': 'rows must be a non-empty list of priced jobs'}), 400
+    if not all(isinstance(row, dict) and 'price' in row for row in rows):
+        return jsonify({'error': 'Every row needs a price'}), 400
+
+    try:
+        import pandas as pd  # Deferred like the models themselves during a staged startup
+
+        model = pricing_engine.advanced_ml_model
+        df = pd.DataFrame(rows)
+
+        if not data.get('incremental', True):
+            # A full retrain takes minutes, so it runs as a training job; the rows are stored for it
+            stored = model.add_training_rows(df)
+            job = training_jobs.submit({
+                'mode': 'train',
+                'cores': data.get('cores', ML_TRAINING_CORES),
+                'num_samples': int(data.get('num_samples', 15000))
+            })
+            return jsonify({
+                'status': 'queued',
+                'rows_stored': stored,
+                'job': job,
+                'status_url': f"/api/ml/jobs/{job['id']}"
+            }), 202
+
+        model.training_rows_from(df)
+        if model.registry.champion is None:
+            return jsonify({'error': 'No trained models to update; train models first or retrain with incremental=false'}), 409
+
+        results, best_model = model.retrain_model(df, incremental=True)
 
         return jsonify({
             'status': 'success',
-            'message': 'ML models trained successfully',
             'best_model': best_model,
-            'results': results
+            'results': training_summary(results)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -258,18 +564,141 @@ def ml_predict():
 @app.route('/api/ml/models', methods=['GET'])
 def get_ml_models():
     """Get available ML models and their performance"""
-    from advanced_pricing import AdvancedMLPricingModel
+    try:
+        performance = pricing_engine.advanced_ml_model.get_model_performance()
+
+        return jsonify({
+            'status': 'success',
+            'models': performance,
+            'champion': pricing_engine.advanced_ml_model.registry.champion
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/registry', methods=['GET'])
+def get_ml_registry():
+    """Get registered model versions and the current champion"""
+    try:
+        registry = pricing_engine.advanced_ml_model.registry
+        registry.refresh()
+
+        return jsonify({
+            'status': 'success',
+            'registry': registry.manifest
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/promote', methods=['POST'])
+def promote_ml_model():
+    """Promote a registered model to champion"""
+    data = request.json or {}
+    model_name = data.get('model')
+
+    if not model_name:
+        return jsonify({'error': 'model is required'}), 400
 
     try:
-        ml_model = AdvancedMLPricingModel()
-        performance = ml_model.get_model_performance()
+        # Bumps the model version, so cached quotes from the old champion are dropped
+        champion = pricing_engine.advanced_ml_model.promote_model(model_name)
+
+        return jsonify({
+            'status': 'success',
+            'champion': champion
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/drift', methods=['GET'])
+def get_ml_drift():
+    """Get per-model feature drift (PSI against the training data) of served and tracked predictions"""
+    from analytics import AnalyticsService
 
+    try:
         return jsonify({
             'status': 'success',
-            'models': performance
+            'models': pricing_engine.drift_report(),
+            'tracked': AnalyticsService(model_dir=ML_MODEL_DIR).get_model_drift()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ml/shadow', methods=['GET'])
+def get_shadow_evaluation():
+    """Get streaming disagreement and error statistics of the shadowed challenger"""
+    shadow = pricing_engine.shadow
+    return jsonify({
+        'status': 'success',
+        'shadow': shadow.stats() if shadow is not None else None
+    })
+
+@app.route('/api/ml/shadow/start', methods=['POST'])
+def start_shadow_evaluation():
+    """Start scoring a registered challenger on live quotes (replaces any running shadow)"""
+    data = request.get_json(silent=True) or {}
+    challenger = data.get('challenger')
+
+    if not challenger:
+        return jsonify({'error': 'challenger is required'}), 400
+
+    try:
+        shadow = pricing_engine.start_shadow(challenger, float(data.get('sample_rate', 1.0)))
+        return jsonify({'status': 'success', 'shadow': shadow.stats()})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ml/shadow/stop', methods=['POST'])
+def stop_shadow_evaluation():
+    """Stop shadow evaluation and return its final statistics"""
+    shadow = pricing_engine.stop_shadow()
+    if shadow is None:
+        return jsonify({'error': 'No shadow evaluation is running'}), 409
+    return jsonify({'status': 'success', 'shadow': shadow.stats()})
+
+@app.route('/api/ml/shadow/outcomes', methods=['POST'])
+def record_shadow_outcomes():
+    """Queue priced jobs to score champion and challenger error against actual prices"""
+    data = request.get_json(silent=True) or {}
+    rows = data.get('rows')
+    shadow = pricing_engine.shadow
+
+    if shadow is None:
+        return jsonify({'error': 'No shadow evaluation is running'}), 409
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'error': 'rows must be a non-empty list of priced jobs'}), 400
+    if not all(isinstance(row, dict) and 'price' in row for row in rows):
+        return jsonify({'error': 'Every row needs a price'}), 400
+
+    try:
+        import pandas as pd
+
+        df = pd.DataFrame(rows)
+        features = pricing_engine.advanced_ml_model.raw_feature_matrix(df)
+        queued = shadow.offer(features, actual_prices=df['price'].to_numpy(dtype=float))
+
+        return jsonify({'status': 'success', 'queued': bool(queued), 'rows': len(rows)}), 202
+    except KeyError as e:
+        return jsonify({'error': f'Missing feature column {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    logging.basicConfig(level=logging.INFO)
+
+    if STARTUP_MODE == 'staged' and not startup.ready:
+        from werkzeug.serving import make_server
+
+        # Bind the socket first, then warm the models while already accepting requests
+        server = make_server('0.0.0.0', 5000, app, threaded=True)
+        start_configured_shadow()
+        startup.start_warmup(pricing_engine)
+        server.serve_forever()
+    else:
+        # Only the reloader's child process serves requests
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_configured_shadow()
+        app.run(debug=True, host='0.0.0.0', port=5000)
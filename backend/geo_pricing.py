@@ -1,21 +1,221 @@
+import hashlib
 import json
 import os
-from pricing_model import MLPricingModel
-from advanced_pricing import AdvancedMLPricingModel
+import threading
+import time
+import numpy as np
+from micro_batcher import MicroBatcher
+from pricing_tables import CompiledPricingTables, validate_pricing_data
+from quote_cache import QuoteCache
+
+COMPLEXITY_FACTORS = {"low": 0.8, "medium": 1.0, "high": 1.5}
+URGENCY_FACTORS = {"normal": 1.0, "rush": 1.3, "emergency": 1.8}
+
+# Upper bound on the number of points scored by one what-if grid
+MAX_GRID_POINTS = 100000
 
 class GeoPricingEngine:
-    def __init__(self, data_file='pricing_data.json'):
+    def __init__(self, data_file='pricing_data.json', cache_size=10000, cache_ttl=300, lazy_models=False,
+                 batch_max_wait_ms=2.0, batch_max_rows=16, model_dir='ml_models', basic_model_file='pricing_model.pkl'):
+        # pricing_model and advanced_pricing pull in pandas and scikit-learn, so
+        # with lazy_models=True they are only imported and built on first use
+        # (or by warm_up), letting the pricing tables come up first
         self.data_file = data_file
-        self.ml_model = MLPricingModel()
-        self.advanced_ml_model = AdvancedMLPricingModel()
+        self.model_dir = model_dir
+        self.basic_model_file = basic_model_file
+        self._ml_model = None
+        self._advanced_ml_model = None
+        self._model_lock = threading.Lock()
+        if not lazy_models:
+            self.ml_model
+            self.advanced_ml_model
+        self.lookup_count = 0
+        self.lookup_seconds = 0.0
+        self.quote_cache = QuoteCache(max_size=cache_size, ttl_seconds=cache_ttl)
+        # Challenger scored on live quotes in the background (see start_shadow)
+        self.shadow = None
+        # Per-model feature drift of served quotes, reset when new models are swapped in
+        self.drift_monitors = {}
+        self._drift_lock = threading.Lock()
+        # Concurrent single quotes share one advanced model call (batch_max_rows <= 1 disables)
+        self.micro_batcher = None
+        if batch_max_rows > 1:
+            self.micro_batcher = MicroBatcher(
+                lambda X, model_type: self.advanced_ml_model.predict_prices(X, model_type),
+                max_wait_ms=batch_max_wait_ms, max_rows=batch_max_rows
+            )
+        self._cached_model_generation = self._model_generation()
+        self._reload_lock = threading.Lock()
+        self._data_signature = None
+        self._data_checksum = None
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+        self.reload_stats = {
+            "reloads": 0,
+            "failures": 0,
+            "last_reload_ms": None,
+            "last_reload_at": None,
+            "last_error": None
+        }
         self.load_data()
 
+    @property
+    def ml_model(self):
+        if self._ml_model is None:
+            with self._model_lock:
+                if self._ml_model is None:
+                    from pricing_model import MLPricingModel
+                    self._ml_model = MLPricingModel(self.basic_model_file)
+        return self._ml_model
+
+    @property
+    def advanced_ml_model(self):
+        if self._advanced_ml_model is None:
+            with self._model_lock:
+                if self._advanced_ml_model is None:
+                    from advanced_pricing import AdvancedMLPricingModel
+                    self._advanced_ml_model = AdvancedMLPricingModel(self.model_dir)
+        return self._advanced_ml_model
+
+    def reload_advanced_models(self, mmap_mode=None):
+        # Load the registry's models into a fresh instance and swap it in with a
+        # single assignment, so in-flight quotes keep the models they started with
+        from advanced_pricing import AdvancedMLPricingModel
+        current = self._advanced_ml_model
+        model = AdvancedMLPricingModel(current.model_dir if current is not None else self.model_dir)
+        model.preload_models(mmap_mode=mmap_mode)
+        with self._model_lock:
+            self._advanced_ml_model = model
+            self.drift_monitors = {}
+        self._check_model_generation()
+        return model
+
+    def refresh_models(self):
+        # Pick up models trained or promoted by another process
+        current = self._advanced_ml_model
+        if current is not None and current.registry.changed_on_disk():
+            self.reload_advanced_models()
+            return True
+        return False
+
+    @property
+    def models_ready(self):
+        return self._ml_model is not None and self._advanced_ml_model is not None
+
+    def warm_up(self, startup=None, mmap_mode=None):
+        # Build both models and load any saved advanced models so the first
+        # quote does not pay for it; each step is timed when a tracker is given
+        steps = [
+            ("load basic model", lambda: self.ml_model),
+            ("load advanced models", lambda: self.advanced_ml_model.preload_models(mmap_mode=mmap_mode))
+        ]
+        for name, step in steps:
+            if startup is None:
+                step()
+            else:
+                with startup.stage(name):
+                    step()
+
+    @property
+    def pricing_data(self):
+        return self.tables.pricing_data
+
+    @pricing_data.setter
+    def pricing_data(self, pricing_data):
+        validate_pricing_data(pricing_data)
+        self._swap_tables(CompiledPricingTables(pricing_data))
+
+    def _swap_tables(self, tables):
+        # A single attribute assignment, so in-flight quotes (which read
+        # self.tables once) never see a half-updated table
+        self.tables = tables
+        self.quote_cache.clear()
+
     def load_data(self):
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                self.pricing_data = json.load(f)
-        else:
-            self.pricing_data = self.get_default_data()
+        with self._reload_lock:
+            if os.path.exists(self.data_file):
+                signature, checksum, pricing_data = self._read_data_file()
+                self.pricing_data = pricing_data
+                self._data_signature, self._data_checksum = signature, checksum
+            else:
+                self.pricing_data = self.get_default_data()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read_data_file(self):
+        signature = self._file_signature()
+        with open(self.data_file, 'rb') as f:
+            raw = f.read()
+        return signature, hashlib.sha256(raw).hexdigest(), json.loads(raw)
+
+    def reload_data(self, force=False):
+        # Parse, validate and compile the data file into fresh tables, then swap
+        # them in. Cheap mtime/size and checksum checks skip unchanged files.
+        with self._reload_lock:
+            signature = self._file_signature()
+            if signature is None:
+                return {"reloaded": False, "reason": "data file not found"}
+            if not force and signature == self._data_signature:
+                return {"reloaded": False, "reason": "unchanged"}
+
+            start = time.perf_counter()
+            try:
+                signature, checksum, pricing_data = self._read_data_file()
+                # Remember the signature even if the file is invalid so a broken
+                # file is reported once rather than on every watcher tick
+                self._data_signature = signature
+                if not force and checksum == self._data_checksum:
+                    return {"reloaded": False, "reason": "unchanged"}
+                validate_pricing_data(pricing_data)
+                tables = CompiledPricingTables(pricing_data)
+            except (OSError, ValueError) as e:
+                self.reload_stats["failures"] += 1
+                self.reload_stats["last_error"] = str(e)
+                raise
+
+            self._swap_tables(tables)
+            self._data_checksum = checksum
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+            self.reload_stats["reloads"] += 1
+            self.reload_stats["last_reload_ms"] = elapsed_ms
+            self.reload_stats["last_reload_at"] = time.time()
+            self.reload_stats["last_error"] = None
+
+            return {"reloaded": True, "duration_ms": elapsed_ms, "checksum": checksum}
+
+    def start_watcher(self, interval=5.0):
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_data_file, args=(interval,), name="pricing-data-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._watcher_stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch_data_file(self, interval):
+        while not self._watcher_stop.wait(interval):
+            try:
+                result = self.reload_data()
+                if result["reloaded"]:
+                    print(f"Reloaded pricing data in {result['duration_ms']}ms")
+            except (OSError, ValueError) as e:
+                print(f"Pricing data reload failed: {e}, keeping current tables")
+            try:
+                if self.refresh_models():
+                    print("Reloaded ML models after a registry change")
+            except Exception as e:
+                print(f"ML model reload failed: {e}, keeping current models")
 
     def get_default_data(self):
         return {
@@ -36,26 +236,57 @@ class GeoPricingEngine:
         }
 
     def calculate_quote(self, job_type, location, complexity="medium", materials=None, square_feet=1000, use_advanced_ml=True):
-        if location not in self.pricing_data["wage_indexes"]:
-            location = "default"
+        if self.micro_batcher is None:
+            return self._calculate_quote(job_type, location, complexity, materials, square_feet, use_advanced_ml)
+        # Announced for the whole quote, so a batch being collected waits for this one's row
+        with self.micro_batcher.expecting():
+            return self._calculate_quote(job_type, location, complexity, materials, square_feet, use_advanced_ml)
 
-        wage_index = self.pricing_data["wage_indexes"].get(location, 1.0)
-        labor_rate = self.pricing_data["labor_rates"][job_type].get(location, 100)
+    def _calculate_quote(self, job_type, location, complexity, materials, square_feet, use_advanced_ml):
+        tables = self.tables
 
-        base_cost = labor_rate * 2  # Example: 2 hours of labor
+        lookup_start = time.perf_counter()
+        job_type_id = tables.job_type_ids[job_type]
+        location_id = tables.location_id(location)
+        if materials:
+            material_ids = tables.material_ids_for(materials.keys(), len(materials))
+            amounts = np.fromiter(materials.values(), dtype=float, count=len(materials))
+        self._record_lookups(1, time.perf_counter() - lookup_start)
 
-        if complexity == "high":
-            base_cost *= 1.5
-        elif complexity == "low":
-            base_cost *= 0.8
+        complexity_factor = COMPLEXITY_FACTORS.get(complexity, 1.0)
+
+        # Requests that resolve to the same ids and amounts price identically,
+        # so the cache key is built from the interned ids rather than raw input
+        self._check_model_generation()
+        cache_key = (
+            job_type_id,
+            location_id,
+            complexity_factor,
+            tuple(sorted(zip(material_ids.tolist(), amounts.tolist()))) if materials else (),
+            float(square_feet),
+            bool(use_advanced_ml)
+        )
+        cached = self.quote_cache.get(cache_key)
+        if cached is not None:
+            cached_quote, observation = cached
+            # Repeated quotes are traffic too, so drift monitoring and the shadow still see them
+            if observation is not None:
+                self._observe_predictions(*observation)
+            return dict(cached_quote)
+
+        wage_index = float(tables.wage_index[location_id])
+        labor_rate = float(tables.labor_rates_at(job_type_id, location_id))
 
         material_cost = 0
         if materials:
-            for material, amount in materials.items():
-                cost = self.pricing_data["material_costs"].get(material, {}).get(location, 1.0)
-                material_cost += cost * amount
+            material_cost = float(tables.material_costs_at(material_ids, location_id) @ amounts)
+
+        base_cost = labor_rate * 2  # Example: 2 hours of labor
+        base_cost *= complexity_factor
 
         total_cost = base_cost + material_cost
+        quote = None
+        observation = None
 
         if use_advanced_ml:
             # Use advanced ML model for enhanced prediction
@@ -64,15 +295,15 @@ class GeoPricingEngine:
                 'materials_cost': material_cost,
                 'labor_hours': base_cost / labor_rate,
                 'location_multiplier': wage_index,
-                'complexity_multiplier': 1 if complexity == "medium" else (1.5 if complexity == "high" else 0.8),
+                'complexity_multiplier': complexity_factor,
                 'season_multiplier': 1.0,  # Default
                 'urgency_multiplier': 1.0,  # Default
                 'year_trend': 0.1  # Default
             }
 
             try:
-                advanced_prediction = self.advanced_ml_model.predict_price(features)
-                return {
+                advanced_prediction, observation = self._predict_advanced(features)
+                quote = {
                     "low": advanced_prediction['low_estimate'],
                     "median": advanced_prediction['predicted_price'],
                     "high": advanced_prediction['high_estimate'],
@@ -83,23 +314,315 @@ class GeoPricingEngine:
             except Exception as e:
                 print(f"Advanced ML prediction failed: {e}, falling back to basic model")
 
-        # Fallback to basic ML model
-        complexity_factor = 1 if complexity == "medium" else (1.5 if complexity == "high" else 0.8)
-        location_factor = wage_index
-        ml_prediction = self.ml_model.predict_price(complexity_factor, location_factor, material_cost)
+        if quote is None:
+            # Fallback to basic ML model
+            location_factor = wage_index
+            ml_prediction = self.ml_model.predict_price(complexity_factor, location_factor, material_cost)
+
+            # Combine traditional calculation with ML prediction
+            final_low = (total_cost * 0.8 + ml_prediction["low"]) / 2
+            final_median = (total_cost + ml_prediction["median"]) / 2
+            final_high = (total_cost * 1.2 + ml_prediction["high"]) / 2
+
+            quote = {
+                "low": round(final_low, 2),
+                "median": round(final_median, 2),
+                "high": round(final_high, 2),
+                "ml_enhanced": True
+            }
+
+        # Skip caching if the tables were swapped while this quote was computed
+        if tables is self.tables:
+            self.quote_cache.put(cache_key, (quote, observation))
+        return dict(quote)
+
+    def _predict_advanced(self, features):
+        # Returns the prediction and the (row, predictions) it was observed with, replayed on cache hits
+        model = self.advanced_ml_model
+        feature_vector = model.prepare_feature_vector(features)
+        if self.micro_batcher is not None:
+            predictions = self.micro_batcher.submit(feature_vector, key='best')
+        else:
+            predictions = model.predict_prices(feature_vector[np.newaxis, :])
+        self._observe_predictions(feature_vector, predictions)
+        return {
+            name: float(value[0]) if isinstance(value, np.ndarray) else value
+            for name, value in predictions.items()
+        }, (feature_vector, predictions)
+
+    def _observe_predictions(self, rows, predictions):
+        # Feature rows the advanced model just priced feed drift monitoring and any shadow challenger
+        # Monitoring problems are logged, never allowed to change the quote
+        model_name = predictions['model_used']
+        try:
+            monitor = self.drift_monitors.get(model_name)
+            if monitor is None:
+                monitor = self._drift_monitor(model_name)
+            monitor.observe(rows)
+
+            shadow = self.shadow
+            if shadow is not None:
+                shadow.offer(rows, predictions['predicted_price'], model_name)
+        except Exception as e:
+            print(f"Prediction monitoring failed: {e}")
+
+    def _drift_monitor(self, model_name):
+        from advanced_pricing import FEATURE_COLUMNS
+        from drift import FeatureDriftMonitor
+        with self._drift_lock:
+            monitor = self.drift_monitors.get(model_name)
+            if monitor is None:
+                reference = self.advanced_ml_model.feature_profile(model_name)
+                monitor = FeatureDriftMonitor(FEATURE_COLUMNS, reference)
+                self.drift_monitors[model_name] = monitor
+        return monitor
+
+    def drift_report(self):
+        # Drift of the features each model has scored in this process, against its training data
+        return {name: monitor.report() for name, monitor in list(self.drift_monitors.items())}
+
+    def start_shadow(self, challenger, sample_rate=1.0):
+        # Score a registered challenger on live quotes in a background process;
+        # the champion keeps answering and each quote only adds a queue put
+        from shadow_evaluation import ShadowEvaluator
+        if self.advanced_ml_model.registry.get(challenger) is None:
+            raise ValueError(f"Model {challenger} is not registered")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
 
-        # Combine traditional calculation with ML prediction
-        final_low = (total_cost * 0.8 + ml_prediction["low"]) / 2
-        final_median = (total_cost + ml_prediction["median"]) / 2
-        final_high = (total_cost * 1.2 + ml_prediction["high"]) / 2
+        shadow = ShadowEvaluator(self.advanced_ml_model.model_dir, challenger, sample_rate=sample_rate)
+        previous, self.shadow = self.shadow, shadow
+        if previous is not None:
+            previous.stop()
+        return shadow
 
+    def stop_shadow(self):
+        shadow, self.shadow = self.shadow, None
+        if shadow is not None:
+            shadow.stop()
+        return shadow
+
+    def calculate_quotes(self, jobs, use_advanced_ml=True):
+        # Batch version of calculate_quote: every job is resolved to integer ids
+        # once, then labor, complexity, materials and the ML adjustment are
+        # computed for the whole batch with array indexing and a single model
+        # predict call.
+        if not jobs:
+            return []
+
+        tables = self.tables
+        count = len(jobs)
+
+        lookup_start = time.perf_counter()
+        job_type_ids = tables.job_type_ids_for((job.get("job_type") for job in jobs), count)
+        location_ids = tables.location_ids_for((job.get("location") for job in jobs), count)
+        wage_index = tables.wage_index[location_ids]
+        labor_rate = tables.labor_rates_at(job_type_ids, location_ids)
+
+        # Flatten every (job, material) line into parallel arrays and sum per job
+        line_rows, line_materials, line_amounts = [], [], []
+        for row, job in enumerate(jobs):
+            for material, amount in (job.get("materials") or {}).items():
+                line_rows.append(row)
+                line_materials.append(material)
+                line_amounts.append(amount)
+        line_rows = np.array(line_rows, dtype=np.intp)
+        line_material_ids = tables.material_ids_for(line_materials, len(line_materials))
+        line_costs = tables.material_costs_at(line_material_ids, location_ids[line_rows])
+        material_cost = np.bincount(
+            line_rows,
+            weights=line_costs * np.array(line_amounts, dtype=float),
+            minlength=count
+        )
+        self._record_lookups(count, time.perf_counter() - lookup_start)
+
+        complexity_factor = np.array([COMPLEXITY_FACTORS.get(job.get("complexity", "medium"), 1.0) for job in jobs])
+        square_feet = np.array([job.get("square_feet", 1000) for job in jobs], dtype=float)
+
+        base_cost = labor_rate * 2 * complexity_factor
+        total_cost = base_cost + material_cost
+
+        if use_advanced_ml:
+            features = {
+                'square_feet': square_feet,
+                'materials_cost': material_cost,
+                'labor_hours': base_cost / labor_rate,
+                'location_multiplier': wage_index,
+                'complexity_multiplier': complexity_factor,
+                'season_multiplier': 1.0,
+                'urgency_multiplier': 1.0,
+                'year_trend': 0.1
+            }
+
+            try:
+                feature_matrix = self.advanced_ml_model.prepare_feature_matrix(features)
+                predictions = self.advanced_ml_model.predict_prices(feature_matrix)
+                self._observe_predictions(feature_matrix, predictions)
+                return [
+                    {
+                        "low": low,
+                        "median": median,
+                        "high": high,
+                        "ml_enhanced": True,
+                        "confidence_score": confidence,
+                        "model_used": predictions['model_used']
+                    }
+                    for low, median, high, confidence in zip(
+                        predictions['low_estimate'].tolist(),
+                        predictions['predicted_price'].tolist(),
+                        predictions['high_estimate'].tolist(),
+                        predictions['confidence_score'].tolist()
+                    )
+                ]
+            except Exception as e:
+                print(f"Advanced ML batch prediction failed: {e}, falling back to basic model")
+
+        ml_prediction = self.ml_model.predict_prices(complexity_factor, wage_index, material_cost)
+
+        final_low = np.round((total_cost * 0.8 + ml_prediction["low"]) / 2, 2)
+        final_median = np.round((total_cost + ml_prediction["median"]) / 2, 2)
+        final_high = np.round((total_cost * 1.2 + ml_prediction["high"]) / 2, 2)
+
+        return [
+            {"low": low, "median": median, "high": high, "ml_enhanced": True}
+            for low, median, high in zip(final_low.tolist(), final_median.tolist(), final_high.tolist())
+        ]
+
+    def calculate_price_grid(self, job_type, location, materials=None, complexity=None,
+                             square_feet=None, urgency=None, model_type='best'):
+        # What-if surface for one base job: every combination of the complexity,
+        # square_feet and urgency axes is built into one feature matrix and scored
+        # with a single AdvancedMLPricingModel predict call
+        tables = self.tables
+        if job_type not in tables.job_type_ids:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        complexity_axis = self._grid_axis(complexity, COMPLEXITY_FACTORS, "complexity", default=1.0)
+        square_feet_axis = self._grid_axis(square_feet, None, "square_feet", default=1000.0)
+        urgency_axis = self._grid_axis(urgency, URGENCY_FACTORS, "urgency", default=1.0)
+        shape = (len(complexity_axis), len(square_feet_axis), len(urgency_axis))
+        if np.prod(shape) > MAX_GRID_POINTS:
+            raise ValueError(f"Grid has {int(np.prod(shape))} points, at most {MAX_GRID_POINTS} allowed")
+
+        location_id = tables.location_id(location)
+        material_cost = 0.0
+        if materials:
+            material_ids = tables.material_ids_for(materials.keys(), len(materials))
+            amounts = np.fromiter(materials.values(), dtype=float, count=len(materials))
+            material_cost = float(tables.material_costs_at(material_ids, location_id) @ amounts)
+
+        complexity_grid, square_feet_grid, urgency_grid = np.meshgrid(
+            complexity_axis, square_feet_axis, urgency_axis, indexing="ij"
+        )
+        features = {
+            'square_feet': square_feet_grid.ravel(),
+            'materials_cost': material_cost,
+            'labor_hours': 2 * complexity_grid.ravel(),
+            'location_multiplier': float(tables.wage_index[location_id]),
+            'complexity_multiplier': complexity_grid.ravel(),
+            'season_multiplier': 1.0,
+            'urgency_multiplier': urgency_grid.ravel(),
+            'year_trend': 0.1
+        }
+
+        try:
+            feature_matrix = self.advanced_ml_model.prepare_feature_matrix(features)
+            predictions = self.advanced_ml_model.predict_prices(feature_matrix, model_type=model_type)
+        except Exception as e:
+            raise RuntimeError(f"Advanced ML prediction failed: {e}") from e
+
+        return {
+            "job_type": job_type,
+            "location": location,
+            "axes": {
+                "complexity": complexity_axis.tolist(),
+                "square_feet": square_feet_axis.tolist(),
+                "urgency": urgency_axis.tolist()
+            },
+            "shape": list(shape),
+            "low": predictions['low_estimate'].reshape(shape).tolist(),
+            "median": predictions['predicted_price'].reshape(shape).tolist(),
+            "high": predictions['high_estimate'].reshape(shape).tolist(),
+            "model_used": predictions['model_used']
+        }
+
+    def _grid_axis(self, spec, named_values, name, default):
+        # An axis is a single value, a list of values, or {"start", "stop", "num"|"step"};
+        # named values (e.g. "high", "rush") map through named_values
+        if spec is None:
+            return np.array([default])
+        if isinstance(spec, dict):
+            try:
+                start, stop = float(spec["start"]), float(spec["stop"])
+                if "step" in spec:
+                    values = np.arange(start, stop + float(spec["step"]) / 2, float(spec["step"]))
+                else:
+                    values = np.linspace(start, stop, int(spec.get("num", 10)))
+            except (KeyError, TypeError, ValueError, ZeroDivisionError):
+                raise ValueError(f"{name} range needs numeric start, stop and num or step")
+        else:
+            values = []
+            for value in (spec if isinstance(spec, list) else [spec]):
+                if named_values is not None and value in named_values:
+                    value = named_values[value]
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    raise ValueError(f"Invalid {name} value: {value!r}")
+                values.append(value)
+            values = np.array(values, dtype=float)
+
+        if values.size == 0 or values.size > MAX_GRID_POINTS or not np.all(np.isfinite(values)) or np.any(values <= 0):
+            raise ValueError(f"{name} values must be a non-empty set of positive numbers")
+        return values
+
+    def price_materials(self, location, line_items):
+        # line_items is either {sku: quantity} or a list of {"sku", "quantity"} lines
+        if isinstance(line_items, dict):
+            skus, quantities = list(line_items), list(line_items.values())
+        else:
+            skus = [item["sku"] for item in line_items]
+            quantities = [item.get("quantity", 1) for item in line_items]
+
+        bill = self.tables.price_bill_of_materials(location, skus, quantities)
+        bill["location"] = location
+        return bill
+
+    def resolve_location(self, location):
+        tables = self.tables
+        location_id, match = tables.resolve_location(location)
         return {
-            "low": round(final_low, 2),
-            "median": round(final_median, 2),
-            "high": round(final_high, 2),
-            "ml_enhanced": True
+            "location": location,
+            "resolved_to": tables.locations[location_id],
+            "match": match,
+            "wage_index": float(tables.wage_index[location_id]),
+            "material_index": float(tables.material_multiplier[location_id])
         }
 
+    def _model_generation(self):
+        advanced = self._advanced_ml_model
+        return (
+            self._ml_model.version if self._ml_model is not None else 0,
+            id(advanced),
+            advanced.version if advanced is not None else 0
+        )
+
+    def _check_model_generation(self):
+        # Cached quotes embed model output, so any retrain or model swap drops them
+        generation = self._model_generation()
+        if generation != self._cached_model_generation:
+            self._cached_model_generation = generation
+            self.quote_cache.clear()
+
+    def _record_lookups(self, count, seconds):
+        self.lookup_count += count
+        self.lookup_seconds += seconds
+
+    def get_table_stats(self):
+        stats = self.tables.describe()
+        stats["lookups"] = self.lookup_count
+        stats["lookup_seconds"] = round(self.lookup_seconds, 6)
+        stats["avg_lookup_us"] = round(self.lookup_seconds / self.lookup_count * 1e6, 3) if self.lookup_count else 0.0
+        return stats
+
     def save_data(self):
         with open(self.data_file, 'w') as f:
             json.dump(self.pricing_data, f, indent=4)
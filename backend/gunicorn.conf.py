@@ -0,0 +1,29 @@
+# Gunicorn configuration for running AutoQuoter with pre-forked workers.
+#
+# The app is imported once in the master (preload_app) with shared preloading
+# enabled, so pricing tables and model arrays are loaded a single time and
+# shared copy-on-write by every worker instead of being loaded per worker.
+import os
+
+os.environ.setdefault('AUTOQUOTER_SHARED_PRELOAD', '1')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+threads = int(os.environ.get('GUNICORN_THREADS', '2'))
+preload_app = True
+timeout = 120
+
+
+def post_fork(server, worker):
+    # Threads do not survive fork, so each worker runs its own pricing data watcher
+    from app import pricing_engine, PRICING_DATA_WATCH_INTERVAL
+
+    if PRICING_DATA_WATCH_INTERVAL > 0:
+        pricing_engine.start_watcher(PRICING_DATA_WATCH_INTERVAL)
+
+
+def post_worker_init(worker):
+    # Each worker scores the shadow challenger in a process of its own
+    from app import start_configured_shadow
+
+    start_configured_shadow()
@@ -0,0 +1,84 @@
+import numpy as np
+from typing import Dict, Any, List, Sequence
+
+DEFAULT_UNIT = "unit"
+
+
+class MaterialCatalog:
+    """Material SKUs interned to integer ids with per-location unit prices in one array.
+
+    Entries come from the legacy "material_costs" section (the material name is
+    the SKU) and the optional "material_catalog" section, which adds a display
+    name, a unit and a default price per SKU. Row ``unknown_id`` holds the flat
+    fallback price used for SKUs that are not in the catalog.
+    """
+
+    def __init__(self, pricing_data: Dict[str, Any], locations: Sequence[str], fallback_price: float):
+        entries = {
+            material: {"name": material, "unit": DEFAULT_UNIT, "prices": prices}
+            for material, prices in pricing_data["material_costs"].items()
+        }
+        entries.update(pricing_data.get("material_catalog") or {})
+
+        self.skus = list(entries)
+        self.sku_ids = {sku: i for i, sku in enumerate(self.skus)}
+        self.unknown_id = len(self.skus)
+        self.names = [entry.get("name", sku) for sku, entry in entries.items()]
+        self.units = [entry.get("unit", DEFAULT_UNIT) for entry in entries.values()]
+
+        self.prices = np.array(
+            [[entry["prices"].get(location, entry.get("default_price", fallback_price)) for location in locations]
+             for entry in entries.values()] + [[fallback_price] * len(locations)],
+            dtype=float
+        )
+        self.prices.flags.writeable = False
+
+    def __len__(self):
+        return len(self.skus)
+
+    def sku_ids_for(self, skus: Sequence) -> np.ndarray:
+        ids, unknown_id = self.sku_ids, self.unknown_id
+        return np.fromiter((ids.get(sku, unknown_id) for sku in skus), dtype=np.intp, count=len(skus))
+
+    def price_bill(self, skus: Sequence, quantities: Sequence, base_location_id: int, multiplier: float = 1.0) -> Dict[str, Any]:
+        """Price a bill of materials at one location with a single dot product.
+
+        SKUs missing from the catalog are left out of the total and reported back
+        instead of being priced at the flat fallback.
+        """
+        try:
+            quantities = np.asarray(quantities, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError("Quantities must be numbers")
+        if quantities.shape != (len(skus),):
+            raise ValueError("Each line item needs exactly one quantity")
+        if np.any(~np.isfinite(quantities)) or np.any(quantities < 0):
+            raise ValueError("Quantities must be finite, non-negative numbers")
+
+        sku_ids = self.sku_ids_for(skus)
+        known = sku_ids != self.unknown_id
+        unit_prices = np.where(known, self.prices[sku_ids, base_location_id] * multiplier, 0.0)
+        extended = unit_prices * quantities
+        total = float(unit_prices @ quantities)
+
+        lines: List[Dict[str, Any]] = []
+        for sku, sku_id, is_known, quantity, unit_price, line_total in zip(
+            skus, sku_ids.tolist(), known.tolist(), quantities.tolist(),
+            np.round(unit_prices, 4).tolist(), np.round(extended, 2).tolist()
+        ):
+            if is_known:
+                lines.append({
+                    "sku": sku,
+                    "name": self.names[sku_id],
+                    "unit": self.units[sku_id],
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "line_total": line_total
+                })
+
+        return {
+            "total": round(total, 2),
+            "line_count": int(known.sum()),
+            "lines": lines,
+            "unknown_skus": [sku for sku, is_known in zip(skus, known.tolist()) if not is_known]
+        }
@@ -0,0 +1,236 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Hashable, List, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+LATENCY_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    """Fixed-bucket histogram; each bucket counts observations <= its bound"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def _labels(self) -> List[str]:
+        return [f'<={bound:g}' for bound in self.bounds] + [f'>{self.bounds[-1]:g}']
+
+    def quantile(self, q: float) -> str:
+        """Label of the bucket holding the q-th observation, e.g. '<=5'"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for label, count in zip(self._labels(), self.counts):
+            seen += count
+            if seen >= rank:
+                return label
+        return self._labels()[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'buckets': dict(zip(self._labels(), self.counts)),
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else None
+        }
+
+
+class _Request:
+    __slots__ = ('rows', 'key', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, rows: np.ndarray, key: Hashable):
+        self.rows = rows
+        self.key = key
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent small prediction calls into one vectorized call.
+
+    Callers ``submit`` a few rows and block. A worker thread takes every
+    waiting request (up to ``max_rows`` rows), calls ``predict_batch(X, key)``
+    once per key on the stacked rows and hands every caller its own slice of
+    the result. Array values with one entry per row are sliced; anything else
+    (e.g. the model name) is passed through.
+
+    While other callers are on their way in (inside ``submit``, or announced
+    with ``expecting`` for the whole of a request), the worker holds the batch
+    open until ``max_rows`` rows are queued or the oldest request has waited
+    ``max_wait_ms``. With no one else in flight it predicts immediately, so a
+    lone request does not pay the window.
+    """
+
+    def __init__(self, predict_batch: Callable[[np.ndarray, Hashable], Dict[str, Any]],
+                 max_wait_ms: float = 2.0, max_rows: int = 64):
+        self.predict_batch = predict_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_rows = max(1, max_rows)
+        self.batch_sizes = Histogram([b for b in BATCH_SIZE_BUCKETS if b < self.max_rows] + [self.max_rows])
+        self.queue_depths = Histogram(BATCH_SIZE_BUCKETS)
+        self.latencies_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._start_state()
+
+    def _start_state(self):
+        # Threads do not survive fork, so a forked worker starts its own queue and thread
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._pending_rows = 0
+        self._arriving = 0
+        self._thread = None
+
+    @contextmanager
+    def expecting(self):
+        """Count the calling thread as on its way in until it submits rows or leaves the block"""
+        if self._pid != os.getpid():
+            self._start_state()
+        with self._cond:
+            self._arriving += 1
+        self._local.expecting = True
+        try:
+            yield
+        finally:
+            if self._local.expecting:
+                # Left without submitting (e.g. a cached quote); stop holding batches open for it
+                self._local.expecting = False
+                with self._cond:
+                    self._arriving -= 1
+                    self._cond.notify()
+
+    @property
+    def queue_depth(self) -> int:
+        """Rows currently waiting to be batched"""
+        return self._pending_rows
+
+    def submit(self, rows: np.ndarray, key: Hashable = None, timeout: float = None) -> Dict[str, Any]:
+        """Queue rows for prediction and wait for their share of the batch result"""
+        if self._pid != os.getpid():
+            self._start_state()
+
+        # Inside expecting() this thread is already counted as arriving
+        if not getattr(self._local, 'expecting', False):
+            with self._cond:
+                self._arriving += 1
+        self._local.expecting = False
+        try:
+            request = _Request(np.atleast_2d(np.asarray(rows, dtype=float)), key)
+        except Exception:
+            with self._cond:
+                self._arriving -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._arriving -= 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            self._pending_rows += len(request.rows)
+            depth = self._pending_rows
+            self._cond.notify()
+
+        if not request.done.wait(timeout):
+            raise TimeoutError(f"Prediction not batched within {timeout}s")
+
+        with self._stats_lock:
+            self.requests += 1
+            self.queue_depths.observe(depth)
+            self.latencies_ms.observe((time.perf_counter() - request.enqueued_at) * 1000)
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                deadline = self._pending[0].enqueued_at + self.max_wait
+                while self._arriving and self._pending_rows < self.max_rows:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch, rows = [], 0
+                while self._pending and (not batch or rows + len(self._pending[0].rows) <= self.max_rows):
+                    request = self._pending.popleft()
+                    batch.append(request)
+                    rows += len(request.rows)
+                self._pending_rows -= rows
+
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.key, []).append(request)
+            for key, requests in groups.items():
+                self._predict(key, requests)
+
+    def _predict(self, key: Hashable, requests: List[_Request]):
+        X = np.vstack([request.rows for request in requests])
+        try:
+            result = self.predict_batch(X, key)
+        except Exception as e:
+            logger.error(f"Batched prediction of {len(X)} rows failed: {e}")
+            with self._stats_lock:
+                self.errors += 1
+            for request in requests:
+                request.error = e
+                request.done.set()
+            return
+
+        with self._stats_lock:
+            self.batches += 1
+            self.batch_sizes.observe(len(X))
+
+        start = 0
+        for request in requests:
+            stop = start + len(request.rows)
+            request.result = {
+                name: value[start:stop] if isinstance(value, np.ndarray) and value.shape[:1] == (len(X),) else value
+                for name, value in result.items()
+            }
+            start = stop
+            request.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'max_wait_ms': self.max_wait * 1000,
+                'max_rows': self.max_rows,
+                'queue_depth': self.queue_depth,
+                'requests': self.requests,
+                'batches': self.batches,
+                'errors': self.errors,
+                'batch_size': self.batch_sizes.snapshot(),
+                'queue_depth_at_submit': self.queue_depths.snapshot(),
+                'latency_ms': dict(self.latencies_ms.snapshot(),
+                                   p50=self.latencies_ms.quantile(0.5),
+                                   p99=self.latencies_ms.quantile(0.99))
+            }
@@ -0,0 +1,229 @@
+import time
+import numpy as np
+from typing import Dict, Any, Iterable, Tuple
+from material_catalog import MaterialCatalog
+from zip_index import ZipRegionIndex, parse_zip
+
+DEFAULT_LOCATION = "default"
+DEFAULT_WAGE_INDEX = 1.0
+DEFAULT_LABOR_RATE = 100.0
+DEFAULT_MATERIAL_COST = 1.0
+
+REQUIRED_SECTIONS = ("wage_indexes", "material_costs", "labor_rates")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_pricing_data(pricing_data: Dict[str, Any]):
+    """Raise ValueError if pricing_data cannot be compiled into pricing tables"""
+    if not isinstance(pricing_data, dict):
+        raise ValueError("Pricing data must be a JSON object")
+
+    for section in REQUIRED_SECTIONS:
+        if not isinstance(pricing_data.get(section), dict):
+            raise ValueError(f"Pricing data section '{section}' is missing or not an object")
+
+    for location, wage_index in pricing_data["wage_indexes"].items():
+        if not _is_number(wage_index) or wage_index <= 0:
+            raise ValueError(f"Wage index for '{location}' must be a positive number")
+
+    for section in ("labor_rates", "material_costs"):
+        for name, by_location in pricing_data[section].items():
+            if not isinstance(by_location, dict):
+                raise ValueError(f"{section}['{name}'] must map locations to prices")
+            for location, price in by_location.items():
+                if not _is_number(price) or price < 0:
+                    raise ValueError(f"{section}['{name}']['{location}'] must be a non-negative number")
+
+    if "material_catalog" in pricing_data:
+        _validate_material_catalog(pricing_data["material_catalog"], pricing_data["material_costs"])
+
+    if "zip_regions" in pricing_data:
+        _validate_zip_regions(pricing_data["zip_regions"], pricing_data["wage_indexes"])
+
+
+def _validate_material_catalog(material_catalog, material_costs):
+    if not isinstance(material_catalog, dict):
+        raise ValueError("Pricing data section 'material_catalog' must be an object")
+
+    for sku, entry in material_catalog.items():
+        if sku in material_costs:
+            raise ValueError(f"SKU '{sku}' is defined in both material_costs and material_catalog")
+        if not isinstance(entry, dict) or not isinstance(entry.get("prices"), dict):
+            raise ValueError(f"material_catalog['{sku}'] needs a 'prices' object")
+        if not isinstance(entry.get("unit", ""), str):
+            raise ValueError(f"material_catalog['{sku}'] unit must be a string")
+        default_price = entry.get("default_price", 0)
+        if not _is_number(default_price) or default_price < 0:
+            raise ValueError(f"material_catalog['{sku}'] default_price must be a non-negative number")
+        for location, price in entry["prices"].items():
+            if not _is_number(price) or price < 0:
+                raise ValueError(f"material_catalog['{sku}']['{location}'] must be a non-negative number")
+
+
+def _validate_zip_regions(zip_regions, wage_indexes):
+    if not isinstance(zip_regions, dict):
+        raise ValueError("Pricing data section 'zip_regions' must be an object")
+    regions = zip_regions.get("regions")
+    zips = zip_regions.get("zips")
+    if not isinstance(regions, dict) or not isinstance(zips, dict):
+        raise ValueError("zip_regions needs 'regions' and 'zips' objects")
+
+    for name, region in regions.items():
+        if name in wage_indexes or name == DEFAULT_LOCATION:
+            raise ValueError(f"Region '{name}' clashes with a location in wage_indexes")
+        if not isinstance(region, dict):
+            raise ValueError(f"Region '{name}' must be an object")
+        for key in ("wage_index", "material_index"):
+            value = region.get(key, 1.0)
+            if not _is_number(value) or value <= 0:
+                raise ValueError(f"Region '{name}' {key} must be a positive number")
+
+    for zip_code, region in zips.items():
+        if parse_zip(zip_code) is None:
+            raise ValueError(f"'{zip_code}' is not a 5-digit ZIP code")
+        if region not in regions:
+            raise ValueError(f"ZIP {zip_code} maps to unknown region '{region}'")
+
+
+class CompiledPricingTables:
+    """Pricing data with job types, locations and materials interned to integer ids.
+
+    Labor and material prices are stored as dense read-only NumPy arrays over the
+    base locations (the wage_indexes keys plus "default"), so that a quote is a
+    handful of array indexing operations instead of nested dict walks. Missing
+    entries are filled with the same fallbacks the dict lookups used.
+
+    ZIP/metro regions from the optional "zip_regions" section are extra locations
+    that point at a base column (their state) and scale it by per-region wage and
+    material multipliers, so tens of thousands of regions cost a few arrays rather
+    than more table columns. ZIP codes resolve to regions through a ZipRegionIndex.
+    """
+
+    def __init__(self, pricing_data: Dict[str, Any]):
+        start = time.perf_counter()
+        self.pricing_data = pricing_data
+
+        wage_indexes = pricing_data["wage_indexes"]
+        labor_rates = pricing_data["labor_rates"]
+        zip_regions = pricing_data.get("zip_regions") or {"regions": {}, "zips": {}}
+
+        # Unknown locations resolve to the "default" column, exactly like the dict path
+        base_locations = list(wage_indexes)
+        if DEFAULT_LOCATION not in wage_indexes:
+            base_locations.append(DEFAULT_LOCATION)
+        base_ids = {name: i for i, name in enumerate(base_locations)}
+        self.base_location_count = len(base_locations)
+
+        regions = zip_regions["regions"]
+        self.locations = base_locations + list(regions)
+        self.location_ids = {name: i for i, name in enumerate(self.locations)}
+        self.default_location_id = self.location_ids[DEFAULT_LOCATION]
+
+        self.job_types = list(labor_rates)
+        self.job_type_ids = {name: i for i, name in enumerate(self.job_types)}
+
+        # Materials are catalog SKUs; the catalog's extra last row prices unknown SKUs
+        self.catalog = MaterialCatalog(pricing_data, base_locations, DEFAULT_MATERIAL_COST)
+        self.materials = self.catalog.skus
+        self.material_ids = self.catalog.sku_ids
+        self.unknown_material_id = self.catalog.unknown_id
+        self.material_cost = self.catalog.prices
+
+        base_wage_index = [wage_indexes.get(location, DEFAULT_WAGE_INDEX) for location in base_locations]
+        region_base = [base_ids.get(region.get("state"), self.default_location_id) for region in regions.values()]
+        # A region without its own wage_index prices like its state
+        region_wage_index = [region.get("wage_index", base_wage_index[base])
+                             for region, base in zip(regions.values(), region_base)]
+
+        # Per-location column into the base tables, plus multipliers applied on top
+        self.base_location = np.array(list(range(len(base_locations))) + region_base, dtype=np.intp)
+        self.wage_index = np.array(base_wage_index + region_wage_index, dtype=float)
+        self.labor_multiplier = self.wage_index / self.wage_index[self.base_location]
+        self.material_multiplier = np.array(
+            [1.0] * len(base_locations) + [region.get("material_index", 1.0) for region in regions.values()],
+            dtype=float
+        )
+
+        self.labor_rate = np.array(
+            [[labor_rates[job_type].get(location, DEFAULT_LABOR_RATE) for location in base_locations]
+             for job_type in self.job_types],
+            dtype=float
+        ).reshape(len(self.job_types), len(base_locations))
+
+        zip_location_ids = {parse_zip(zip_code): self.location_ids[region] for zip_code, region in zip_regions["zips"].items()}
+        self.zip_index = ZipRegionIndex(zip_location_ids) if zip_location_ids else None
+
+        for table in (self.base_location, self.wage_index, self.labor_multiplier,
+                      self.material_multiplier, self.labor_rate, self.material_cost):
+            table.flags.writeable = False
+
+        self.compile_seconds = time.perf_counter() - start
+
+    def resolve_location(self, location) -> Tuple[int, str]:
+        """Location id plus how it matched: 'exact', 'zip', 'nearest_zip' or 'default'"""
+        location_id = self.location_ids.get(location)
+        if location_id is not None:
+            return location_id, "exact"
+        if self.zip_index is not None:
+            zip_code = parse_zip(location)
+            if zip_code is not None:
+                location_id, exact = self.zip_index.lookup(zip_code)
+                return location_id, ("zip" if exact else "nearest_zip")
+        return self.default_location_id, "default"
+
+    def location_id(self, location) -> int:
+        return self.resolve_location(location)[0]
+
+    def location_ids_for(self, locations: Iterable, count: int) -> np.ndarray:
+        ids, default_id = self.location_ids, self.default_location_id
+        if self.zip_index is None:
+            return np.fromiter((ids.get(location, default_id) for location in locations), dtype=np.intp, count=count)
+        return np.fromiter((self.location_id(location) for location in locations), dtype=np.intp, count=count)
+
+    def job_type_ids_for(self, job_types: Iterable, count: int) -> np.ndarray:
+        job_types = list(job_types)
+        unknown = sorted({str(job_type) for job_type in job_types if job_type not in self.job_type_ids})
+        if unknown:
+            raise ValueError(f"Unknown job types: {', '.join(unknown)}")
+        return np.fromiter((self.job_type_ids[job_type] for job_type in job_types), dtype=np.intp, count=count)
+
+    def material_ids_for(self, materials: Iterable, count: int) -> np.ndarray:
+        ids, unknown_id = self.material_ids, self.unknown_material_id
+        return np.fromiter((ids.get(material, unknown_id) for material in materials), dtype=np.intp, count=count)
+
+    def labor_rates_at(self, job_type_ids, location_ids):
+        """Labor rate per (job type, location) pair; arguments broadcast like NumPy indices"""
+        return self.labor_rate[job_type_ids, self.base_location[location_ids]] * self.labor_multiplier[location_ids]
+
+    def material_costs_at(self, material_ids, location_ids):
+        """Unit material cost per (material, location) pair; arguments broadcast like NumPy indices"""
+        return self.material_cost[material_ids, self.base_location[location_ids]] * self.material_multiplier[location_ids]
+
+    def price_bill_of_materials(self, location, skus, quantities) -> Dict[str, Any]:
+        """Price a whole bill of materials at a location with one vectorized dot product"""
+        location_id = self.location_id(location)
+        return self.catalog.price_bill(
+            skus, quantities,
+            int(self.base_location[location_id]),
+            float(self.material_multiplier[location_id])
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        tables = (self.base_location, self.wage_index, self.labor_multiplier,
+                  self.material_multiplier, self.labor_rate, self.material_cost)
+        table_bytes = sum(table.nbytes for table in tables)
+        if self.zip_index is not None:
+            table_bytes += self.zip_index.exact_location_ids.nbytes + self.zip_index.nearest_location_ids.nbytes
+
+        return {
+            "job_types": len(self.job_types),
+            "locations": self.base_location_count,
+            "regions": len(self.locations) - self.base_location_count,
+            "zip_codes": len(self.zip_index) if self.zip_index is not None else 0,
+            "materials": len(self.materials),
+            "table_bytes": int(table_bytes),
+            "compile_ms": round(self.compile_seconds * 1000, 3)
+        }
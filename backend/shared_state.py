@@ -0,0 +1,52 @@
+import gc
+import os
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+def preload_shared_state(pricing_engine, mmap_mode: str = 'r') -> Dict[str, Any]:
+    """Load pricing tables and model arrays once, before workers are forked.
+
+    Forked workers then share these pages copy-on-write. Saved models are
+    loaded memory-mapped, and everything allocated so far is moved out of the
+    garbage collector's reach so that collections in the workers do not touch
+    (and therefore copy) the shared objects.
+    """
+    pricing_engine.warm_up(mmap_mode=mmap_mode)
+    loaded_models = sorted(pricing_engine.advanced_ml_model.models)
+
+    gc.collect()
+    gc.freeze()
+
+    logger.info(f"Preloaded pricing tables and models {loaded_models} for forked workers")
+
+    return {
+        'models': loaded_models,
+        'frozen_objects': gc.get_freeze_count()
+    }
+
+
+def process_memory_stats() -> Dict[str, Any]:
+    """Get this process's memory split into shared and private pages (Linux only)"""
+    stats = {'pid': os.getpid()}
+    fields = {
+        'Rss': 'rss_mb',
+        'Pss': 'pss_mb',
+        'Shared_Clean': 'shared_clean_mb',
+        'Shared_Dirty': 'shared_dirty_mb',
+        'Private_Clean': 'private_clean_mb',
+        'Private_Dirty': 'private_dirty_mb'
+    }
+
+    try:
+        with open('/proc/self/smaps_rollup', 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    stats[fields[key]] = round(int(value.split()[0]) / 1024, 2)
+    except OSError:
+        pass
+
+    return stats
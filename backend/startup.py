@@ -0,0 +1,80 @@
+import importlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Modules imported in the background during a staged startup, heaviest first
+WARMUP_MODULES = ('pandas', 'sklearn', 'pricing_model', 'advanced_pricing', 'analytics')
+
+
+class StartupTracker:
+    """Records how long each boot stage takes and whether the app is ready to serve"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = []
+        self.error = None
+        self._ready = threading.Event()
+        self._warmup_thread = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a named boot stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.stages.append({'stage': name, 'ms': elapsed_ms})
+            logger.info(f"Startup stage '{name}' took {elapsed_ms}ms")
+
+    def import_module(self, name: str):
+        """Import a module as its own timed stage"""
+        with self.stage(f'import {name}'):
+            return importlib.import_module(name)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def mark_ready(self):
+        """Flip readiness and log the full startup breakdown"""
+        self._ready.set()
+        total_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+        breakdown = ', '.join(f"{s['stage']}={s['ms']}ms" for s in self.stages)
+        logger.info(f"Ready after {total_ms}ms ({breakdown})")
+
+    def start_warmup(self, pricing_engine, modules: Iterable[str] = WARMUP_MODULES):
+        """Import heavy modules and warm the pricing engine's models in a background thread"""
+        if self._warmup_thread is not None:
+            return
+
+        def warmup():
+            for name in modules:
+                try:
+                    self.import_module(name)
+                except Exception as e:
+                    # A broken optional module should not keep the models from serving
+                    logger.warning(f"Startup warm-up could not import {name}: {e}")
+            try:
+                pricing_engine.warm_up(self)
+                self.mark_ready()
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"Startup warm-up failed: {e}")
+
+        self._warmup_thread = threading.Thread(target=warmup, name='startup-warmup', daemon=True)
+        self._warmup_thread.start()
+
+    def status(self) -> Dict[str, Any]:
+        """Get readiness and the stage timings so far"""
+        return {
+            'status': 'ready' if self.ready else ('failed' if self.error else 'warming'),
+            'uptime_ms': round((time.perf_counter() - self.started_at) * 1000, 1),
+            'stages': list(self.stages),
+            'error': self.error
+        }
@@ -1,18 +1,102 @@
-import unittest
-from app import app
+import gc
 import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+# Models, registry and training jobs created while importing the app go to a scratch
+# directory rather than the working tree
+TEST_DIR = tempfile.mkdtemp(prefix='autoquoter-test-')
+os.environ['ML_MODEL_DIR'] = os.path.join(TEST_DIR, 'ml_models')
+os.environ['ML_BASIC_MODEL_FILE'] = os.path.join(TEST_DIR, 'pricing_model.pkl')
+
+import app as app_module
+from app import app, pricing_engine
+from geo_pricing import GeoPricingEngine
+import joblib
+import numpy as np
+import sklearn
+import pandas as pd
+from advanced_pricing import AdvancedMLPricingModel, FEATURE_COLUMNS
+from training_jobs import TrainingJobRunner
+from pricing_tables import CompiledPricingTables
+from tree_inference import CompiledTreeEnsemble, compile_ensemble, forest_tree_predictions
+from micro_batcher import MicroBatcher
+from benchmark import compare_results
+from shadow_evaluation import ShadowScores
+from drift import FeatureDriftMonitor, profile_features
+from analytics import AnalyticsService
+from model_registry import ModelRegistry
+from feature_store import FeatureStore
+from training import TrainingOrchestrator
+from shared_state import preload_shared_state
+from pricing_model import MLPricingModel, ARTIFACT_FORMAT_VERSION
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+
+def tearDownModule():
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+_trained_model_dir = None
+
+def trained_model_dir():
+    """Directory of small trained advanced models, trained once per test run"""
+    global _trained_model_dir
+    if _trained_model_dir is None:
+        model_dir = os.path.join(TEST_DIR, 'trained')
+        AdvancedMLPricingModel(model_dir).train_models(n_cores=1, num_samples=600)
+        _trained_model_dir = model_dir
+    return _trained_model_dir
 
 class TestAutoQuoter(unittest.TestCase):
     def setUp(self):
         self.app = app.test_client()
         self.app.testing = True
 
+        # Each test gets its own model directory, registry and training job runner
+        self.model_dir = tempfile.mkdtemp(dir=TEST_DIR)
+        self.training_jobs = TrainingJobRunner(self.model_dir)
+        patches = [
+            mock.patch.object(app_module, 'training_jobs', self.training_jobs),
+            mock.patch.object(pricing_engine, '_advanced_ml_model', AdvancedMLPricingModel(self.model_dir))
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.model_dir, ignore_errors=True)
+
+    def use_trained_models(self):
+        """Copy the trained models into this test's model directory and serve them from the app"""
+        shutil.copytree(trained_model_dir(), self.model_dir, dirs_exist_ok=True)
+        pricing_engine._advanced_ml_model = AdvancedMLPricingModel(self.model_dir)
+        return pricing_engine.advanced_ml_model
+
+    def engine(self, **kwargs):
+        """A GeoPricingEngine whose models live in this test's model directory"""
+        return GeoPricingEngine(model_dir=self.model_dir, basic_model_file=os.path.join(self.model_dir, 'pricing_model.pkl'),
+                                **kwargs)
+
     def test_health_endpoint(self):
         response = self.app.get('/api/health')
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertEqual(data['status'], 'healthy')
 
+    def test_ready_endpoint(self):
+        response = self.app.get('/api/ready')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'ready')
+        self.assertTrue(any(stage['stage'] == 'pricing engine' for stage in data['stages']))
+
     def test_quote_endpoint(self):
         payload = {
             'job_type': 'HVAC',
@@ -28,6 +112,737 @@ class TestAutoQuoter(unittest.TestCase):
         self.assertIn('quote_range', data)
         self.assertIn('ml_enhanced', data)
 
+    def test_batch_quote_endpoint(self):
+        jobs = [
+            {'job_type': 'HVAC', 'location': 'CA', 'complexity': 'high', 'materials': {'copper': 10}},
+            {'job_type': 'plumbing', 'location': 'ZZ', 'complexity': 'low', 'materials': {'pvc': 3}},
+            {'job_type': 'plumbing', 'location': 'TX'}
+        ]
+        response = self.app.post('/api/quote/batch',
+                                data=json.dumps({'jobs': jobs}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['count'], 3)
+        for job, quote in zip(jobs, data['quotes']):
+            expected = pricing_engine.calculate_quote(
+                job['job_type'], job['location'], job.get('complexity', 'medium'), job.get('materials')
+            )
+            self.assertEqual(quote['quote_range']['median'], expected['median'])
+
+    def test_batch_quote_rejects_unknown_job_type(self):
+        response = self.app.post('/api/quote/batch',
+                                data=json.dumps({'jobs': [{'job_type': 'welding', 'location': 'CA'}]}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_quote_rejects_malformed_rows(self):
+        for bad_job in ({'square_feet': None}, {'square_feet': '1200'}, {'materials': {'copper': None}}, {'complexity': ['high']}):
+            jobs = [{'job_type': 'HVAC', 'location': 'CA'}, dict({'job_type': 'plumbing', 'location': 'TX'}, **bad_job)]
+            response = self.app.post('/api/quote/batch',
+                                    data=json.dumps({'jobs': jobs}),
+                                    content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.data)['job_index'], 1)
+
+    def test_pricing_stats_endpoint(self):
+        pricing_engine.calculate_quote('HVAC', 'NY', 'medium', {'steel': 2})
+        response = self.app.get('/api/pricing/stats')
+        self.assertEqual(response.status_code, 200)
+        tables = json.loads(response.data)['tables']
+        self.assertEqual(tables['job_types'], len(pricing_engine.pricing_data['labor_rates']))
+        self.assertGreater(tables['lookups'], 0)
+        self.assertIn('compile_ms', tables)
+        self.assertIn('batch_size', json.loads(response.data)['micro_batching'])
+
+    def test_repeated_quote_is_served_from_cache(self):
+        first = pricing_engine.calculate_quote('plumbing', 'FL', 'high', {'copper': 4, 'steel': 1})
+        hits_before = pricing_engine.quote_cache.hits
+        second = pricing_engine.calculate_quote('plumbing', 'FL', 'high', {'steel': 1, 'copper': 4.0})
+        self.assertEqual(first, second)
+        self.assertEqual(pricing_engine.quote_cache.hits, hits_before + 1)
+
+        pricing_engine.load_data()
+        self.assertEqual(pricing_engine.quote_cache.stats()['size'], 0)
+
+    def test_reload_swaps_tables_and_rejects_invalid_data(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, 'pricing_data.json')
+            data = pricing_engine.get_default_data()
+            with open(data_file, 'w') as f:
+                json.dump(data, f)
+            engine = self.engine(data_file=data_file)
+            self.assertFalse(engine.reload_data()['reloaded'])
+
+            data['labor_rates']['HVAC']['CA'] = 300
+            with open(data_file, 'w') as f:
+                json.dump(data, f)
+            self.assertTrue(engine.reload_data(force=True)['reloaded'])
+            self.assertEqual(engine.tables.labor_rates_at(engine.tables.job_type_ids['HVAC'], engine.tables.location_id('CA')), 300)
+
+            tables = engine.tables
+            with open(data_file, 'w') as f:
+                f.write('{"wage_indexes": {"CA": -1}}')
+            with self.assertRaises(ValueError):
+                engine.reload_data(force=True)
+            self.assertIs(engine.tables, tables)
+            self.assertEqual(engine.reload_stats['failures'], 1)
+
+    def test_zip_codes_resolve_to_regions(self):
+        engine = self.engine(data_file=os.path.join(self.model_dir, 'missing_pricing_data.json'))
+        data = engine.get_default_data()
+        data['zip_regions'] = {
+            'regions': {
+                'SF-BAY': {'state': 'CA', 'wage_index': 1.5, 'material_index': 1.1},
+                'NYC': {'state': 'NY', 'wage_index': 1.6},
+                'SACRAMENTO': {'state': 'CA'}
+            },
+            'zips': {'94103': 'SF-BAY', '94110': 'SF-BAY', '10001': 'NYC', '95814': 'SACRAMENTO'}
+        }
+        engine.pricing_data = data
+
+        self.assertEqual(engine.resolve_location('94103')['match'], 'zip')
+        nearest = engine.resolve_location('94107-1234')
+        self.assertEqual((nearest['resolved_to'], nearest['match']), ('SF-BAY', 'nearest_zip'))
+        self.assertEqual(engine.resolve_location('10003')['resolved_to'], 'NYC')
+        self.assertEqual(engine.resolve_location('CA')['match'], 'exact')
+
+        # SF-BAY labor scales the CA rate by 1.5 / 1.2 and its materials by 1.1
+        tables = engine.tables
+        sf = tables.location_id('94103')
+        self.assertAlmostEqual(tables.labor_rates_at(tables.job_type_ids['HVAC'], sf), 150 * 1.5 / 1.2)
+        self.assertAlmostEqual(tables.material_costs_at(tables.material_ids['copper'], sf), 5.0 * 1.1)
+
+        # A region without its own wage_index takes its state's, so it prices like CA
+        sacramento, ca = tables.location_id('95814'), tables.location_id('CA')
+        self.assertEqual(tables.wage_index[sacramento], tables.wage_index[ca])
+        self.assertEqual(tables.labor_rates_at(tables.job_type_ids['HVAC'], sacramento), 150)
+        self.assertEqual(engine.calculate_quote('HVAC', '95814', materials={'copper': 2}, use_advanced_ml=False),
+                         engine.calculate_quote('HVAC', 'CA', materials={'copper': 2}, use_advanced_ml=False))
+
+        batch = engine.calculate_quotes([{'job_type': 'HVAC', 'location': '94103', 'materials': {'copper': 2}}], use_advanced_ml=False)
+        single = engine.calculate_quote('HVAC', '94103', materials={'copper': 2}, use_advanced_ml=False)
+        self.assertEqual(batch[0]['median'], single['median'])
+
+    def test_price_grid_rejects_bad_ranges(self):
+        payload = {
+            'job_type': 'HVAC',
+            'location': 'CA',
+            'ranges': {'complexity': ['low', 'extreme'], 'square_feet': {'start': 500, 'stop': 3000, 'num': 6}}
+        }
+        response = self.app.post('/api/quote/grid',
+                                data=json.dumps(payload),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('complexity', json.loads(response.data)['error'])
+
+    def test_price_grid_endpoint(self):
+        model = self.use_trained_models()
+        payload = {
+            'job_type': 'HVAC',
+            'location': 'CA',
+            'materials': {'copper': 10},
+            'ranges': {'complexity': ['low', 'high'], 'square_feet': {'start': 500, 'stop': 3000, 'num': 3}, 'urgency': 'rush'}
+        }
+        response = self.app.post('/api/quote/grid',
+                                data=json.dumps(payload),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        grid = json.loads(response.data)
+        self.assertEqual(grid['shape'], [2, 3, 1])
+        self.assertEqual(grid['axes']['urgency'], [1.3])
+        self.assertEqual(grid['model_used'], model.registry.champion)
+        low, median, high = (np.array(grid[key]) for key in ('low', 'median', 'high'))
+        self.assertEqual(median.shape, (2, 3, 1))
+        self.assertTrue(np.all(low <= median) and np.all(median <= high))
+
+        for ranges, axis in (({'square_feet': {'start': 500}}, 'square_feet'),
+                             ({'urgency': ['whenever']}, 'urgency'),
+                             ({'square_feet': {'start': 1, 'stop': 2, 'num': 200000}}, 'square_feet')):
+            response = self.app.post('/api/quote/grid',
+                                    data=json.dumps(dict(payload, ranges=ranges)),
+                                    content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(axis, json.loads(response.data)['error'])
+
+        response = self.app.post('/api/quote/grid',
+                                data=json.dumps(dict(payload, job_type='welding')),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_material_catalog_prices_skus(self):
+        data = pricing_engine.get_default_data()
+        data['material_catalog'] = {
+            'PVC-100': {'name': 'PVC pipe', 'unit': 'ft', 'prices': {'CA': 1.5}, 'default_price': 1.0}
+        }
+        items = [{'sku': 'PVC-100', 'quantity': 20}, {'sku': 'copper', 'quantity': 2}, {'sku': 'SKU-404', 'quantity': 3}]
+
+        with mock.patch.object(pricing_engine, 'tables', CompiledPricingTables(data)):
+            response = self.app.post('/api/materials/price',
+                                    data=json.dumps({'location': 'TX', 'items': items}),
+                                    content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            bill = json.loads(response.data)
+            self.assertEqual(bill['lines'][0], {'sku': 'PVC-100', 'name': 'PVC pipe', 'unit': 'ft', 'quantity': 20.0,
+                                                'unit_price': 1.0, 'line_total': 20.0})
+            self.assertEqual(bill['total'], 20.0 + 2 * 4.5)
+            self.assertEqual(bill['unknown_skus'], ['SKU-404'])
+
+            for bad_items in ([{'sku': 'copper', 'quantity': 'lots'}], [{'quantity': 1}], []):
+                response = self.app.post('/api/materials/price',
+                                        data=json.dumps({'location': 'TX', 'items': bad_items}),
+                                        content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_bill_of_materials_endpoint(self):
+        items = [{'sku': 'copper', 'quantity': 10}, {'sku': 'steel', 'quantity': 2.5}, {'sku': 'SKU-404', 'quantity': 1}]
+        response = self.app.post('/api/materials/price',
+                                data=json.dumps({'location': 'NY', 'items': items}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['total'], 5.5 * 10 + 2.2 * 2.5)
+        self.assertEqual(data['line_count'], 2)
+        self.assertEqual(data['unknown_skus'], ['SKU-404'])
+
+        response = self.app.post('/api/materials/price',
+                                data=json.dumps({'location': 'NY', 'items': [{'sku': 'copper', 'quantity': -1}]}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_promote_unregistered_model(self):
+        response = self.app.post('/api/ml/promote',
+                                data=json.dumps({'model': 'no_such_model'}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not registered', json.loads(response.data)['error'])
+
+        response = self.app.get('/api/ml/registry')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('champion', json.loads(response.data)['registry'])
+
+    def test_registry_writes_do_not_lose_other_processes_updates(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = ModelRegistry(tmp), ModelRegistry(tmp)
+            first.register('random_forest')
+            # second still holds the manifest from before that registration
+            second.register('neural_network')
+            first.promote('neural_network')
+
+            manifest = ModelRegistry(tmp).manifest
+            self.assertEqual(sorted(manifest['models']), ['neural_network', 'random_forest'])
+            self.assertEqual(manifest['champion']['name'], 'neural_network')
+
+    def test_retrain_requires_priced_rows(self):
+        response = self.app.post('/api/ml/retrain',
+                                data=json.dumps({'rows': [{'square_feet': 1200, 'materials_cost': 300}]}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('price', json.loads(response.data)['error'])
+
+    def test_retrain_validates_rows_and_needs_models(self):
+        row = {'square_feet': 1200, 'materials_cost': 300, 'labor_hours': 6, 'location': 'CA', 'complexity': 'medium',
+               'season': 'summer', 'urgency': 'normal', 'year': 2024, 'price': 2500}
+        for bad_row, message in (({'location': None}, 'missing columns: location'),
+                                 ({'urgency': 'yesterday'}, 'Rows 0'),
+                                 ({'square_feet': 'big'}, 'must be numbers')):
+            response = self.app.post('/api/ml/retrain',
+                                    data=json.dumps({'rows': [{k: v for k, v in dict(row, **bad_row).items() if v is not None}]}),
+                                    content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(message, json.loads(response.data)['error'])
+
+        # Nothing trained yet: an incremental update has nothing to update
+        response = self.app.post('/api/ml/retrain',
+                                data=json.dumps({'rows': [row]}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+
+        # A full retrain is queued as a job, and the rows are kept for it and later runs
+        response = self.app.post('/api/ml/retrain',
+                                data=json.dumps({'rows': [row, dict(row, price=2700)], 'incremental': False, 'num_samples': 50}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)['rows_stored'], 2)
+        self.training_jobs.cancel(json.loads(response.data)['job']['id'])
+
+        model = pricing_engine.advanced_ml_model
+        X, y = model.training_data(50)
+        self.assertEqual(len(X), 52)
+        self.assertEqual(y[-2:].tolist(), [2500.0, 2700.0])
+
+        # The combined matrix is stored once and memory-mapped on later calls, until more rows arrive
+        hits = model.feature_store.hits
+        X_again, _ = model.training_data(50)
+        self.assertIsInstance(X_again, np.memmap)
+        self.assertEqual(model.feature_store.hits, hits + 1)
+        np.testing.assert_array_equal(X_again, X)
+        model.add_training_rows(pd.DataFrame([dict(row, price=2900)]))
+        self.assertEqual(model.training_data(50)[1][-1], 2900.0)
+
+    def test_incremental_retrain_updates_trained_models(self):
+        model = self.use_trained_models()
+        version = model.registry.get('random_forest')['version']
+        trained_rows = model.registry.get('random_forest')['metrics']['training_rows']
+        rows = [{'square_feet': 1000 + 100 * i, 'materials_cost': 400, 'labor_hours': 8, 'location': 'TX',
+                 'complexity': 'high', 'season': 'winter', 'urgency': 'rush', 'year': 2024, 'price': 3000 + 50 * i}
+                for i in range(5)]
+
+        response = self.app.post('/api/ml/retrain',
+                                data=json.dumps({'rows': rows}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['results']['random_forest']['new_rows'], 5)
+        entry = model.registry.get('random_forest')
+        self.assertEqual(entry['version'], version + 1)
+        self.assertEqual(entry['metrics']['training_rows'], trained_rows + 5)
+        self.assertEqual(model.training_row_count(), 5)
+
+    def test_training_job_lifecycle(self):
+        response = self.app.post('/api/ml/train',
+                                data=json.dumps({'cores': 1, 'num_samples': 500}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.data)['job']['id']
+
+        response = self.app.get(f'/api/ml/jobs/{job_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(json.loads(response.data)['state'], ('queued', 'running'))
+
+        response = self.app.post(f'/api/ml/jobs/{job_id}/cancel')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['state'], 'cancelled')
+
+        response = self.app.post(f'/api/ml/jobs/{job_id}/cancel')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.app.get('/api/ml/jobs/not-a-job').status_code, 404)
+        self.assertTrue(os.path.exists(os.path.join(self.model_dir, 'jobs', f'{job_id}.json')))
+
+    def test_search_job_results_are_served_as_json(self):
+        # With a champion in place, promotion is decided by comparing NumPy scores
+        self.use_trained_models()
+        response = self.app.post('/api/ml/train',
+                                data=json.dumps({'mode': 'search', 'cores': 1, 'num_samples': 400, 'time_budget': 20}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        status_url = json.loads(response.data)['status_url']
+
+        deadline = time.time() + 180
+        while True:
+            response = self.app.get(status_url)
+            self.assertEqual(response.status_code, 200)
+            job = json.loads(response.data)
+            if job['state'] not in ('queued', 'running') or time.time() > deadline:
+                break
+            time.sleep(0.5)
+
+        self.assertEqual(job['state'], 'succeeded', job['error'])
+        self.assertIsInstance(job['results']['promoted'], bool)
+        self.assertTrue(job['results']['trials'])
+        self.assertEqual(os.listdir(os.path.join(self.model_dir, 'jobs')), [f"{job['id']}.json"])
+
+    def test_finished_job_files_are_pruned(self):
+        runner = TrainingJobRunner(self.model_dir, max_history=2, retention_seconds=3600)
+        states = ['succeeded', 'running', 'failed', 'cancelled', 'succeeded']
+        for age, state in enumerate(states):
+            path = os.path.join(runner.jobs_dir, f'{age:032x}.json')
+            with open(path, 'w') as f:
+                json.dump({'id': f'{age:032x}', 'state': state}, f)
+            mtime = os.path.getmtime(path) - age * 60 - (7200 if age == 0 else 0)
+            os.utime(path, (mtime, mtime))
+
+        # Job 0 is past the one-hour retention; jobs 3 and 4 are beyond the two newest
+        self.assertEqual(runner.prune(), 3)
+        self.assertEqual(sorted(os.listdir(runner.jobs_dir)), [f'{1:032x}.json', f'{2:032x}.json'])
+
+    def test_compiled_trees_match_sklearn(self):
+        model = AdvancedMLPricingModel(trained_model_dir())
+        X_raw = model.generate_synthetic_data(200, seed=7)[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+        for name in ('random_forest', 'gradient_boosting'):
+            model.load_model(name)
+            estimator = model.models[name]
+            X = model.feature_selectors[name].transform(model.scalers[name].transform(X_raw))
+            # The arrays saved in the bundle must evaluate the same as a fresh compile
+            for compiled in (compile_ensemble(estimator), CompiledTreeEnsemble.from_arrays(compile_ensemble(estimator).to_arrays())):
+                for batch in (X[:1], X):
+                    np.testing.assert_allclose(compiled.predict(batch), estimator.predict(batch), rtol=1e-9, atol=1e-6)
+
+            predictions = model.predict_prices(X_raw[:1], name)
+            np.testing.assert_allclose(predictions['predicted_price'], np.round(estimator.predict(X[:1]), 2), atol=0.01)
+
+        forest = model.models['random_forest']
+        np.testing.assert_allclose(compile_ensemble(forest).predict_per_tree(X[:5]), forest_tree_predictions(forest, X[:5]),
+                                   rtol=1e-9, atol=1e-6)
+
+    def test_shared_preload_memory_maps_models_and_freezes_gc(self):
+        shutil.copytree(trained_model_dir(), self.model_dir, dirs_exist_ok=True)
+        engine = self.engine(data_file=os.path.join(self.model_dir, 'missing_pricing_data.json'), lazy_models=True)
+        self.addCleanup(gc.unfreeze)
+
+        preloaded = preload_shared_state(engine)
+        self.assertEqual(preloaded['models'], ['gradient_boosting', 'neural_network', 'random_forest'])
+        self.assertGreater(preloaded['frozen_objects'], 0)
+        self.assertEqual(gc.get_freeze_count(), preloaded['frozen_objects'])
+
+        model = engine.advanced_ml_model
+        self.assertIsInstance(model.models['neural_network'].coefs_[0], np.memmap)
+        self.assertIsInstance(model._inference_plan('random_forest')['compiled'].threshold, np.memmap)
+
+        # Importing the app the way gunicorn.conf.py does still serves quotes from the preloaded models
+        script = os.path.join(self.model_dir, 'serve_one_quote.py')
+        with open(script, 'w') as f:
+            f.write("import gc, json\n"
+                    "from app import app\n"
+                    "response = app.test_client().post('/api/quote', json={'job_type': 'HVAC', 'location': 'CA'})\n"
+                    "print(json.dumps({'status': response.status_code, 'quote': response.get_json(),\n"
+                    "                  'frozen': gc.get_freeze_count()}))\n")
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ, AUTOQUOTER_SHARED_PRELOAD='1', ML_MODEL_DIR=self.model_dir,
+                   ML_BASIC_MODEL_FILE=os.path.join(self.model_dir, 'pricing_model.pkl'),
+                   PYTHONPATH=os.pathsep.join(filter(None, [backend_dir, os.path.join(backend_dir, '..', 'ml_components'),
+                                                            os.environ.get('PYTHONPATH')])))
+        result = subprocess.run([sys.executable, script], env=env, cwd=backend_dir,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        served = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(served['status'], 200)
+        self.assertGreater(served['frozen'], 0)
+        self.assertIn(served['quote']['quote_range']['model_used'], preloaded['models'])
+
+    def test_basic_model_loads_its_artifact_instead_of_retraining(self):
+        model_file = os.path.join(self.model_dir, 'pricing_model.pkl')
+        first = MLPricingModel(model_file)
+        self.assertTrue(os.path.exists(model_file))
+
+        with mock.patch.object(MLPricingModel, 'train_model', side_effect=AssertionError('retrained')):
+            second = MLPricingModel(model_file)
+        self.assertEqual((second.model_version, second.trained_at), (first.model_version, first.trained_at))
+        self.assertEqual(second.predict_price(1.5, 1.2, 300), first.predict_price(1.5, 1.2, 300))
+
+        # An artifact of another format or scikit-learn version is replaced by a fresh training run
+        for key, value in (('format_version', -1), ('sklearn_version', '0.0.1')):
+            artifact = joblib.load(model_file)
+            artifact[key] = value
+            joblib.dump(artifact, model_file)
+            with mock.patch.object(MLPricingModel, 'train_model', autospec=True,
+                                   side_effect=MLPricingModel.train_model) as train:
+                retrained = MLPricingModel(model_file)
+            self.assertEqual(train.call_count, 1, key)
+            self.assertEqual(joblib.load(model_file)[key],
+                             ARTIFACT_FORMAT_VERSION if key == 'format_version' else sklearn.__version__)
+            self.assertEqual(retrained.predict_price(1.5, 1.2, 300), first.predict_price(1.5, 1.2, 300))
+
+    def test_preload_skips_bundles_from_another_sklearn_release(self):
+        self.use_trained_models()
+        registry = ModelRegistry(self.model_dir)
+
+        def tamper(name, version):
+            path = registry.artifact_path(name, 'bundle')
+            bundle = joblib.load(path)
+            bundle['sklearn_version'] = version
+            joblib.dump(bundle, path)
+
+        major, minor = sklearn.__version__.split('.')[:2]
+        tamper('gradient_boosting', '0.1.0')
+        tamper('neural_network', f'{major}.{minor}.999')
+
+        model = AdvancedMLPricingModel(self.model_dir)
+        self.assertEqual(model.preload_models(), ['neural_network', 'random_forest'])
+        with self.assertRaises(ValueError):
+            model.load_model('gradient_boosting')
+
+        # Booting the server does not fail on the incompatible bundle
+        self.engine().warm_up()
+
+    def test_feature_store_evicts_least_recently_used_entries(self):
+        X, y = np.ones((100, 4)), np.ones(100)
+        store = FeatureStore(os.path.join(self.model_dir, 'store'), max_bytes=10 ** 9)
+        for i, key in enumerate(('a', 'b', 'c')):
+            store.put(key, X, y)
+            os.utime(os.path.join(store.store_dir, key, 'meta.json'), (1000 + i, 1000 + i))
+        entry_bytes = store.stats()['bytes'] // 3
+
+        # Reading 'a' makes 'b' the least recently used
+        self.assertIsNotNone(store.get('a'))
+        store.max_bytes = 3 * entry_bytes
+        store.put('d', X, y)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(sorted(key for key, _, _ in store._entries()), ['a', 'c', 'd'])
+        self.assertEqual(store.stats()['evictions'], 1)
+        self.assertLessEqual(store.stats()['bytes'], store.max_bytes)
+
+        # An entry bigger than the cap is still kept while it is the newest
+        store.max_bytes = entry_bytes // 2
+        store.put('e', X, y)
+        self.assertEqual([key for key, _, _ in store._entries()], ['e'])
+
+    def test_feature_store_put_returns_arrays_when_entry_is_gone(self):
+        X, y = np.arange(12.0).reshape(3, 4), np.arange(3.0)
+        store = FeatureStore(os.path.join(self.model_dir, 'store'))
+        # Another process evicts the entry between publishing it and reading it back
+        with mock.patch.object(store, 'evict', side_effect=lambda keep: shutil.rmtree(os.path.join(store.store_dir, keep))):
+            stored_X, stored_y = store.put('a', X, y)
+        np.testing.assert_array_equal(stored_X, X)
+        np.testing.assert_array_equal(stored_y, y)
+        self.assertIsNone(store.get('a'))
+
+        computed = store.get_or_compute('b', lambda: (X, y))
+        self.assertIsInstance(computed[0], np.memmap)
+
+    def test_training_matrix_key_follows_generator_and_seed(self):
+        model = AdvancedMLPricingModel(self.model_dir)
+        X, _ = model.training_matrix(50, seed=1)
+        np.testing.assert_array_equal(model.training_matrix(50, seed=1)[0], X)
+        self.assertEqual((model.feature_store.misses, model.feature_store.hits), (1, 1))
+
+        self.assertFalse(np.array_equal(model.training_matrix(50, seed=2)[0], X))
+        self.assertEqual(len(model.training_matrix(60, seed=1)[0]), 60)
+        with mock.patch('advanced_pricing.SYNTHETIC_DATA_VERSION', -1):
+            model.training_matrix(50, seed=1)
+        self.assertEqual((model.feature_store.misses, model.feature_store.stats()['entries']), (4, 4))
+
+    def test_parallel_training_matches_serial_training(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(300, 4))
+        y = X @ [3.0, -2.0, 0.5, 0.0] + rng.normal(scale=0.1, size=300)
+        candidates = {
+            'ridge': Ridge(),
+            'forest': RandomForestRegressor(n_estimators=10, random_state=0),
+            'boosting': GradientBoostingRegressor(n_estimators=20, random_state=0)
+        }
+        args = (X[:240], y[:240], X[240:], y[240:], X, y)
+
+        progress = []
+        serial = TrainingOrchestrator(n_cores=1).fit_candidates(candidates, *args, cv=3)
+        parallel = TrainingOrchestrator(n_cores=2).fit_candidates(candidates, *args, cv=3,
+                                                                  progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(set(parallel), set(candidates))
+        self.assertEqual(progress[-1], (12, 12))
+        for name in candidates:
+            for metric in ('train_r2', 'test_r2', 'cv_r2_mean', 'cv_r2_std', 'rmse'):
+                self.assertAlmostEqual(parallel[name][metric], serial[name][metric], places=10, msg=f'{name} {metric}')
+            np.testing.assert_allclose(parallel[name]['model'].predict(X), serial[name]['model'].predict(X))
+
+    def test_training_matrix_is_filled_chunk_by_chunk(self):
+        model = AdvancedMLPricingModel(self.model_dir)
+
+        empty = model.generate_synthetic_data(0)
+        self.assertEqual(len(empty), 0)
+        self.assertTrue(set(FEATURE_COLUMNS + ['price']) <= set(empty.columns))
+        X, y = model.training_matrix(0)
+        self.assertEqual((X.shape, y.shape), ((0, len(FEATURE_COLUMNS)), (0,)))
+
+        X, y = model.synthetic_matrix(250, seed=5, chunk_size=100)
+        frame = pd.concat(model.iter_synthetic_data(250, chunk_size=100, seed=5), ignore_index=True)
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_array_equal(X, frame[FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+        np.testing.assert_array_equal(y, frame['price'].to_numpy())
+
+        # Training never builds the whole data set as one DataFrame
+        with mock.patch.object(AdvancedMLPricingModel, 'generate_synthetic_data', side_effect=AssertionError):
+            X, y = model.training_matrix(250, seed=5)
+        self.assertEqual((X.dtype, len(y)), (np.float32, 250))
+
+    def test_batch_predictions_match_single_predictions(self):
+        model = AdvancedMLPricingModel(trained_model_dir())
+        rng = np.random.default_rng(4)
+        # More rows than the compiled-tree path takes, so both inference paths are covered
+        jobs = pd.DataFrame({
+            'square_feet': rng.uniform(200, 4000, 100),
+            'materials_cost': rng.uniform(50, 2000, 100),
+            'labor_hours': rng.uniform(1, 40, 100),
+            'location_multiplier': rng.choice([0.8, 1.0, 1.3], 100),
+            'complexity_multiplier': rng.choice([0.8, 1.0, 1.5], 100),
+            'urgency_multiplier': rng.choice([1.0, 1.3, 1.8], 100)
+        })
+
+        for name in ('random_forest', 'gradient_boosting', 'neural_network'):
+            batch = model.predict_prices(jobs, name)
+            for i in (0, 63, 64, 99):
+                single = model.predict_price(jobs.iloc[i].to_dict(), name)
+                for key in ('predicted_price', 'low_estimate', 'high_estimate', 'confidence_score'):
+                    self.assertAlmostEqual(batch[key][i], single[key], places=6, msg=f'{name} {key} row {i}')
+
+            # An ndarray of raw features goes through the saved scaler and selector
+            X_raw = model.prepare_feature_matrix({col: jobs[col].to_numpy() for col in jobs.columns})
+            expected = model.models[name].predict(model.feature_selectors[name].transform(model.scalers[name].transform(X_raw)))
+            np.testing.assert_allclose(model.predict_prices(X_raw, name)['predicted_price'], expected, atol=0.006)
+            np.testing.assert_array_equal(model.predict_prices(X_raw, name)['predicted_price'], batch['predicted_price'])
+
+    def test_confidence_varies_with_the_input_for_every_model(self):
+        model = AdvancedMLPricingModel(trained_model_dir())
+        X_raw = model.generate_synthetic_data(200, seed=11)[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+        for name in ('random_forest', 'gradient_boosting', 'neural_network'):
+            predictions = model.predict_prices(X_raw, name)
+            self.assertTrue(np.all(predictions['low_estimate'] <= predictions['predicted_price']))
+            self.assertTrue(np.all(predictions['predicted_price'] <= predictions['high_estimate']))
+            self.assertGreater(len(np.unique(predictions['confidence_score'])), 20, name)
+
+            # The interval survives a save and (memory-mapped) reload
+            reloaded = AdvancedMLPricingModel(trained_model_dir())
+            reloaded.load_model(name, mmap_mode='r')
+            np.testing.assert_array_equal(reloaded.predict_prices(X_raw, name)['confidence_score'],
+                                          predictions['confidence_score'])
+
+    def test_micro_batcher_splits_one_predict_between_callers(self):
+        calls = []
+        def predict_batch(X, key):
+            calls.append(len(X))
+            return {'price': X[:, 0] * 2, 'model_used': key}
+
+        batcher = MicroBatcher(predict_batch, max_wait_ms=1000, max_rows=8)
+
+        # Nothing else is in flight, so a lone request does not wait out max_wait_ms
+        start = time.perf_counter()
+        self.assertEqual(batcher.submit(np.array([1.0, 0.0]))['price'].tolist(), [2.0])
+        self.assertLess(time.perf_counter() - start, 0.5)
+        calls.clear()
+
+        # Callers in flight hold the batch open until they submit, or leave without submitting
+        results = {}
+        announced = threading.Barrier(6)
+        def submit(i):
+            with batcher.expecting():
+                announced.wait()
+                time.sleep(0.03 * i)
+                if i < 5:
+                    results[i] = batcher.submit(np.array([i, 0.0]), key='rf')
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(6)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLess(time.perf_counter() - start, 0.8)
+        self.assertEqual(calls, [5])
+        for i in range(5):
+            self.assertEqual(results[i]['price'].tolist(), [2.0 * i])
+            self.assertEqual(results[i]['model_used'], 'rf')
+        stats = batcher.stats()
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['batch_size']['count'], 2)
+
+    def test_benchmark_comparison_flags_regressions(self):
+        def run(p50_ms, rows_per_sec, resident_mb):
+            return {'models': {'random_forest': {
+                'load_seconds': 0.3, 'resident_bytes': resident_mb * 1024 ** 2, 'artifact_bytes': 1000,
+                'batches': {'1': {'latency_ms': {'p50': p50_ms}, 'rows_per_sec': rows_per_sec}}
+            }}}
+
+        baseline = run(0.3, 3000, 190)
+        self.assertEqual(compare_results(run(0.33, 2900, 192), baseline), [])
+        regressions = compare_results(run(0.6, 1500, 190), baseline)
+        self.assertEqual(sorted(r['metric'] for r in regressions), ['latency_p50_ms@1', 'rows_per_sec@1'])
+
+    def test_shadow_scores_track_disagreement_and_error(self):
+        scores = ShadowScores(disagreement_threshold=0.1)
+        scores.update(np.array([100.0, 200.0]), np.array([105.0, 240.0]), 'champion')
+        scores.update(np.array([100.0, 200.0]), np.array([120.0, 240.0]), 'champion',
+                      actual_prices=np.array([110.0, 210.0]))
+
+        stats = scores.to_dict()
+        self.assertEqual(stats['champions'], {'champion': 4})
+        self.assertEqual(stats['disagreement']['rate'], 0.75)
+        self.assertAlmostEqual(stats['disagreement']['relative_difference']['mean'], 0.1625)
+        self.assertEqual(stats['error']['labelled_rows'], 2)
+        self.assertEqual(stats['error']['champion']['mae'], 10.0)
+        self.assertEqual(stats['error']['challenger']['mae'], 20.0)
+
+    def test_shadow_endpoints(self):
+        response = self.app.post('/api/ml/shadow/start',
+                                data=json.dumps({'challenger': 'no_such_model'}),
+                                content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.app.post('/api/ml/shadow/stop').status_code, 409)
+        response = self.app.get('/api/ml/shadow')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(json.loads(response.data)['shadow'])
+
+    def test_cached_quotes_still_reach_drift_and_shadow(self):
+        shutil.copytree(trained_model_dir(), self.model_dir, dirs_exist_ok=True)
+        engine = self.engine(data_file=os.path.join(self.model_dir, 'missing_pricing_data.json'))
+        engine.warm_up()
+        engine.shadow = mock.Mock()
+
+        first = engine.calculate_quote('HVAC', 'CA', materials={'copper': 3})
+        second = engine.calculate_quote('HVAC', 'CA', materials={'copper': 3})
+        self.assertEqual(first, second)
+        self.assertEqual(engine.quote_cache.hits, 1)
+
+        model_name = first['model_used']
+        self.assertEqual(engine.drift_report()[model_name]['rows'], 2)
+        self.assertEqual(engine.shadow.offer.call_count, 2)
+        rows, prices, champion = engine.shadow.offer.call_args.args
+        self.assertEqual((rows.shape, float(prices[0]), champion), ((10,), first['median'], model_name))
+
+    def test_configured_shadow_starts_on_demand_and_reports_a_dead_scorer(self):
+        # Importing the app never starts a shadow process
+        self.assertIsNone(pricing_engine.shadow)
+        self.use_trained_models()
+        self.addCleanup(pricing_engine.stop_shadow)
+
+        with mock.patch.object(app_module, 'ML_SHADOW_CHALLENGER', 'gradient_boosting'):
+            shadow = app_module.start_configured_shadow()
+        self.assertIs(pricing_engine.shadow, shadow)
+
+        shadow._process.kill()
+        shadow._process.join()
+        stats = json.loads(self.app.get('/api/ml/shadow').data)['shadow']
+        self.assertEqual((stats['state'], stats['running']), ('failed', False))
+        self.assertEqual(stats['errors'], 1)
+        self.assertIn('exited with code', stats['last_error'])
+
+        pricing_engine.stop_shadow()
+        self.assertEqual(shadow.stats()['state'], 'stopped')
+
+    def test_feature_drift_monitor_flags_shifted_features(self):
+        rng = np.random.default_rng(0)
+        reference = profile_features(rng.normal(size=(5000, 2)), ['stable', 'shifted'])
+        monitor = FeatureDriftMonitor(['stable', 'shifted'], reference, buffer_rows=64)
+        for row in rng.normal(size=(1000, 2)) + [0.0, 1.0]:
+            monitor.observe(row)
+
+        report = monitor.report()
+        self.assertEqual(report['rows'], 1000)
+        self.assertEqual(report['features']['stable']['status'], 'stable')
+        self.assertEqual(report['drifted_features'], ['shifted'])
+        self.assertAlmostEqual(report['features']['shifted']['mean'], 1.0, delta=0.1)
+        self.assertEqual(FeatureDriftMonitor.from_state(monitor.to_state()).report(), report)
+
+    def test_model_performance_is_tracked_as_fixed_size_summary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, 'analytics.json')
+            analytics = AnalyticsService(data_file, model_dir=tmp)
+            analytics.analytics_data['model_performance']['random_forest'] = [
+                {'confidence_score': 0.8, 'input_features': {'square_feet': 900}, 'prediction_time': 0.01}
+            ]
+            for i in range(50):
+                analytics.track_model_performance({
+                    'model_name': 'random_forest', 'confidence': 0.9, 'prediction_time': 0.002,
+                    'features': {'square_feet': 1000 + i, 'materials_cost': 500}
+                })
+            size = os.path.getsize(data_file)
+            analytics.track_model_performance({'model_name': 'random_forest', 'features': {'square_feet': 1200}})
+
+            summary = AnalyticsService(data_file, model_dir=tmp).analytics_data['model_performance']['random_forest']
+            self.assertEqual(summary['predictions'], 52)
+            self.assertEqual(summary['feature_drift']['rows'], 52)
+            self.assertAlmostEqual(os.path.getsize(data_file), size, delta=64)
+
+            # Without a saved profile the model's own feature row is monitored, derived features included
+            drift = AnalyticsService(data_file, model_dir=tmp).get_model_drift()['random_forest']
+            self.assertEqual(list(drift['features']), FEATURE_COLUMNS)
+            self.assertAlmostEqual(drift['features']['cost_per_sqft']['mean'],
+                                   np.mean([500 / 900] + [500 / (1000 + i) for i in range(50)] + [500 / 1200]), places=5)
+
+        response = self.app.get('/api/ml/drift')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('models', json.loads(response.data))
+
     def test_market_trends_endpoint(self):
         response = self.app.get('/api/market-trends')
         self.assertEqual(response.status_code, 200)
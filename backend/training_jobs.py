@@ -0,0 +1,314 @@
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ('succeeded', 'failed', 'cancelled')
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# How often the runner checks on a running job for messages and cancellation
+POLL_INTERVAL = 0.5
+
+# Finished jobs' files are deleted once they are this old (seconds), or beyond max_history of them
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+def _training_worker(model_dir: str, params: Dict[str, Any], messages):
+    """Entry point of the training process: train, save and register models, report back"""
+    if hasattr(os, 'setsid'):
+        # Own process group, so a cancel also stops the training pool's processes
+        os.setsid()
+
+    try:
+        from advanced_pricing import AdvancedMLPricingModel
+
+        model = AdvancedMLPricingModel(model_dir)
+        progress = lambda fraction, stage: messages.put(('progress', fraction, stage))
+
+        if params.get('mode') == 'search':
+            summary = model.search_hyperparameters(
+                time_budget=params.get('time_budget', 300),
+                n_cores=params.get('cores'),
+                num_samples=params.get('num_samples', 15000),
+                progress=progress
+            )
+            messages.put(('succeeded', model.registry.champion, summary))
+            return
+
+        results, best_model = model.train_models(
+            n_cores=params.get('cores'),
+            num_samples=params.get('num_samples', 15000),
+            progress=progress
+        )
+        summary = {
+            name: {key: float(value) if value is not None else None
+                   for key, value in result.items() if key != 'model'}
+            for name, result in results.items()
+        }
+        messages.put(('succeeded', best_model, summary))
+    except Exception as e:
+        messages.put(('failed', str(e)))
+
+
+class TrainingJobRunner:
+    """Runs model training jobs one at a time in a separate process.
+
+    Jobs wait in a local queue and a dispatcher thread starts a fresh worker
+    process for each, so training never shares a core or the GIL with request
+    handling. Job state is also written to ``<model_dir>/jobs/<id>.json`` so
+    other server processes can report on (and request cancellation of) jobs
+    they did not start. ``on_success`` is called in this process once a job's
+    models are saved, e.g. to hot-swap them into the pricing engine. Files of
+    finished jobs are pruned whenever a job finishes (see ``prune``).
+    """
+
+    def __init__(self, model_dir: str = 'ml_models', on_success: Callable[[Dict[str, Any]], None] = None,
+                 start_method: str = 'spawn', max_history: int = 100,
+                 retention_seconds: float = JOB_RETENTION_SECONDS):
+        self.model_dir = model_dir
+        self.jobs_dir = os.path.join(model_dir, 'jobs')
+        self.on_success = on_success
+        self.start_method = start_method
+        self.max_history = max_history
+        self.retention_seconds = retention_seconds
+        self.jobs = OrderedDict()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._processes = {}
+        self._dispatcher = None
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def submit(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Queue a training job and return its initial status"""
+        job = {
+            'id': uuid.uuid4().hex,
+            'state': 'queued',
+            'progress': 0.0,
+            'stage': None,
+            'params': dict(params or {}),
+            'submitted_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'best_model': None,
+            'results': None,
+            'error': None
+        }
+
+        with self._lock:
+            self.jobs[job['id']] = job
+            while len(self.jobs) > self.max_history:
+                oldest_id, oldest = next(iter(self.jobs.items()))
+                if oldest['state'] not in TERMINAL_STATES:
+                    break
+                del self.jobs[oldest_id]
+            self._save(job)
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch, name='training-jobs', daemon=True)
+                self._dispatcher.start()
+
+        self._queue.put(job['id'])
+        logger.info(f"Queued training job {job['id']}")
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job started by this process or, failing that, by another one"""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        with self._lock:
+            if job_id in self.jobs:
+                return dict(self.jobs[job_id])
+        try:
+            with open(self._job_path(job_id), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def recent(self):
+        """Jobs started by this process, newest first"""
+        with self._lock:
+            return [dict(job) for job in reversed(self.jobs.values())]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job; returns None for unknown jobs, raises ValueError if it already finished"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job['state'] in TERMINAL_STATES:
+            raise ValueError(f"Job {job_id} already {job['state']}")
+
+        with self._lock:
+            owned = job_id in self.jobs
+            if owned:
+                self._finish(self.jobs[job_id], 'cancelled')
+                process = self._processes.get(job_id)
+            else:
+                process = None
+
+        if not owned:
+            # Leave a marker for the process that owns the job
+            open(self._job_path(job_id) + '.cancel', 'w').close()
+            job['cancel_requested'] = True
+            return job
+
+        if process is not None:
+            self._terminate(process)
+        logger.info(f"Cancelled training job {job_id}")
+        return self.get(job_id)
+
+    def _dispatch(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job['state'] != 'queued':
+                    continue
+                if self._cancel_requested(job_id):
+                    self._finish(job, 'cancelled')
+                    continue
+            try:
+                self._run(job)
+            except Exception as e:
+                logger.error(f"Training job {job_id} failed: {e}")
+                with self._lock:
+                    if job['state'] not in TERMINAL_STATES:
+                        self._finish(job, 'failed', error=str(e))
+
+    def _run(self, job: Dict[str, Any]):
+        context = multiprocessing.get_context(self.start_method)
+        messages = context.Queue()
+        process = context.Process(
+            target=_training_worker, args=(self.model_dir, job['params'], messages),
+            name=f"training-job-{job['id'][:8]}"
+        )
+
+        with self._lock:
+            if job['state'] != 'queued':
+                return
+            job.update({'state': 'running', 'started_at': datetime.now().isoformat(), 'stage': 'starting'})
+            self._save(job)
+            process.start()
+            self._processes[job['id']] = process
+
+        outcome = None
+        try:
+            while outcome is None:
+                try:
+                    message = messages.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if job['state'] == 'cancelled':
+                        break
+                    if self._cancel_requested(job['id']):
+                        self.cancel(job['id'])
+                        break
+                    if not process.is_alive():
+                        outcome = ('failed', f'Training process exited with code {process.exitcode}')
+                    continue
+
+                if message[0] == 'progress':
+                    with self._lock:
+                        if job['state'] == 'running':
+                            job['progress'], job['stage'] = round(message[1], 3), message[2]
+                            self._save(job)
+                else:
+                    outcome = message
+        finally:
+            process.join(timeout=5)
+            with self._lock:
+                self._processes.pop(job['id'], None)
+
+        if outcome is None or job['state'] == 'cancelled':
+            return
+        if outcome[0] == 'failed':
+            with self._lock:
+                self._finish(job, 'failed', error=outcome[1])
+            return
+
+        _, best_model, summary = outcome
+        try:
+            json.dumps(summary)
+        except (TypeError, ValueError) as e:
+            with self._lock:
+                self._finish(job, 'failed', error=f'Job results could not be saved: {e}')
+            return
+        job.update({'best_model': best_model, 'results': summary, 'stage': 'swapping models'})
+        if self.on_success is not None:
+            self.on_success(job)
+        with self._lock:
+            self._finish(job, 'succeeded')
+        logger.info(f"Training job {job['id']} finished, serving {best_model}")
+
+    def _finish(self, job: Dict[str, Any], state: str, error: str = None):
+        job.update({'state': state, 'finished_at': datetime.now().isoformat(), 'error': error})
+        if state == 'succeeded':
+            job.update({'progress': 1.0, 'stage': 'done'})
+        self._save(job)
+        try:
+            os.remove(self._job_path(job['id']) + '.cancel')
+        except OSError:
+            pass
+        self.prune()
+
+    def prune(self) -> int:
+        """Delete the files of finished jobs older than retention_seconds or beyond the newest max_history"""
+        paths = []
+        for filename in os.listdir(self.jobs_dir):
+            if filename.endswith('.json'):
+                try:
+                    paths.append((os.path.getmtime(os.path.join(self.jobs_dir, filename)), filename))
+                except OSError:
+                    continue
+        paths.sort(reverse=True)
+
+        now = time.time()
+        removed = 0
+        for index, (mtime, filename) in enumerate(paths):
+            if index < self.max_history and now - mtime < self.retention_seconds:
+                continue
+            path = os.path.join(self.jobs_dir, filename)
+            try:
+                with open(path, 'r') as f:
+                    if json.load(f).get('state') not in TERMINAL_STATES:
+                        continue
+                os.remove(path)
+                removed += 1
+            except (OSError, ValueError):
+                continue
+
+        if removed:
+            logger.info(f"Pruned {removed} finished training job files")
+        return removed
+
+    def _terminate(self, process):
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except (AttributeError, OSError):
+            # No process groups, or the worker has not called setsid() yet
+            process.terminate()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return os.path.exists(self._job_path(job_id) + '.cancel')
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f'{job_id}.json')
+
+    def _save(self, job: Dict[str, Any]):
+        # Serialize before opening the file, so a job that cannot be saved leaves no partial file behind
+        payload = json.dumps(job, indent=2)
+        tmp_path = self._job_path(job['id']) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(payload)
+        os.replace(tmp_path, self._job_path(job['id']))
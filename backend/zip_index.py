@@ -0,0 +1,59 @@
+import re
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+ZIP_SPACE = 100000
+ZIP_PATTERN = re.compile(r"^(\d{5})(?:-\d{4})?$")
+
+
+def parse_zip(location) -> Optional[int]:
+    """Return a ZIP code (or ZIP+4) location as an int, or None if it is not one"""
+    if isinstance(location, int) and not isinstance(location, bool):
+        return location if 0 <= location < ZIP_SPACE else None
+    if isinstance(location, str):
+        match = ZIP_PATTERN.match(location.strip())
+        if match:
+            return int(match.group(1))
+    return None
+
+
+class ZipRegionIndex:
+    """Precomputed ZIP code -> location id lookup.
+
+    Known ZIPs live in a dense array indexed by the ZIP itself, so an exact hit is
+    a single array read. ZIPs missing from the table resolve to the numerically
+    nearest known ZIP (ZIP prefixes are assigned geographically); that nearest
+    neighbour is found with a binary search over the sorted known ZIPs when the
+    index is built and stored for every ZIP, so misses are O(1) as well.
+    """
+
+    def __init__(self, zip_location_ids: Dict[int, int]):
+        if not zip_location_ids:
+            raise ValueError("ZIP index needs at least one ZIP code")
+
+        self.known_zips = np.array(sorted(zip_location_ids), dtype=np.int32)
+        self.exact_location_ids = np.full(ZIP_SPACE, -1, dtype=np.int32)
+        self.exact_location_ids[self.known_zips] = [zip_location_ids[z] for z in self.known_zips.tolist()]
+
+        nearest_zip = self.nearest_known_zips(np.arange(ZIP_SPACE, dtype=np.int32))
+        self.nearest_location_ids = self.exact_location_ids[nearest_zip]
+
+        for table in (self.known_zips, self.exact_location_ids, self.nearest_location_ids):
+            table.flags.writeable = False
+
+    def nearest_known_zips(self, zip_codes: np.ndarray) -> np.ndarray:
+        """Nearest known ZIP for each code via binary search (ties go to the lower ZIP)"""
+        right = np.clip(np.searchsorted(self.known_zips, zip_codes), 0, len(self.known_zips) - 1)
+        left = np.clip(right - 1, 0, len(self.known_zips) - 1)
+        take_left = np.abs(zip_codes - self.known_zips[left]) <= np.abs(self.known_zips[right] - zip_codes)
+        return np.where(take_left, self.known_zips[left], self.known_zips[right])
+
+    def lookup(self, zip_code: int) -> Tuple[int, bool]:
+        """Location id for a ZIP and whether it was an exact match"""
+        location_id = int(self.exact_location_ids[zip_code])
+        if location_id >= 0:
+            return location_id, True
+        return int(self.nearest_location_ids[zip_code]), False
+
+    def __len__(self):
+        return len(self.known_zips)
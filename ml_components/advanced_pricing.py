@@ -1,46 +1,163 @@
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split, cross_val_score
+import sklearn
+from sklearn.base import clone
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.neural_network import MLPRegressor
 from sklearn.feature_selection import SelectKBest, f_regression
 import joblib
+import copy
 import json
 import os
+import time
 from datetime import datetime
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Iterator, Callable
 import logging
+from model_registry import ModelRegistry
+from feature_store import FeatureStore
+from training import TrainingOrchestrator, SuccessiveHalvingSearch
+from tree_inference import CompiledTreeEnsemble, compile_ensemble, forest_tree_predictions
+from drift import profile_features
 
 logger = logging.getLogger(__name__)
 
+FEATURE_COLUMNS = ['square_feet', 'materials_cost', 'labor_hours',
+                   'location_multiplier', 'complexity_multiplier',
+                   'season_multiplier', 'urgency_multiplier',
+                   'cost_per_sqft', 'labor_efficiency', 'year_trend']
+
+# Job fields the engineered FEATURE_COLUMNS are derived from, for rows posted without them
+RAW_FEATURE_COLUMNS = ['square_feet', 'materials_cost', 'labor_hours', 'location',
+                       'complexity', 'season', 'urgency', 'year']
+
+# Synthetic rows a training run generates unless told otherwise
+TRAINING_SAMPLES = 15000
+
+# Bump when the layout of the saved model bundle changes
+BUNDLE_FORMAT_VERSION = 1
+
+# Batches up to this size use the compiled tree arrays; sklearn's own predict wins on larger ones
+COMPILED_MAX_ROWS = 64
+
+# Hyperparameter ranges sampled by search_hyperparameters
+SEARCH_SPACES = {
+    'random_forest': (RandomForestRegressor, {
+        'n_estimators': [25, 50, 100, 200],
+        'max_depth': [6, 10, 14, 20],
+        'min_samples_leaf': [1, 2, 5, 10],
+        'max_features': [1.0, 0.6, 0.3]
+    }),
+    'gradient_boosting': (GradientBoostingRegressor, {
+        'n_estimators': [50, 100, 200, 400],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_depth': [2, 3, 4, 5],
+        'subsample': [1.0, 0.8]
+    }),
+    'neural_network': (MLPRegressor, {
+        'hidden_layer_sizes': [(32,), (64, 32), (50, 25, 10), (100, 50)],
+        'alpha': [1e-4, 1e-3, 1e-2],
+        'learning_rate_init': [1e-3, 3e-3],
+        'max_iter': [500]
+    })
+}
+
+# Rows per chunk when generating synthetic data incrementally
+SYNTHETIC_CHUNK_ROWS = 100000
+
+# Bump when the synthetic data or engineered features change, so cached matrices are not reused
+SYNTHETIC_DATA_VERSION = 2
+FEATURE_ENGINEERING_VERSION = 1
+
+# Size cap of the on-disk cache of engineered training matrices
+FEATURE_STORE_MAX_BYTES = 2 * 1024 ** 3
+
+# Share of held-out prices that low_estimate..high_estimate is calibrated to cover
+INTERVAL_COVERAGE = 0.9
+# Training rows the quantile models behind non-forest intervals are fitted on (sampled beyond this)
+INTERVAL_FIT_ROWS = 20000
+# Interval entries holding compiled quantile trees, saved as arrays in the bundle rather than in the JSON metadata
+INTERVAL_TREES = ('low_trees', 'high_trees')
+
+# Synthetic rows profiled as the drift reference of models saved without a feature profile
+DRIFT_PROFILE_ROWS = 10000
+
+
+def _minor_release(version: str) -> Tuple[str, ...]:
+    """The major.minor part of a version string, e.g. ('1', '4') for '1.4.2'"""
+    return tuple(str(version).split('.')[:2])
+
+
 class AdvancedMLPricingModel:
     """Advanced ML pricing model with neural networks and feature engineering"""
 
-    def __init__(self, model_dir='ml_models'):
+    def __init__(self, model_dir='ml_models', feature_store_bytes: int = FEATURE_STORE_MAX_BYTES):
         self.model_dir = model_dir
         self.models = {}
         self.scalers = {}
         self.feature_selectors = {}
-        self.label_encoders = {}
+        self._inference_plans = {}
+        self.intervals = {}
+        self.feature_profiles = {}
+        self._synthetic_profile = None
+        self.version = 0  # Bumped whenever the in-memory models change
         os.makedirs(model_dir, exist_ok=True)
+        self.registry = ModelRegistry(model_dir)
+        self.feature_store = FeatureStore(os.path.join(model_dir, 'feature_store'), feature_store_bytes)
 
-    def generate_synthetic_data(self, num_samples: int = 10000) -> pd.DataFrame:
+    def generate_synthetic_data(self, num_samples: int = 10000, seed: int = 42) -> pd.DataFrame:
         """Generate synthetic training data for pricing model"""
-        np.random.seed(42)
+        if num_samples <= 0:
+            return self._synthetic_chunk(np.random.default_rng(seed), 0)
+        return pd.concat(self.iter_synthetic_data(num_samples, seed=seed), ignore_index=True)
+
+    def synthetic_matrix(self, num_samples: int, seed: int = 42, chunk_size: int = SYNTHETIC_CHUNK_ROWS,
+                         dtype=np.float32) -> Tuple[np.ndarray, np.ndarray]:
+        """FEATURE_COLUMNS and prices of the synthetic data, filled chunk by chunk into preallocated arrays
+
+        Holds at most one chunk as a DataFrame, so peak memory is the matrix
+        itself rather than a full frame plus its copy.
+        """
+        X = np.empty((max(num_samples, 0), len(FEATURE_COLUMNS)), dtype=dtype)
+        y = np.empty(max(num_samples, 0), dtype=np.float64)
+
+        start = 0
+        for df in self.iter_synthetic_data(num_samples, chunk_size, seed):
+            stop = start + len(df)
+            X[start:stop] = df[FEATURE_COLUMNS].to_numpy(dtype=dtype)
+            y[start:stop] = df['price'].to_numpy(dtype=np.float64)
+            start = stop
+
+        return X, y
+
+    def iter_synthetic_data(self, num_samples: int, chunk_size: int = SYNTHETIC_CHUNK_ROWS,
+                            seed: int = 42) -> Iterator[pd.DataFrame]:
+        """Yield synthetic training data in chunks of at most chunk_size rows
+
+        Uses its own np.random.Generator, so the global NumPy random state is
+        left alone and only one chunk is ever in memory.
+        """
+        rng = np.random.default_rng(seed)
+
+        for start in range(0, num_samples, chunk_size):
+            yield self._synthetic_chunk(rng, min(chunk_size, num_samples - start))
+
+    def _synthetic_chunk(self, rng: np.random.Generator, size: int) -> pd.DataFrame:
+        """One chunk of size synthetic rows with engineered features and prices"""
 
         # Base features
         data = {
-            'job_type': np.random.choice(['HVAC', 'plumbing', 'electrical', 'roofing'], num_samples),
-            'location': np.random.choice(['CA', 'NY', 'TX', 'FL', 'IL', 'WA'], num_samples),
-            'complexity': np.random.choice(['low', 'medium', 'high'], num_samples),
-            'square_feet': np.random.uniform(100, 5000, num_samples),
-            'materials_cost': np.random.uniform(50, 2000, num_samples),
-            'labor_hours': np.random.uniform(1, 40, num_samples),
-            'season': np.random.choice(['spring', 'summer', 'fall', 'winter'], num_samples),
-            'urgency': np.random.choice(['normal', 'rush', 'emergency'], num_samples),
-            'year': np.random.choice(range(2020, 2025), num_samples)
+            'job_type': rng.choice(['HVAC', 'plumbing', 'electrical', 'roofing'], size),
+            'location': rng.choice(['CA', 'NY', 'TX', 'FL', 'IL', 'WA'], size),
+            'complexity': rng.choice(['low', 'medium', 'high'], size),
+            'square_feet': rng.uniform(100, 5000, size),
+            'materials_cost': rng.uniform(50, 2000, size),
+            'labor_hours': rng.uniform(1, 40, size),
+            'season': rng.choice(['spring', 'summer', 'fall', 'winter'], size),
+            'urgency': rng.choice(['normal', 'rush', 'emergency'], size),
+            'year': rng.integers(2020, 2025, size)
         }
 
         df = pd.DataFrame(data)
@@ -49,10 +166,31 @@ class AdvancedMLPricingModel:
         df = self._add_engineered_features(df)
 
         # Generate target prices based on features
-        df['price'] = self._calculate_realistic_prices(df)
+        df['price'] = self._calculate_realistic_prices(df, rng)
 
         return df
 
+    def write_synthetic_shards(self, shard_dir: str, num_samples: int, chunk_size: int = SYNTHETIC_CHUNK_ROWS,
+                               seed: int = 42) -> List[str]:
+        """Write synthetic data to .npy shards of FEATURE_COLUMNS plus the price as the last column"""
+        os.makedirs(shard_dir, exist_ok=True)
+
+        paths = []
+        for i, df in enumerate(self.iter_synthetic_data(num_samples, chunk_size, seed)):
+            path = os.path.join(shard_dir, f'shard_{i:05d}.npy')
+            np.save(path, df[FEATURE_COLUMNS + ['price']].to_numpy(dtype=np.float64))
+            paths.append(path)
+
+        logger.info(f"Wrote {num_samples} synthetic rows to {len(paths)} shards in {shard_dir}")
+        return paths
+
+    def iter_synthetic_shards(self, shard_dir: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (features, prices) from each shard, memory-mapped rather than read into RAM"""
+        for filename in sorted(os.listdir(shard_dir)):
+            if filename.startswith('shard_') and filename.endswith('.npy'):
+                shard = np.load(os.path.join(shard_dir, filename), mmap_mode='r')
+                yield shard[:, :-1], shard[:, -1]
+
     def _add_engineered_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Add engineered features for better model performance"""
 
@@ -89,7 +227,7 @@ class AdvancedMLPricingModel:
 
         return df
 
-    def _calculate_realistic_prices(self, df: pd.DataFrame) -> np.ndarray:
+    def _calculate_realistic_prices(self, df: pd.DataFrame, rng: np.random.Generator = None) -> np.ndarray:
         """Calculate realistic target prices based on features"""
         base_price = (df['materials_cost'] * 1.5 +  # 50% markup on materials
                      df['labor_hours'] * 75 * df['location_multiplier'] +  # Labor cost
@@ -103,7 +241,7 @@ class AdvancedMLPricingModel:
                       (1 + df['year_trend']))
 
         # Add some noise
-        noise = np.random.normal(0, 0.1, len(final_price))
+        noise = (rng if rng is not None else np.random.default_rng()).normal(0, 0.1, len(final_price))
         final_price = final_price * (1 + noise)
 
         return final_price
@@ -112,14 +250,15 @@ class AdvancedMLPricingModel:
         """Preprocess data for ML models"""
 
         # Separate features and target
-        feature_cols = ['square_feet', 'materials_cost', 'labor_hours',
-                       'location_multiplier', 'complexity_multiplier',
-                       'season_multiplier', 'urgency_multiplier',
-                       'cost_per_sqft', 'labor_efficiency', 'year_trend']
-
-        X = df[feature_cols].values
+        X = df[FEATURE_COLUMNS].values
         y = df['price'].values
 
+        X_selected, preprocessing_info = self._fit_preprocessing(X, y)
+        return X_selected, y, preprocessing_info
+
+    def _fit_preprocessing(self, X: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, Dict]:
+        """Fit the scaler and feature selector on a raw feature matrix"""
+
         # Scale features
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
@@ -128,21 +267,76 @@ class AdvancedMLPricingModel:
         selector = SelectKBest(f_regression, k=min(8, X_scaled.shape[1]))
         X_selected = selector.fit_transform(X_scaled, y)
 
-        # Store preprocessing objects
+        # Store preprocessing objects, and the raw feature distribution for drift monitoring
         preprocessing_info = {
             'scaler': scaler,
             'selector': selector,
-            'feature_columns': feature_cols
+            'feature_columns': list(FEATURE_COLUMNS),
+            'feature_profile': profile_features(X, FEATURE_COLUMNS)
         }
 
-        return X_selected, y, preprocessing_info
+        return X_selected, preprocessing_info
 
-    def train_models(self, test_size: float = 0.2, random_state: int = 42):
-        """Train multiple ML models and select the best one"""
+    def _synthetic_source(self, num_samples: int, seed: int) -> Dict[str, Any]:
+        return {'kind': 'synthetic', 'num_samples': num_samples, 'seed': seed, 'generator': SYNTHETIC_DATA_VERSION}
+
+    def training_matrix(self, num_samples: int, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+        """Engineered synthetic feature matrix and prices, memory-mapped from the feature store
+
+        The float32 matrix is generated chunk by chunk and stored on the first
+        request for a given size, seed and feature spec; later training, CV and
+        search runs reuse it.
+        """
+
+        key = self.feature_store.key(
+            self._synthetic_source(num_samples, seed),
+            {'columns': FEATURE_COLUMNS, 'engineering': FEATURE_ENGINEERING_VERSION}
+        )
+
+        return self.feature_store.get_or_compute(key, lambda: self.synthetic_matrix(num_samples, seed=seed),
+                                                 {'num_samples': num_samples, 'seed': seed})
+
+    def training_data(self, num_samples: int, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+        """Synthetic training matrix followed by every priced row stored by retrain_model
+
+        With stored rows, the combined matrix is cached in the feature store
+        under the synthetic source plus the stored files' size and mtime, so
+        the copy is made once per new batch of rows rather than on every call.
+        """
+        stored_rows = self.training_row_count()
+        if stored_rows == 0:
+            return self.training_matrix(num_samples, seed=seed)
+
+        features_stat = os.stat(self._training_rows_paths()[0])
+        key = self.feature_store.key(
+            {**self._synthetic_source(num_samples, seed), 'stored_rows': stored_rows,
+             'stored_size': features_stat.st_size, 'stored_mtime_ns': features_stat.st_mtime_ns},
+            {'columns': FEATURE_COLUMNS, 'engineering': FEATURE_ENGINEERING_VERSION}
+        )
 
-        # Generate training data
-        df = self.generate_synthetic_data(15000)
-        X, y, preprocessing_info = self.preprocess_data(df)
+        def combine():
+            X, y = self.training_matrix(num_samples, seed=seed)
+            X_stored, y_stored = self.load_training_rows()
+            return np.vstack([X, X_stored.astype(X.dtype)]), np.concatenate([y, y_stored])
+
+        return self.feature_store.get_or_compute(key, combine,
+                                                 {'num_samples': num_samples, 'seed': seed, 'stored_rows': stored_rows})
+
+    def train_models(self, test_size: float = 0.2, random_state: int = 42, n_cores: int = None,
+                     num_samples: int = TRAINING_SAMPLES, progress: Callable[[float, str], None] = None):
+        """Train multiple ML models and select the best one
+
+        Candidates and their CV folds are fitted in parallel on up to n_cores
+        cores (all cores by default). progress, if given, is called with the
+        fraction done and the current stage.
+        """
+
+        report = progress or (lambda fraction, stage: None)
+        report(0.0, 'generating data')
+
+        # Generate training data, plus the priced rows earlier retrains stored
+        X_raw, y = self.training_data(num_samples)
+        X, preprocessing_info = self._fit_preprocessing(X_raw, y)
 
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(
@@ -165,82 +359,319 @@ class AdvancedMLPricingModel:
             )
         }
 
-        results = {}
-
-        for name, model in models.items():
-            # Train model
-            model.fit(X_train, y_train)
-
-            # Evaluate model
-            train_score = model.score(X_train, y_train)
-            test_score = model.score(X_test, y_test)
-            cv_scores = cross_val_score(model, X, y, cv=5)
-
-            y_pred = model.predict(X_test)
-            mse = mean_squared_error(y_test, y_pred)
-            rmse = np.sqrt(mse)
-            r2 = r2_score(y_test, y_pred)
+        report(0.05, 'training')
+        orchestrator = TrainingOrchestrator(n_cores)
+        results = orchestrator.fit_candidates(
+            models, X_train, y_train, X_test, y_test, X, y, cv=5,
+            progress=lambda done, total: report(0.05 + 0.85 * done / total, 'training')
+        )
 
-            results[name] = {
-                'model': model,
-                'train_r2': train_score,
-                'test_r2': test_score,
-                'cv_r2_mean': cv_scores.mean(),
-                'cv_r2_std': cv_scores.std(),
-                'rmse': rmse,
-                'r2': r2
-            }
+        report(0.9, 'saving')
 
-            logger.info(f"{name}: Train R²={train_score:.3f}, Test R²={test_score:.3f}, RMSE=${rmse:.2f}")
+        for name, result in results.items():
+            logger.info(f"{name}: Train R²={result['train_r2']:.3f}, Test R²={result['test_r2']:.3f}, "
+                        f"RMSE=${result['rmse']:.2f}, wall={result['wall_seconds']:.1f}s, "
+                        f"cpu={result['cpu_seconds']:.1f}s")
 
-            # Save model
-            self.save_model(name, model, preprocessing_info)
+            # Calibrate the prediction interval on the held-out split, then save and register
+            self.intervals[name] = self._fit_interval(result['model'], X_train, y_train, X_test, y_test)
+            self.feature_profiles[name] = preprocessing_info['feature_profile']
+            self.save_model(name, result['model'], preprocessing_info, self.intervals[name])
+            self.registry.register(name, metrics={
+                'test_r2': float(result['test_r2']),
+                'cv_r2_mean': float(result['cv_r2_mean']),
+                'rmse': float(result['rmse']),
+                'training_rows': len(X_raw)
+            })
 
         # Select best model
         best_model = max(results.keys(),
                         key=lambda x: (results[x]['test_r2'], results[x]['cv_r2_mean']))
 
+        # Every candidate shares the same preprocessing
         self.models = {name: results[name]['model'] for name in models.keys()}
-        self.scalers[best_model] = preprocessing_info['scaler']
-        self.feature_selectors[best_model] = preprocessing_info['selector']
+        self.scalers = {name: preprocessing_info['scaler'] for name in models.keys()}
+        self.feature_selectors = {name: preprocessing_info['selector'] for name in models.keys()}
+        self.registry.promote(best_model)
+        self.version += 1
 
-        logger.info(f"Best model selected: {best_model}")
+        logger.info(f"Best model selected and promoted: {best_model}")
+        report(1.0, 'done')
 
         return results, best_model
 
+    def search_hyperparameters(self, time_budget: float = 300, n_cores: int = None, n_candidates: int = 27,
+                               num_samples: int = TRAINING_SAMPLES, random_state: int = 42,
+                               latency_weight: float = 0.01, max_latency_ms: float = 5.0,
+                               progress: Callable[[float, str], None] = None):
+        """Successive-halving search over SEARCH_SPACES within a wall-clock budget
+
+        Candidates are ranked on validation R² less a per-millisecond penalty for
+        single-row latency. The winner is scored on the test split, saved and
+        registered as tuned_<family>, and promoted if it beats the champion.
+        """
+
+        report = progress or (lambda fraction, stage: None)
+        report(0.0, 'generating data')
+
+        X_raw, y = self.training_data(num_samples, seed=random_state)
+        X, preprocessing_info = self._fit_preprocessing(X_raw, y)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=random_state)
+        X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=random_state)
+
+        # Sample candidates round-robin across the model families
+        rng = np.random.default_rng(random_state)
+        families = list(SEARCH_SPACES)
+        configs = []
+        for i in range(n_candidates):
+            family = families[i % len(families)]
+            estimator_class, space = SEARCH_SPACES[family]
+            params = {key: values[rng.integers(len(values))] for key, values in space.items()}
+            configs.append((family, params, estimator_class(random_state=random_state, **params)))
+
+        search = SuccessiveHalvingSearch(time_budget, n_cores, latency_weight=latency_weight,
+                                         max_latency_ms=max_latency_ms)
+        outcome = search.run([estimator for _, _, estimator in configs], X_fit, y_fit, X_val, y_val,
+                             random_state, progress=lambda fraction, stage: report(0.05 + 0.8 * fraction, stage))
+
+        # Refit the winner on the full training split and score it on the untouched test split
+        report(0.85, 'refitting winner')
+        family, params, estimator = configs[outcome['winner']]
+        model = clone(estimator).fit(X_train, y_train)
+        test_r2 = r2_score(y_test, model.predict(X_test))
+        name = f'tuned_{family}'
+
+        champion = self.registry.champion
+        champion_r2 = (self.registry.get(champion) or {}).get('metrics', {}).get('test_r2') if champion else None
+        # Re-saving the champion's own name replaces the served artifact, so it is re-pinned regardless
+        promoted = bool(champion_r2 is None or champion == name or test_r2 > champion_r2)
+
+        self.intervals[name] = self._fit_interval(model, X_train, y_train, X_test, y_test)
+        self.feature_profiles[name] = preprocessing_info['feature_profile']
+        self.save_model(name, model, preprocessing_info, self.intervals[name])
+        self.registry.register(name, metrics={
+            'test_r2': float(test_r2),
+            'latency_ms': float(outcome['winner_trial']['latency_ms']),
+            'rmse': float(np.sqrt(mean_squared_error(y_test, model.predict(X_test)))),
+            'training_rows': len(X_raw)
+        })
+        self.models[name] = model
+        self.scalers[name] = preprocessing_info['scaler']
+        self.feature_selectors[name] = preprocessing_info['selector']
+
+        if promoted:
+            self.registry.promote(name)
+        self.version += 1
+
+        logger.info(f"Tuned {name} {params}: test R²={test_r2:.3f}" + (", promoted" if promoted else ""))
+        report(1.0, 'done')
+
+        return {
+            'model': name,
+            'params': {key: list(value) if isinstance(value, tuple) else value for key, value in params.items()},
+            'test_r2': float(test_r2),
+            'promoted': promoted,
+            'rungs_completed': outcome['rungs_completed'],
+            'rungs_planned': outcome['rungs_planned'],
+            # Candidates over the latency cap score -inf, which is not valid JSON
+            'trials': [dict(trial, family=configs[trial['trial']][0],
+                            score=float(trial['score']) if np.isfinite(trial['score']) else None)
+                       for trial in outcome['trials']]
+        }
+
     def predict_price(self, features: Dict[str, Any], model_type: str = 'best') -> Dict[str, float]:
         """Predict price using trained model"""
 
-        if model_type == 'best':
-            # Use the best performing model
-            model_files = [f for f in os.listdir(self.model_dir) if f.endswith('.pkl')]
-            if not model_files:
-                raise ValueError("No trained models found. Please train models first.")
-            model_type = max(model_files, key=lambda x: os.path.getctime(os.path.join(self.model_dir, x))).replace('.pkl', '')
+        feature_vector = self.prepare_feature_vector(features)
+        predictions = self.predict_prices(feature_vector[np.newaxis, :], model_type)
 
-        if model_type not in self.models:
-            self.load_model(model_type)
+        return {
+            'predicted_price': float(predictions['predicted_price'][0]),
+            'low_estimate': float(predictions['low_estimate'][0]),
+            'high_estimate': float(predictions['high_estimate'][0]),
+            'confidence_score': float(predictions['confidence_score'][0]),
+            'model_used': predictions['model_used']
+        }
 
-        model = self.models[model_type]
+    def predict_prices(self, features, model_type: str = 'best') -> Dict[str, Any]:
+        """Predict prices for a batch of jobs in one pass through scaler, selector and model
 
-        # Prepare features
-        feature_vector = self._prepare_feature_vector(features)
+        Accepts a DataFrame (derived columns are computed if missing) or an
+        ndarray of raw features in FEATURE_COLUMNS order.
+        """
 
-        # Make prediction
-        predicted_price = model.predict([feature_vector])[0]
+        model_type = self._resolve_model_type(model_type)
 
-        # Calculate confidence intervals
-        confidence = self._calculate_confidence_interval(model, feature_vector)
+        X = self._transform_features(model_type, self.raw_feature_matrix(features))
+        predicted, low, high = self._predict_with_interval(model_type, X)
 
         return {
-            'predicted_price': round(predicted_price, 2),
-            'low_estimate': round(predicted_price * 0.85, 2),
-            'high_estimate': round(predicted_price * 1.15, 2),
-            'confidence_score': confidence,
+            'predicted_price': np.round(predicted, 2),
+            'low_estimate': np.round(low, 2),
+            'high_estimate': np.round(high, 2),
+            'confidence_score': np.round(self._confidence_scores(predicted, low, high), 3),
             'model_used': model_type
         }
 
-    def _prepare_feature_vector(self, features: Dict[str, Any]) -> np.ndarray:
+    def _predict_with_interval(self, model_type: str, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Predictions with a ~90% interval, computed in the same pass over the batch
+
+        Forests use the spread of their per-tree predictions, scaled so that it
+        covered the held-out residuals; other models use conformalized 5%/95%
+        quantile regression trees. Both widen with the uncertainty of each row.
+        Models saved with fixed relative residual quantiles still use those,
+        and models saved without interval data keep ±15%.
+        """
+
+        model = self.models[model_type]
+        plan = self._inference_plan(model_type)
+        compiled = plan['compiled']
+        interval = self.intervals.get(model_type)
+        small_batch = compiled is not None and len(X) <= COMPILED_MAX_ROWS
+
+        if interval is not None and interval['method'] == 'tree_spread' and isinstance(model, RandomForestRegressor):
+            per_tree = compiled.predict_per_tree(X) if small_batch else forest_tree_predictions(model, X)
+            predicted = per_tree.mean(axis=1)
+            margin = interval['spread_scale'] * per_tree.std(axis=1)
+            return predicted, predicted - margin, predicted + margin
+
+        predicted = compiled.predict(X) if small_batch else model.predict(X)
+        if interval is not None and interval['method'] == 'quantile_trees':
+            low = interval['low_trees'].predict(X) - interval['correction']
+            high = interval['high_trees'].predict(X) + interval['correction']
+            return predicted, np.minimum(low, predicted), np.maximum(high, predicted)
+        if interval is not None and interval['method'] == 'residual_quantiles':
+            return predicted, predicted * (1 + interval['low']), predicted * (1 + interval['high'])
+        return predicted, predicted * 0.85, predicted * 1.15
+
+    def _fit_interval(self, model, X_train: np.ndarray, y_train: np.ndarray, X_test: np.ndarray, y_test: np.ndarray,
+                      coverage: float = INTERVAL_COVERAGE, random_state: int = 42) -> Dict[str, Any]:
+        """Fit a model's prediction interval on the training split and calibrate it on held-out data
+
+        Other models than forests get a pair of quantile gradient boosting
+        models for the interval's lower and upper ends. Their held-out
+        conformity scores give the correction that makes the interval reach
+        the coverage (conformalized quantile regression).
+        """
+
+        if isinstance(model, RandomForestRegressor):
+            per_tree = forest_tree_predictions(model, X_test)
+            spread = np.maximum(per_tree.std(axis=1), 1e-9)
+            scale = np.quantile(np.abs(y_test - per_tree.mean(axis=1)) / spread, coverage)
+            return {'method': 'tree_spread', 'spread_scale': float(scale), 'coverage': coverage}
+
+        if len(X_train) > INTERVAL_FIT_ROWS:
+            sample = np.random.default_rng(random_state).choice(len(X_train), INTERVAL_FIT_ROWS, replace=False)
+            X_train, y_train = X_train[sample], y_train[sample]
+
+        quantiles = [(1 - coverage) / 2, (1 + coverage) / 2]
+        low_trees, high_trees = (
+            compile_ensemble(GradientBoostingRegressor(loss='quantile', alpha=alpha, n_estimators=100, max_depth=3,
+                                                       random_state=random_state).fit(X_train, y_train))
+            for alpha in quantiles
+        )
+
+        conformity = np.maximum(low_trees.predict(X_test) - y_test, y_test - high_trees.predict(X_test))
+        level = min(1.0, np.ceil((len(y_test) + 1) * coverage) / len(y_test))
+        return {
+            'method': 'quantile_trees',
+            'quantiles': quantiles,
+            'correction': float(np.quantile(conformity, level)),
+            'coverage': coverage,
+            'low_trees': low_trees,
+            'high_trees': high_trees
+        }
+
+    def _confidence_scores(self, predicted: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Confidence from interval width relative to the price: ±15% scores 0.85, capped at 0.95"""
+        relative_width = (high - low) / np.maximum(np.abs(predicted), 1e-9)
+        return np.clip(1 - relative_width / 2, 0.0, 0.95)
+
+    def raw_feature_matrix(self, features) -> np.ndarray:
+        """Get an (n_rows, len(FEATURE_COLUMNS)) float matrix from a DataFrame or ndarray"""
+
+        if isinstance(features, pd.DataFrame):
+            if all(col in features.columns for col in FEATURE_COLUMNS):
+                return features[FEATURE_COLUMNS].to_numpy(dtype=float)
+            return self.prepare_feature_matrix({col: features[col].to_numpy() for col in features.columns})
+
+        X = np.asarray(features, dtype=float)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.ndim != 2 or X.shape[1] != len(FEATURE_COLUMNS):
+            raise ValueError(f"Expected a feature matrix with {len(FEATURE_COLUMNS)} columns, got shape {X.shape}")
+        return X
+
+    def _transform_features(self, model_type: str, X: np.ndarray) -> np.ndarray:
+        """Apply the scaler and feature selector the model was trained behind"""
+
+        plan = self._inference_plan(model_type)
+        # Same arithmetic as StandardScaler.transform and SelectKBest.transform, minus their input checks
+        return ((X - plan['mean']) / plan['scale'])[:, plan['columns']]
+
+    def _inference_plan(self, model_type: str, compiled: CompiledTreeEnsemble = None) -> Dict[str, Any]:
+        """Preprocessing arrays and the compiled tree ensemble for a model, rebuilt when it changes"""
+
+        model = self.models[model_type]
+        plan = self._inference_plans.get(model_type)
+        if plan is not None and plan['model'] is model:
+            return plan
+
+        scaler = self.scalers.get(model_type)
+        selector = self.feature_selectors.get(model_type)
+        plan = {
+            'model': model,
+            'mean': scaler.mean_ if scaler is not None and scaler.mean_ is not None else 0.0,
+            'scale': scaler.scale_ if scaler is not None and scaler.scale_ is not None else 1.0,
+            'columns': selector.get_support(indices=True) if selector is not None else slice(None),
+            'compiled': compiled if compiled is not None else compile_ensemble(model)
+        }
+        self._inference_plans[model_type] = plan
+        return plan
+
+    def measure_prediction_throughput(self, batch_sizes: Tuple[int, ...] = (1, 10, 100, 1000, 10000, 100000),
+                                      model_type: str = 'best', repeats: int = 3) -> List[Dict[str, Any]]:
+        """Measure batch prediction throughput (rows/sec) at each batch size"""
+
+        model_type = self._resolve_model_type(model_type)
+        X, _ = self.synthetic_matrix(max(batch_sizes), dtype=np.float64)
+        self.predict_prices(X[:1], model_type)  # Warm up
+
+        results = []
+        for batch_size in batch_sizes:
+            batch = X[:batch_size]
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                self.predict_prices(batch, model_type)
+                best = min(best, time.perf_counter() - start)
+
+            results.append({
+                'model': model_type,
+                'batch_size': batch_size,
+                'seconds': best,
+                'rows_per_sec': round(batch_size / best, 1)
+            })
+            logger.info(f"{model_type} batch={batch_size}: {batch_size / best:,.0f} rows/sec")
+
+        return results
+
+    def _resolve_model_type(self, model_type: str) -> str:
+        """Resolve 'best' to a concrete model name and make sure it is loaded"""
+
+        if model_type == 'best':
+            # The registry's champion, pinned until something is promoted
+            model_type = self.registry.champion
+            if model_type is None:
+                raise ValueError("No trained models found. Please train models first.")
+
+        if model_type not in self.models:
+            self.load_model(model_type)
+
+        return model_type
+
+    @staticmethod
+    def prepare_feature_vector(features: Dict[str, Any]) -> np.ndarray:
         """Prepare feature vector from input features"""
 
         # Create base feature vector with defaults
@@ -259,46 +690,171 @@ class AdvancedMLPricingModel:
 
         return np.array(list(base_features.values()))
 
-    def _calculate_confidence_interval(self, model, feature_vector: np.ndarray, confidence: float = 0.95) -> float:
-        """Calculate confidence score for prediction"""
-        # Simple confidence based on model performance
-        # In production, use prediction intervals or bootstrap methods
-        return min(confidence, 0.95)
+    def prepare_feature_matrix(self, features: Dict[str, Any]) -> np.ndarray:
+        """Prepare a feature matrix from columns of input features (arrays or scalars)"""
+
+        square_feet = np.asarray(features.get('square_feet', 1000), dtype=float)
+        materials_cost = np.asarray(features.get('materials_cost', 500), dtype=float)
+        labor_hours = np.asarray(features.get('labor_hours', 8), dtype=float)
+
+        columns = {
+            'square_feet': square_feet,
+            'materials_cost': materials_cost,
+            'labor_hours': labor_hours,
+            'location_multiplier': features.get('location_multiplier', 1.0),
+            'complexity_multiplier': features.get('complexity_multiplier', 1.0),
+            'season_multiplier': features.get('season_multiplier', 1.0),
+            'urgency_multiplier': features.get('urgency_multiplier', 1.0),
+            'cost_per_sqft': materials_cost / square_feet,
+            'labor_efficiency': labor_hours / square_feet,
+            'year_trend': features.get('year_trend', 0.1)
+        }
 
-    def save_model(self, name: str, model, preprocessing_info: Dict):
-        """Save trained model and preprocessing objects"""
+        arrays = np.broadcast_arrays(*(np.asarray(columns[col], dtype=float) for col in FEATURE_COLUMNS))
+        return np.column_stack([np.atleast_1d(a) for a in arrays])
 
-        model_path = os.path.join(self.model_dir, f'{name}.pkl')
-        scaler_path = os.path.join(self.model_dir, f'{name}_scaler.pkl')
-        selector_path = os.path.join(self.model_dir, f'{name}_selector.pkl')
+    def save_model(self, name: str, model, preprocessing_info: Dict, interval: Dict[str, Any] = None):
+        """Save trained model, preprocessing objects and metadata as one bundle
 
-        joblib.dump(model, model_path)
-        joblib.dump(preprocessing_info['scaler'], scaler_path)
-        joblib.dump(preprocessing_info['selector'], selector_path)
+        The bundle also carries the compiled tree arrays of the model and of its
+        interval's quantile models, so a memory-mapped load needs no
+        recompilation. The metadata is additionally written as JSON for
+        inspection.
+        """
 
-        # Save model metadata
+        interval = interval or {}
         metadata = {
             'model_name': name,
             'training_date': datetime.now().isoformat(),
             'feature_columns': preprocessing_info['feature_columns']
         }
+        if interval:
+            metadata['interval'] = {key: value for key, value in interval.items() if key not in INTERVAL_TREES}
+        if preprocessing_info.get('feature_profile') is not None:
+            metadata['feature_profile'] = preprocessing_info['feature_profile']
+
+        compiled = compile_ensemble(model)
+        bundle = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'model': model,
+            'scaler': preprocessing_info['scaler'],
+            'selector': preprocessing_info['selector'],
+            'metadata': metadata,
+            'compiled': compiled.to_arrays() if compiled is not None else None,
+            'interval_trees': {key: interval[key].to_arrays() for key in INTERVAL_TREES if key in interval}
+        }
+
+        # Write to a temporary file first so readers never see a partial bundle.
+        # Uncompressed, so the arrays inside can be memory-mapped on load.
+        bundle_path = os.path.join(self.model_dir, f'{name}.joblib')
+        joblib.dump(bundle, f'{bundle_path}.tmp')
+        os.replace(f'{bundle_path}.tmp', bundle_path)
 
         with open(os.path.join(self.model_dir, f'{name}_metadata.json'), 'w') as f:
             json.dump(metadata, f, indent=2)
 
-    def load_model(self, name: str):
-        """Load trained model and preprocessing objects"""
-
-        model_path = os.path.join(self.model_dir, f'{name}.pkl')
-        scaler_path = os.path.join(self.model_dir, f'{name}_scaler.pkl')
-        selector_path = os.path.join(self.model_dir, f'{name}_selector.pkl')
-
-        if not all(os.path.exists(p) for p in [model_path, scaler_path, selector_path]):
-            raise FileNotFoundError(f"Model files not found for {name}")
-
-        self.models[name] = joblib.load(model_path)
-        self.scalers[name] = joblib.load(scaler_path)
-        self.feature_selectors[name] = joblib.load(selector_path)
+    def load_model(self, name: str, mmap_mode: str = None):
+        """Load trained model and preprocessing objects
+
+        With mmap_mode='r' the NumPy arrays inside the artifacts (compiled tree
+        node tables, network weights) are memory-mapped rather than copied, so
+        processes forked after loading share those pages. Models saved before
+        bundles existed are loaded from their separate pickles.
+        """
+
+        bundle_path = self.registry.artifact_path(name, 'bundle')
+        if bundle_path is not None and os.path.exists(bundle_path):
+            bundle = joblib.load(bundle_path, mmap_mode=mmap_mode)
+            if bundle.get('format_version') != BUNDLE_FORMAT_VERSION:
+                raise ValueError(f"Model bundle {bundle_path} has an unsupported format")
+            saved_version = bundle.get('sklearn_version')
+            # Pickles are only compatible within a scikit-learn minor release; patch releases just warn
+            if _minor_release(saved_version) != _minor_release(sklearn.__version__):
+                raise ValueError(f"Model bundle {bundle_path} was saved with scikit-learn {saved_version}")
+            if saved_version != sklearn.__version__:
+                logger.warning(f"Model bundle {bundle_path} was saved with scikit-learn {saved_version}, "
+                               f"running {sklearn.__version__}")
+
+            model, scaler, selector = bundle['model'], bundle['scaler'], bundle['selector']
+            metadata = bundle['metadata']
+            compiled = CompiledTreeEnsemble.from_arrays(bundle['compiled']) if bundle['compiled'] else None
+            interval_trees = {key: CompiledTreeEnsemble.from_arrays(arrays)
+                              for key, arrays in (bundle.get('interval_trees') or {}).items()}
+        else:
+            paths = [self.registry.artifact_path(name, artifact) for artifact in ('model', 'scaler', 'selector')]
+            if not all(p is not None and os.path.exists(p) for p in paths):
+                raise FileNotFoundError(f"Model files not found for {name}")
+
+            model, scaler, selector = (joblib.load(p, mmap_mode=mmap_mode) for p in paths)
+            metadata_path = self.registry.artifact_path(name, 'metadata')
+            metadata = {}
+            if metadata_path is not None and os.path.exists(metadata_path):
+                with open(metadata_path, 'r') as f:
+                    metadata = json.load(f)
+            compiled = None
+            interval_trees = {}
+
+        self.models[name] = model
+        self.scalers[name] = scaler
+        self.feature_selectors[name] = selector
+        interval = metadata.get('interval')
+        if interval is not None and interval['method'] == 'quantile_trees':
+            interval = dict(interval, **interval_trees) if interval_trees else None
+        self.intervals[name] = interval
+        self.feature_profiles[name] = metadata.get('feature_profile')
+
+        self._inference_plans.pop(name, None)
+        self._inference_plan(name, compiled)
+        self.version += 1
+
+    def promote_model(self, name: str) -> Dict[str, Any]:
+        """Make a registered model the champion and pin it in memory"""
+
+        champion = self.registry.promote(name)
+        if name not in self.models:
+            self.load_model(name)
+        self.version += 1
+
+        logger.info(f"Promoted {name} v{champion['version']} to champion")
+        return champion
+
+    def preload_models(self, mmap_mode: str = None) -> List[str]:
+        """Load every registered model up front, e.g. in a master process before forking workers
+
+        A model whose artifacts are missing or cannot be loaded (e.g. saved by
+        an incompatible scikit-learn) is logged and skipped, so the server still
+        boots; retrain to replace it.
+        """
+
+        loaded = []
+        for name in sorted(self.registry.manifest['models']):
+            try:
+                self.load_model(name, mmap_mode=mmap_mode)
+                loaded.append(name)
+            except FileNotFoundError as e:
+                logger.warning(f"Skipping preload of {name}: {e}")
+            except Exception as e:
+                logger.error(f"Skipping preload of {name}, retrain to replace it: {e}")
+
+        return loaded
+
+    def feature_profile(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """Distribution of the raw features a model was trained on, the reference for drift monitoring
+
+        Models saved before profiles were recorded were trained on the synthetic
+        generator, so they are compared against a profile of fresh synthetic rows.
+        """
+
+        if name not in self.models:
+            self.load_model(name)
+        if self.feature_profiles.get(name) is not None:
+            return self.feature_profiles[name]
+
+        if self._synthetic_profile is None:
+            X, _ = self.synthetic_matrix(DRIFT_PROFILE_ROWS, dtype=np.float64)
+            self._synthetic_profile = profile_features(X, FEATURE_COLUMNS)
+        return self._synthetic_profile
 
     def get_model_performance(self) -> Dict[str, Any]:
         """Get performance metrics for all models"""
@@ -313,13 +869,165 @@ class AdvancedMLPricingModel:
 
         return performance
 
-    def retrain_model(self, new_data: pd.DataFrame = None):
-        """Retrain models with new data"""
-
+    def training_rows_from(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw feature matrix and prices of priced rows, checked before they are trained on
+
+        Rows carry either every FEATURE_COLUMNS value or the RAW_FEATURE_COLUMNS
+        job fields those are engineered from, plus a price. Missing columns,
+        blank or non-numeric values and unknown categories raise ValueError.
+        """
+
+        if not all(col in df.columns for col in FEATURE_COLUMNS):
+            missing = [col for col in RAW_FEATURE_COLUMNS if col not in df.columns]
+            if missing:
+                raise ValueError(f"Rows are missing columns: {', '.join(missing)}")
+            try:
+                df = self._add_engineered_features(df.copy())
+            except TypeError:
+                raise ValueError(f"Values of {', '.join(RAW_FEATURE_COLUMNS[:3] + ['year'])} must be numbers")
+        if 'price' not in df.columns:
+            raise ValueError("Rows are missing columns: price")
+
+        try:
+            X = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+            y = df['price'].to_numpy(dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError("Feature values and prices must be numbers")
+
+        invalid = np.flatnonzero(~(np.isfinite(X).all(axis=1) & np.isfinite(y)))
+        if len(invalid):
+            raise ValueError(f"Rows {', '.join(map(str, invalid[:10].tolist()))} have blank values or an unknown "
+                             f"location, complexity, season or urgency")
+        return X, y
+
+    def add_training_rows(self, df: pd.DataFrame) -> int:
+        """Store priced rows for the next full training run; returns the number stored"""
+        X, y = self.training_rows_from(df)
+        self._append_training_rows(X, y)
+        return len(X)
+
+    def retrain_model(self, new_data: pd.DataFrame = None, incremental: bool = True, epochs: int = 5):
+        """Retrain models with new data
+
+        Incremental mode updates the saved models on the new rows only: extra
+        warm-started trees for the forest and boosting models (in proportion to
+        the share of new rows) and partial_fit epochs for the neural network,
+        keeping the scaler and selector the models were trained behind. It
+        needs trained models and raises ValueError without them. Otherwise the
+        rows are stored and every model is trained from scratch on the synthetic
+        data plus all stored rows. Either way the rows are kept for later full
+        training runs.
+        """
+
+        stored = new_data is not None
         if new_data is None:
-            new_data = self.generate_synthetic_data(5000)
+            new_data = self.generate_synthetic_data(5000, seed=None)
+        X_new, y_new = self.training_rows_from(new_data)
+
+        if not incremental:
+            if stored:
+                self._append_training_rows(X_new, y_new)
+            logger.info(f"Retraining models from scratch with {self.training_row_count()} stored rows...")
+            return self.train_models()
+
+        if self.registry.champion is None:
+            raise ValueError("No trained models to update; train models first")
 
-        logger.info("Retraining models with new data...")
-        results, best_model = self.train_models()
+        logger.info(f"Incrementally updating models with {len(X_new)} new rows...")
+
+        results = {}
+        updated = {}
+        for name in self.registry.manifest['models']:
+            if name not in self.models:
+                self.load_model(name)
+
+            # Update a copy so concurrent predictions never see a half-updated model
+            model = copy.deepcopy(self.models[name])
+            X = self._transform_features(name, X_new)
+            metrics = dict(self.registry.get(name).get('metrics', {}))
+            trained_rows = metrics.get('training_rows', TRAINING_SAMPLES)
+            share = len(X_new) / (trained_rows + len(X_new))
+            start = time.perf_counter()
+
+            if isinstance(model, MLPRegressor):
+                for _ in range(epochs):
+                    model.partial_fit(X, y_new)
+            else:
+                added = max(1, int(round(model.n_estimators * share)))
+                model.set_params(warm_start=True, n_estimators=model.n_estimators + added)
+                model.fit(X, y_new)
+                model.set_params(warm_start=False)
+
+            y_pred = model.predict(X)
+            results[name] = {
+                'model': model,
+                'new_rows': len(X_new),
+                'new_data_r2': r2_score(y_new, y_pred),
+                'rmse': np.sqrt(mean_squared_error(y_new, y_pred)),
+                'update_seconds': round(time.perf_counter() - start, 3)
+            }
+            updated[name] = model
+
+            self.save_model(name, model, {
+                'scaler': self.scalers[name],
+                'selector': self.feature_selectors[name],
+                'feature_columns': list(FEATURE_COLUMNS),
+                'feature_profile': self.feature_profiles.get(name)
+            }, self.intervals.get(name))
+            metrics.update({
+                'new_data_r2': float(results[name]['new_data_r2']),
+                'rmse': float(results[name]['rmse']),
+                'training_rows': trained_rows + len(X_new)
+            })
+            self.registry.register(name, metrics=metrics)
+
+            logger.info(f"{name}: updated in {results[name]['update_seconds']}s, "
+                        f"R² on new rows={results[name]['new_data_r2']:.3f}")
+
+        if stored:
+            self._append_training_rows(X_new, y_new)
+        self.models.update(updated)
+        self.version += 1
+
+        # Keep serving the current champion, re-pinned to its new version
+        best_model = self.registry.champion
+        self.registry.promote(best_model)
 
         return results, best_model
+
+    def _training_rows_paths(self) -> Tuple[str, str]:
+        return (os.path.join(self.model_dir, 'retrain_features.f64'),
+                os.path.join(self.model_dir, 'retrain_targets.f64'))
+
+    def _append_training_rows(self, X: np.ndarray, y: np.ndarray):
+        """Append priced rows to the stored ones; only the new rows are written"""
+        features_path, targets_path = self._training_rows_paths()
+        with open(features_path, 'ab') as f:
+            np.ascontiguousarray(X, dtype=np.float64).tofile(f)
+        with open(targets_path, 'ab') as f:
+            np.ascontiguousarray(y, dtype=np.float64).tofile(f)
+
+    def training_row_count(self) -> int:
+        """Number of priced rows stored by retrain_model and add_training_rows"""
+        features_path, _ = self._training_rows_paths()
+        if not os.path.exists(features_path):
+            return 0
+        return os.path.getsize(features_path) // (8 * len(FEATURE_COLUMNS))
+
+    def load_training_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Memory-map the stored priced rows (raw features, FEATURE_COLUMNS order) and their prices"""
+        rows = self.training_row_count()
+        if rows == 0:
+            return np.empty((0, len(FEATURE_COLUMNS))), np.empty(0)
+        features_path, targets_path = self._training_rows_paths()
+        X = np.memmap(features_path, dtype=np.float64, mode='r', shape=(rows, len(FEATURE_COLUMNS)))
+        y = np.memmap(targets_path, dtype=np.float64, mode='r', shape=(rows,))
+        return X, y
+
+
+if __name__ == '__main__':
+    # Report batch prediction throughput: python advanced_pricing.py [model_dir]
+    import sys
+    model = AdvancedMLPricingModel(*sys.argv[1:2])
+    for row in model.measure_prediction_throughput():
+        print(f"{row['model']:>20} batch={row['batch_size']:>6}  {row['rows_per_sec']:>14,.0f} rows/sec")
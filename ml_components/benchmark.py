@@ -0,0 +1,244 @@
+import argparse
+import gc
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import sklearn
+from typing import Dict, Any, List, Optional, Sequence
+import logging
+from model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_MODELS = ('random_forest', 'gradient_boosting', 'neural_network')
+BENCHMARK_BATCH_SIZES = (1, 10, 100, 10000)
+
+# A metric regresses when it is this much worse (relative) than the baseline...
+REGRESSION_TOLERANCE = 0.25
+# ...and the absolute change is above the metric's noise floor
+REGRESSION_FLOORS = {
+    'latency_p50_ms': 0.05,
+    'rows_per_sec': 0.0,
+    'load_seconds': 0.02,
+    'resident_bytes': 4 * 1024 ** 2,
+    'artifact_bytes': 0
+}
+
+
+def _resident_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        # Peak rather than current RSS, in KiB on Linux
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _benchmark_model(model_dir: str, name: str, X: np.ndarray, batch_sizes: Sequence[int],
+                     time_limit: float, max_repeats: int, mmap_mode: Optional[str]) -> Dict[str, Any]:
+    """Load one model in this (fresh) process and time predict_prices at each batch size"""
+    from advanced_pricing import AdvancedMLPricingModel
+
+    model = AdvancedMLPricingModel(model_dir)
+    gc.collect()
+    rss_before = _resident_bytes()
+
+    start = time.perf_counter()
+    model.load_model(name, mmap_mode=mmap_mode)
+    load_seconds = time.perf_counter() - start
+    # The first prediction builds the inference plan, which is part of what serving keeps resident
+    model.predict_prices(X[:1], name)
+    resident_bytes = _resident_bytes() - rss_before
+
+    batches = {}
+    for batch_size in batch_sizes:
+        batch = X[:batch_size]
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < max_repeats and (len(timings) < 3 or time.perf_counter() - started < time_limit):
+            t = time.perf_counter()
+            model.predict_prices(batch, name)
+            timings.append(time.perf_counter() - t)
+
+        timings_ms = np.array(timings) * 1000
+        p50, p95, p99 = np.percentile(timings_ms, [50, 95, 99])
+        batches[str(batch_size)] = {
+            'calls': len(timings),
+            'latency_ms': {
+                'p50': round(float(p50), 4),
+                'p95': round(float(p95), 4),
+                'p99': round(float(p99), 4),
+                'mean': round(float(timings_ms.mean()), 4)
+            },
+            'rows_per_sec': round(batch_size / (p50 / 1000), 1)
+        }
+
+    return {'load_seconds': round(load_seconds, 4), 'resident_bytes': int(resident_bytes), 'batches': batches}
+
+
+def artifact_bytes(registry: ModelRegistry, name: str) -> int:
+    """Total size on disk of a registered model's artifacts"""
+    entry = registry.get(name) or {}
+    total = 0
+    for artifact in entry.get('artifacts', {}):
+        path = registry.artifact_path(name, artifact)
+        if path is not None and os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def run_benchmarks(model_dir: str = 'ml_models', models: Sequence[str] = BENCHMARK_MODELS,
+                   batch_sizes: Sequence[int] = BENCHMARK_BATCH_SIZES, time_limit: float = 2.0,
+                   max_repeats: int = 200, mmap_mode: Optional[str] = None,
+                   start_method: str = 'spawn') -> Dict[str, Any]:
+    """Benchmark each registered model in its own process, so load time and memory are not shared
+
+    Latency is timed per predict_prices call at each batch size, repeating for
+    up to time_limit seconds or max_repeats calls (at least 3).
+    """
+    from advanced_pricing import AdvancedMLPricingModel
+
+    pricing_model = AdvancedMLPricingModel(model_dir)
+    registry = pricing_model.registry
+    available = [name for name in models if registry.get(name) is not None]
+    if not available:
+        raise ValueError(f"None of {', '.join(models)} is registered in {model_dir}; train models first")
+
+    X, _ = pricing_model.synthetic_matrix(max(batch_sizes), seed=0, dtype=np.float64)
+
+    results = {}
+    context = multiprocessing.get_context(start_method)
+    for name in available:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(_benchmark_model, model_dir, name, X, batch_sizes,
+                                 time_limit, max_repeats, mmap_mode).result()
+        result['artifact_bytes'] = artifact_bytes(registry, name)
+        results[name] = result
+        single = result['batches'][str(min(batch_sizes))]['latency_ms']
+        logger.info(f"{name}: load {result['load_seconds']:.3f}s, {result['resident_bytes'] / 1024 ** 2:.1f}MB resident, "
+                    f"p50/p99 {single['p50']:.3f}/{single['p99']:.3f}ms per call")
+
+    return {
+        'created_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'model_dir': os.path.abspath(model_dir),
+        'batch_sizes': list(batch_sizes),
+        'mmap_mode': mmap_mode,
+        'skipped': [name for name in models if name not in available],
+        'models': results
+    }
+
+
+def _metrics(result: Dict[str, Any]) -> Dict[str, float]:
+    """The compared metrics of one model, keyed by '<metric>' or '<metric>@<batch size>'"""
+    metrics = {key: result[key] for key in ('load_seconds', 'resident_bytes', 'artifact_bytes')}
+    for batch_size, batch in result['batches'].items():
+        metrics[f'latency_p50_ms@{batch_size}'] = batch['latency_ms']['p50']
+        metrics[f'rows_per_sec@{batch_size}'] = batch['rows_per_sec']
+    return metrics
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    tolerance: float = REGRESSION_TOLERANCE) -> List[Dict[str, Any]]:
+    """Metrics of models in both runs that got worse than the baseline by more than tolerance
+
+    p95/p99 latencies are recorded but not compared, as they are too noisy
+    between runs to gate on.
+    """
+
+    regressions = []
+    for name, result in current['models'].items():
+        if name not in baseline.get('models', {}):
+            continue
+        before = _metrics(baseline['models'][name])
+        for key, value in _metrics(result).items():
+            if key not in before:
+                continue
+            metric = key.split('@')[0]
+            previous = before[key]
+            higher_is_better = metric == 'rows_per_sec'
+            worse_by = previous - value if higher_is_better else value - previous
+            limit = previous * tolerance
+            if worse_by > limit and worse_by > REGRESSION_FLOORS[metric]:
+                regressions.append({
+                    'model': name,
+                    'metric': key,
+                    'baseline': previous,
+                    'current': value,
+                    'change': round(-worse_by / previous if higher_is_better else worse_by / previous, 4) if previous else None
+                })
+
+    return regressions
+
+
+def latest_results(output_dir: str) -> Optional[str]:
+    """Path of the most recent saved benchmark run, if any"""
+    runs = sorted(glob.glob(os.path.join(output_dir, 'benchmark-*.json')))
+    return runs[-1] if runs else None
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the trained pricing models')
+    parser.add_argument('model_dir', nargs='?', default='ml_models')
+    parser.add_argument('--output', help='results file (default <model_dir>/benchmarks/benchmark-<timestamp>.json)')
+    parser.add_argument('--baseline', help="results file to compare against, or 'latest' for the previous run")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument('--models', nargs='+', default=list(BENCHMARK_MODELS))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=list(BENCHMARK_BATCH_SIZES))
+    parser.add_argument('--time-limit', type=float, default=2.0, help='seconds spent timing each batch size')
+    parser.add_argument('--mmap', action='store_true', help='memory-map model arrays, as preloaded workers do')
+    args = parser.parse_args(argv)
+
+    output_dir = os.path.join(args.model_dir, 'benchmarks')
+    baseline_path = latest_results(output_dir) if args.baseline == 'latest' else args.baseline
+
+    results = run_benchmarks(args.model_dir, args.models, args.batch_sizes,
+                             time_limit=args.time_limit, mmap_mode='r' if args.mmap else None)
+
+    if baseline_path is not None:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        results['baseline'] = baseline_path
+        results['tolerance'] = args.tolerance
+        results['regressions'] = compare_results(results, baseline, args.tolerance)
+
+    output = args.output or os.path.join(
+        output_dir, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for name, result in results['models'].items():
+        print(f"{name}: load {result['load_seconds']:.3f}s, resident {result['resident_bytes'] / 1024 ** 2:.1f}MB, "
+              f"artifacts {result['artifact_bytes'] / 1024 ** 2:.1f}MB")
+        for batch_size, batch in result['batches'].items():
+            latency = batch['latency_ms']
+            print(f"  batch={batch_size:>6}  p50={latency['p50']:>9.3f}ms  p95={latency['p95']:>9.3f}ms  "
+                  f"p99={latency['p99']:>9.3f}ms  {batch['rows_per_sec']:>14,.0f} rows/sec")
+    print(f"Saved results to {output}")
+
+    for regression in results.get('regressions', []):
+        print(f"REGRESSION {regression['model']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']}")
+    return 1 if results.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    # python benchmark.py [model_dir] [--baseline latest]; exits 1 on a regression
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
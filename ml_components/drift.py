@@ -0,0 +1,152 @@
+import threading
+import numpy as np
+from typing import Dict, Any, List, Optional, Sequence
+from streaming_stats import RunningStats, FixedBinHistogram, population_stability_index
+
+# Quantile bins per feature in a reference profile
+DRIFT_BINS = 10
+# Conventional PSI bands: below MODERATE is stable, from SIGNIFICANT on the feature has shifted
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Rows buffered by a monitor before they are folded into its summaries
+DRIFT_BUFFER_ROWS = 256
+
+
+def profile_features(X: np.ndarray, columns: Sequence[str], bins: int = DRIFT_BINS) -> Dict[str, Dict[str, Any]]:
+    """Reference distribution of each feature: quantile bin edges, the share of rows per bin, mean and std"""
+    profile = {}
+    for i, column in enumerate(columns):
+        values = np.asarray(X[:, i], dtype=float)
+        values = values[np.isfinite(values)]
+        # Repeated quantiles (e.g. a constant feature) collapse into fewer bins
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        histogram = FixedBinHistogram(edges).update(values)
+        profile[column] = {
+            'edges': edges.tolist(),
+            'proportions': np.round(histogram.proportions(), 6).tolist(),
+            'mean': float(values.mean()),
+            'std': float(values.std())
+        }
+    return profile
+
+
+def drift_status(psi: Optional[float]) -> str:
+    if psi is None:
+        return 'unknown'
+    if psi < PSI_MODERATE:
+        return 'stable'
+    return 'moderate' if psi < PSI_SIGNIFICANT else 'significant'
+
+
+class FeatureDriftMonitor:
+    """Constant-memory summary of the feature rows a model scores, compared against its training data.
+
+    Each feature keeps Welford running statistics and a histogram over the
+    reference profile's bins, from which the population stability index (PSI)
+    is computed. Rows are copied into a small fixed buffer and folded in once
+    it fills, so observing a single quote is cheap. Without a reference
+    profile only the running statistics are kept.
+    """
+
+    def __init__(self, columns: Sequence[str], reference: Dict[str, Dict[str, Any]] = None,
+                 buffer_rows: int = DRIFT_BUFFER_ROWS):
+        self.columns = list(columns)
+        self.reference = reference
+        self.rows = 0
+        self.stats = [RunningStats() for _ in self.columns]
+        self.histograms = [
+            FixedBinHistogram(reference[column]['edges']) if reference and column in reference else None
+            for column in self.columns
+        ]
+        self._buffer = np.empty((max(1, buffer_rows), len(self.columns)))
+        self._buffered = 0
+        self._lock = threading.Lock()
+
+    def observe(self, rows: np.ndarray):
+        """Add feature rows (columns in the monitor's order)"""
+        rows = np.atleast_2d(rows)
+        with self._lock:
+            if self._buffered + len(rows) > len(self._buffer):
+                self._flush()
+            if len(rows) > len(self._buffer):
+                self._fold(rows)
+                return
+            self._buffer[self._buffered:self._buffered + len(rows)] = rows
+            self._buffered += len(rows)
+
+    def _flush(self):
+        if self._buffered:
+            self._fold(self._buffer[:self._buffered])
+            self._buffered = 0
+
+    def _fold(self, X: np.ndarray):
+        self.rows += len(X)
+        for i, (stats, histogram) in enumerate(zip(self.stats, self.histograms)):
+            stats.update(X[:, i])
+            if histogram is not None:
+                histogram.update(X[:, i])
+
+    def report(self) -> Dict[str, Any]:
+        """Per-feature statistics and PSI against the reference, with the overall drift status"""
+        with self._lock:
+            self._flush()
+            features = {}
+            for column, stats, histogram in zip(self.columns, self.stats, self.histograms):
+                entry = stats.to_dict()
+                entry['psi'] = None
+                if histogram is not None:
+                    reference = self.reference[column]
+                    if histogram.count:
+                        entry['psi'] = round(population_stability_index(reference['proportions'],
+                                                                        histogram.proportions()), 6)
+                    entry.update({
+                        'reference_mean': round(reference['mean'], 6),
+                        'reference_std': round(reference['std'], 6),
+                        'histogram': {
+                            'edges': reference['edges'],
+                            'counts': histogram.counts.tolist(),
+                            'reference_proportions': reference['proportions']
+                        }
+                    })
+                entry['status'] = drift_status(entry['psi'])
+                features[column] = entry
+
+        scores = [entry['psi'] for entry in features.values() if entry['psi'] is not None]
+        max_psi = max(scores) if scores else None
+        return {
+            'rows': self.rows,
+            'has_reference': self.reference is not None,
+            'max_psi': max_psi,
+            'status': drift_status(max_psi),
+            'drifted_features': [column for column, entry in features.items()
+                                 if entry['psi'] is not None and entry['psi'] >= PSI_SIGNIFICANT],
+            'features': features
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-serializable state; its size depends only on the columns and bins"""
+        with self._lock:
+            self._flush()
+            return {
+                'columns': self.columns,
+                'reference': self.reference,
+                'rows': self.rows,
+                'stats': [stats.to_state() for stats in self.stats],
+                'counts': [histogram.counts.tolist() if histogram is not None else None
+                           for histogram in self.histograms]
+            }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> 'FeatureDriftMonitor':
+        monitor = cls(state['columns'], state.get('reference'))
+        monitor.rows = state.get('rows', 0)
+        monitor.stats = [RunningStats.from_state(stats) for stats in state['stats']]
+        for histogram, counts in zip(monitor.histograms, state.get('counts', [])):
+            if histogram is not None and counts is not None:
+                histogram.counts[:] = counts
+        return monitor
+
+
+def feature_row(features: Dict[str, Any], columns: List[str]) -> np.ndarray:
+    """One feature row from a dict, in the given column order (missing features are NaN and skipped)"""
+    return np.array([features.get(column, np.nan) for column in columns], dtype=float)
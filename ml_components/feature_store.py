@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from typing import Dict, Any, Callable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Total size of cached matrices before the least recently used entries are evicted
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+class FeatureStore:
+    """On-disk cache of engineered feature matrices and targets.
+
+    Each entry is a directory named by a hash of its data source and feature
+    spec, holding ``X.npy``, ``y.npy`` and ``meta.json``. Entries are read back
+    memory-mapped. Reading an entry bumps the mtime of its ``meta.json``, and
+    once the store is over ``max_bytes`` the least recently used entries are
+    deleted. Because that state lives in the filesystem, several processes can
+    share one store.
+    """
+
+    def __init__(self, store_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    @staticmethod
+    def key(source: Dict[str, Any], feature_spec: Dict[str, Any]) -> str:
+        """Stable hash of a data source description and a feature spec"""
+        payload = json.dumps({'source': source, 'features': feature_spec}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.store_dir, key)
+
+    def get(self, key: str, mmap_mode: Optional[str] = 'r') -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """The cached (X, y) for a key, memory-mapped by default, or None"""
+        cached = self._load(key, mmap_mode)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def _load(self, key: str, mmap_mode: Optional[str]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        entry_dir = self._entry_dir(key)
+        try:
+            X = np.load(os.path.join(entry_dir, 'X.npy'), mmap_mode=mmap_mode)
+            y = np.load(os.path.join(entry_dir, 'y.npy'), mmap_mode=mmap_mode)
+            # Mark as recently used for eviction
+            os.utime(os.path.join(entry_dir, 'meta.json'))
+        except (OSError, ValueError):
+            return None
+        return X, y
+
+    def put(self, key: str, X: np.ndarray, y: np.ndarray, metadata: Dict[str, Any] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Store a matrix and target, evict to the size cap, and return the stored copies memory-mapped
+
+        Falls back to the in-memory arrays if the entry is gone by the time it
+        is read back, e.g. evicted or replaced by another process.
+        """
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f'{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}'
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        np.save(os.path.join(tmp_dir, 'X.npy'), np.asarray(X))
+        np.save(os.path.join(tmp_dir, 'y.npy'), np.asarray(y))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'key': key,
+                'rows': int(len(X)),
+                'columns': int(X.shape[1]) if X.ndim > 1 else 1,
+                'created_at': datetime.now().isoformat(),
+                'metadata': metadata or {}
+            }, f, indent=2)
+
+        # Publish the entry atomically; if another process got there first, keep theirs
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.evict(keep=key)
+        stored = self._load(key, 'r')
+        return stored if stored is not None else (X, y)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Tuple[np.ndarray, np.ndarray]],
+                       metadata: Dict[str, Any] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Cached (X, y) for a key, computing and storing it on a miss"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        X, y = compute()
+        logger.info(f"Computed feature matrix {key} ({len(X)} rows) in {time.perf_counter() - start:.2f}s")
+        return self.put(key, X, y, metadata)
+
+    def _entries(self):
+        """(key, bytes, last_used) for every complete entry"""
+        entries = []
+        for name in os.listdir(self.store_dir):
+            entry_dir = self._entry_dir(name)
+            meta_path = os.path.join(entry_dir, 'meta.json')
+            if '.tmp-' in name or not os.path.exists(meta_path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir))
+                entries.append((name, size, os.path.getmtime(meta_path)))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self, keep: str = None) -> int:
+        """Delete least recently used entries until the store fits in max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+
+        evicted = 0
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Open memory maps keep working on Linux after the files are unlinked
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+            evicted += 1
+
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+            logger.info(f"Evicted {evicted} feature matrices, store now {total / 1024 ** 2:.1f}MB")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; writes are then only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Manifest of trained models, their versions and artifacts, with a pinned champion.
+
+    The manifest lives in ``registry.json`` inside the model directory and is
+    read once; resolving the champion is a dictionary lookup rather than a scan
+    of the directory. The champion only changes through an explicit promote().
+    Training jobs, server workers and the API all write the manifest, so every
+    change holds an exclusive lock on ``registry.json.lock`` and re-reads the
+    manifest from disk before modifying it.
+    """
+
+    MANIFEST_FILE = 'registry.json'
+
+    def __init__(self, model_dir: str):
+        self.model_dir = model_dir
+        self.manifest_path = os.path.join(model_dir, self.MANIFEST_FILE)
+        self.lock_path = f'{self.manifest_path}.lock'
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Load the manifest, bootstrapping one from existing metadata files if needed"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            self._manifest_mtime = os.path.getmtime(self.manifest_path)
+            return manifest
+
+        manifest = {'champion': None, 'models': {}}
+        newest = None
+        for filename in sorted(os.listdir(self.model_dir)) if os.path.isdir(self.model_dir) else []:
+            if not filename.endswith('_metadata.json'):
+                continue
+            name = filename[:-len('_metadata.json')]
+            with open(os.path.join(self.model_dir, filename), 'r') as f:
+                metadata = json.load(f)
+            bundled = os.path.exists(os.path.join(self.model_dir, self._default_artifacts(name)['bundle']))
+            manifest['models'][name] = {
+                'version': 1,
+                'artifacts': self._default_artifacts(name) if bundled else self._legacy_artifacts(name),
+                'metrics': {},
+                'registered_at': metadata.get('training_date')
+            }
+            if newest is None or (metadata.get('training_date') or '') > newest[1]:
+                newest = (name, metadata.get('training_date') or '')
+
+        if newest is not None:
+            manifest['champion'] = {'name': newest[0], 'version': 1}
+            logger.info(f"Bootstrapped model registry from existing artifacts, champion: {newest[0]}")
+            self.manifest = manifest
+            with self._locked():
+                # Another process may have written a manifest meanwhile; keep theirs
+                if self.manifest is manifest:
+                    self._save()
+            return self.manifest
+
+        return manifest
+
+    def _default_artifacts(self, name: str) -> Dict[str, str]:
+        return {
+            'bundle': f'{name}.joblib',
+            'metadata': f'{name}_metadata.json'
+        }
+
+    def _legacy_artifacts(self, name: str) -> Dict[str, str]:
+        """Separate model/scaler/selector pickles written before single-file bundles"""
+        return {
+            'model': f'{name}.pkl',
+            'scaler': f'{name}_scaler.pkl',
+            'selector': f'{name}_selector.pkl',
+            'metadata': f'{name}_metadata.json'
+        }
+
+    def _save(self):
+        """Write the manifest atomically so readers never see a partial file"""
+        tmp_path = f'{self.manifest_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_mtime = os.path.getmtime(self.manifest_path)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the in-process and cross-process locks with the manifest freshly read from disk"""
+        with self._lock:
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    if os.path.exists(self.manifest_path):
+                        with open(self.manifest_path, 'r') as f:
+                            self.manifest = json.load(f)
+                        self._manifest_mtime = os.path.getmtime(self.manifest_path)
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def changed_on_disk(self) -> bool:
+        """Whether another process has rewritten the manifest since it was last read"""
+        try:
+            return os.path.getmtime(self.manifest_path) != self._manifest_mtime
+        except OSError:
+            return False
+
+    def refresh(self) -> bool:
+        """Re-read the manifest if another process changed it; returns True if it did"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.manifest_path)
+            except OSError:
+                return False
+            if mtime == self._manifest_mtime:
+                return False
+            with open(self.manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+            self._manifest_mtime = mtime
+            return True
+
+    def register(self, name: str, artifacts: Optional[Dict[str, str]] = None,
+                 metrics: Optional[Dict[str, float]] = None) -> int:
+        """Record a newly trained model and return its version"""
+        with self._locked():
+            previous = self.manifest['models'].get(name, {})
+            version = previous.get('version', 0) + 1
+            self.manifest['models'][name] = {
+                'version': version,
+                'artifacts': artifacts or self._default_artifacts(name),
+                'metrics': metrics or {},
+                'registered_at': datetime.now().isoformat()
+            }
+            self._save()
+            return version
+
+    def promote(self, name: str) -> Dict[str, Any]:
+        """Make a registered model the champion served for model_type='best'"""
+        with self._locked():
+            entry = self.manifest['models'].get(name)
+            if entry is None:
+                raise ValueError(f"Model '{name}' is not registered")
+            self.manifest['champion'] = {
+                'name': name,
+                'version': entry['version'],
+                'promoted_at': datetime.now().isoformat()
+            }
+            self._save()
+            return dict(self.manifest['champion'])
+
+    @property
+    def champion(self) -> Optional[str]:
+        champion = self.manifest.get('champion')
+        return champion['name'] if champion else None
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.manifest['models'].get(name)
+
+    def artifact_path(self, name: str, artifact: str) -> Optional[str]:
+        """Path of one of a model's artifacts, or None if it was saved without it"""
+        entry = self.get(name)
+        artifacts = entry['artifacts'] if entry else self._default_artifacts(name)
+        filename = artifacts.get(artifact)
+        return os.path.join(self.model_dir, filename) if filename else None
@@ -1,20 +1,72 @@
 import numpy as np
+import sklearn
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
-import json
+from datetime import datetime
+import joblib
+import os
+
+# Bump when the layout of the saved artifact changes
+ARTIFACT_FORMAT_VERSION = 1
+FEATURES = ["complexity", "location_factor", "material_cost"]
 
 class MLPricingModel:
     def __init__(self, model_file='pricing_model.pkl'):
         self.model_file = model_file
         self.model = LinearRegression()
+        self.version = 0  # Bumped whenever the in-memory model changes
+        self.model_version = 0  # Persisted with the artifact, bumped on every training run
+        self.trained_at = None
         self.load_or_train_model()
 
     def load_or_train_model(self):
-        # For now, train a simple model with mock data
-        # In a real application, this would load from a file or database
+        # Cold start goes straight to the saved model; training only happens
+        # when there is no compatible artifact yet (first boot, format change)
+        if self.load_model():
+            return
+        print(f"No compatible model artifact at {self.model_file}, training a new one")
         self.train_model()
 
+    def load_model(self):
+        if not os.path.exists(self.model_file):
+            return False
+
+        try:
+            artifact = joblib.load(self.model_file)
+        except Exception as e:
+            print(f"Failed to load model artifact {self.model_file}: {e}")
+            return False
+
+        if not isinstance(artifact, dict) or artifact.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            print(f"Model artifact {self.model_file} has an unsupported format")
+            return False
+        if artifact.get("sklearn_version") != sklearn.__version__:
+            print(f"Model artifact {self.model_file} was saved with scikit-learn {artifact.get('sklearn_version')}")
+            return False
+
+        self.model = artifact["model"]
+        self.model_version = artifact["model_version"]
+        self.trained_at = artifact["trained_at"]
+        self.version += 1
+        return True
+
+    def save_model(self, mse=None):
+        artifact = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "model_version": self.model_version,
+            "sklearn_version": sklearn.__version__,
+            "trained_at": self.trained_at,
+            "features": FEATURES,
+            "mse": mse,
+            "model": self.model
+        }
+
+        # Write to a temporary file first so readers never see a partial artifact
+        tmp_file = f"{self.model_file}.tmp"
+        joblib.dump(artifact, tmp_file)
+        os.replace(tmp_file, self.model_file)
+
     def train_model(self):
         # Mock historical data: [complexity, location_factor, material_cost] -> price
         X = np.array([
@@ -25,13 +77,20 @@ class MLPricingModel:
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-        self.model.fit(X_train, y_train)
+        model = LinearRegression()
+        model.fit(X_train, y_train)
 
         # Calculate accuracy
-        predictions = self.model.predict(X_test)
+        predictions = model.predict(X_test)
         mse = mean_squared_error(y_test, predictions)
         print(f"Model trained with MSE: {mse}")
 
+        self.model = model
+        self.model_version += 1
+        self.trained_at = datetime.now().isoformat()
+        self.version += 1
+        self.save_model(mse)
+
     def predict_price(self, complexity, location_factor, material_cost):
         # Normalize inputs
         features = np.array([[complexity, location_factor, material_cost]])
@@ -48,10 +107,34 @@ class MLPricingModel:
             "high": round(high, 2)
         }
 
+    def predict_prices(self, complexity, location_factor, material_cost):
+        # Same as predict_price, but each argument is an array covering a batch of jobs
+        features = np.column_stack(np.broadcast_arrays(
+            np.asarray(complexity, dtype=float),
+            np.asarray(location_factor, dtype=float),
+            np.asarray(material_cost, dtype=float)
+        ))
+        predicted_prices = self.model.predict(features)
+
+        return {
+            "low": np.round(predicted_prices * 0.9, 2),
+            "median": np.round(predicted_prices, 2),
+            "high": np.round(predicted_prices * 1.1, 2)
+        }
+
     def get_model_info(self):
         return {
             "model_type": "LinearRegression",
-            "features": ["complexity", "location_factor", "material_cost"],
+            "model_version": self.model_version,
+            "trained_at": self.trained_at,
+            "features": FEATURES,
             "coefficients": self.model.coef_.tolist(),
             "intercept": self.model.intercept_
         }
+
+if __name__ == '__main__':
+    # Explicitly retrain and persist the model: python pricing_model.py [model_file]
+    import sys
+    model = MLPricingModel(*sys.argv[1:2])
+    model.train_model()
+    print(f"Saved model version {model.model_version} to {model.model_file}")
@@ -0,0 +1,272 @@
+import multiprocessing
+import os
+import queue
+import random
+import time
+from collections import Counter
+import numpy as np
+from typing import Dict, Any, Optional
+import logging
+from streaming_stats import RunningStats
+
+logger = logging.getLogger(__name__)
+
+# Offers (one per quote or batch request) waiting to be scored; beyond this new ones are dropped
+SHADOW_MAX_QUEUE = 1000
+# Relative price difference above which the challenger counts as disagreeing
+DISAGREEMENT_THRESHOLD = 0.1
+# Seconds between statistics snapshots sent back by the scoring process
+SNAPSHOT_INTERVAL = 0.5
+
+
+class ShadowScores:
+    """Streaming disagreement and error statistics of a challenger against the champion"""
+
+    def __init__(self, disagreement_threshold: float = DISAGREEMENT_THRESHOLD):
+        self.disagreement_threshold = disagreement_threshold
+        self.rows_scored = 0
+        self.disagreements = 0
+        self.champions = Counter()
+        self.relative_difference = RunningStats()
+        self.absolute_relative_difference = RunningStats()
+        self.champion_error = RunningStats()
+        self.champion_squared_error = RunningStats()
+        self.challenger_error = RunningStats()
+        self.challenger_squared_error = RunningStats()
+
+    def update(self, champion_prices: np.ndarray, challenger_prices: np.ndarray, champion: str,
+               actual_prices: Optional[np.ndarray] = None):
+        relative = (challenger_prices - champion_prices) / np.maximum(np.abs(champion_prices), 1e-9)
+        self.rows_scored += len(relative)
+        self.champions[champion] += len(relative)
+        self.relative_difference.update(relative)
+        self.absolute_relative_difference.update(np.abs(relative))
+        self.disagreements += int((np.abs(relative) > self.disagreement_threshold).sum())
+
+        if actual_prices is not None:
+            champion_errors = champion_prices - actual_prices
+            challenger_errors = challenger_prices - actual_prices
+            self.champion_error.update(np.abs(champion_errors))
+            self.champion_squared_error.update(champion_errors ** 2)
+            self.challenger_error.update(np.abs(challenger_errors))
+            self.challenger_squared_error.update(challenger_errors ** 2)
+
+    @staticmethod
+    def _error_summary(absolute: RunningStats, squared: RunningStats) -> Dict[str, Optional[float]]:
+        return {
+            'mae': round(absolute.mean, 4) if absolute.count else None,
+            'rmse': round(squared.mean ** 0.5, 4) if squared.count else None
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rows_scored': self.rows_scored,
+            'champions': dict(self.champions),
+            'disagreement': {
+                'threshold': self.disagreement_threshold,
+                'rate': round(self.disagreements / self.rows_scored, 4) if self.rows_scored else None,
+                'relative_difference': self.relative_difference.to_dict(),
+                'absolute_relative_difference': self.absolute_relative_difference.to_dict()
+            },
+            'error': {
+                'labelled_rows': self.champion_error.count,
+                'champion': self._error_summary(self.champion_error, self.champion_squared_error),
+                'challenger': self._error_summary(self.challenger_error, self.challenger_squared_error)
+            }
+        }
+
+
+def _shadow_worker(model_dir: str, challenger: str, offers, snapshots, max_batch_rows: int,
+                   disagreement_threshold: float, niceness: int, mmap_mode: Optional[str]):
+    """Entry point of the scoring process: score queued offers with the challenger until told to stop"""
+    # Only use CPU time the serving processes leave idle: SCHED_IDLE on Linux, a nice value elsewhere
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError):
+        if niceness and hasattr(os, 'nice'):
+            os.nice(niceness)
+
+    from advanced_pricing import AdvancedMLPricingModel
+
+    scores = ShadowScores(disagreement_threshold)
+    errors, last_error, last_snapshot = 0, None, 0.0
+    try:
+        model = AdvancedMLPricingModel(model_dir)
+        model.load_model(challenger, mmap_mode=mmap_mode)
+    except Exception as e:
+        snapshots.put({'errors': 1, 'last_error': f'Could not load {challenger}: {e}', 'scores': scores.to_dict()})
+        return
+
+    while True:
+        batch = [offers.get()]
+        rows = len(batch[0][0]) if batch[0] is not None else 0
+        while batch[-1] is not None and rows < max_batch_rows:
+            try:
+                batch.append(offers.get_nowait())
+            except queue.Empty:
+                break
+            if batch[-1] is not None:
+                rows += len(batch[-1][0])
+
+        stop = batch[-1] is None
+        batch = [offer for offer in batch if offer is not None]
+        try:
+            if model.registry.changed_on_disk():
+                # A retrain or promotion elsewhere; score against the models now on disk
+                model = AdvancedMLPricingModel(model_dir)
+                model.load_model(challenger, mmap_mode=mmap_mode)
+            if batch:
+                _score_batch(model, challenger, batch, scores)
+        except Exception as e:
+            errors += 1
+            last_error = str(e)
+
+        now = time.monotonic()
+        # Report at least every SNAPSHOT_INTERVAL, and whenever the queue runs dry
+        if stop or now - last_snapshot >= SNAPSHOT_INTERVAL or offers.empty():
+            snapshots.put({'errors': errors, 'last_error': last_error, 'scores': scores.to_dict()})
+            last_snapshot = now
+        if stop:
+            return
+
+
+def _score_batch(model, challenger: str, batch, scores: ShadowScores):
+    X = np.vstack([offer[0] for offer in batch])
+    challenger_prices = model.predict_prices(X, challenger)['predicted_price']
+
+    start = 0
+    for rows, champion_prices, champion, actual_prices in batch:
+        stop = start + len(rows)
+        if champion_prices is None:
+            predictions = model.predict_prices(rows, 'best')
+            champion_prices, champion = predictions['predicted_price'], predictions['model_used']
+        scores.update(
+            np.broadcast_to(np.asarray(champion_prices, dtype=float), len(rows)),
+            challenger_prices[start:stop], champion,
+            None if actual_prices is None else np.asarray(actual_prices, dtype=float).reshape(len(rows))
+        )
+        start = stop
+
+
+class ShadowEvaluator:
+    """Scores a challenger model on the traffic the champion serves, off the request path.
+
+    The champion keeps answering requests; ``offer`` only puts the request's
+    feature rows and the champion's prices on a bounded queue (dropping and
+    counting them when it is full). A separate, lower-priority process loads
+    the challenger from ``model_dir``, scores the queued rows in batches and
+    folds the results into streaming disagreement statistics, so shadowing
+    never competes with request threads for the GIL. Rows offered with actual
+    prices also update each model's error statistics.
+    """
+
+    def __init__(self, model_dir: str, challenger: str, sample_rate: float = 1.0,
+                 max_queue: int = SHADOW_MAX_QUEUE, max_batch_rows: int = 256,
+                 disagreement_threshold: float = DISAGREEMENT_THRESHOLD, niceness: int = 19,
+                 mmap_mode: Optional[str] = 'r', start_method: str = 'spawn'):
+        self.model_dir = model_dir
+        self.challenger = challenger
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.max_batch_rows = max_batch_rows
+        self.disagreement_threshold = disagreement_threshold
+        self.niceness = niceness
+        self.mmap_mode = mmap_mode
+        self.start_method = start_method
+        self.started_at = time.time()
+        self.rows_offered = 0
+        self.rows_dropped = 0
+        self._stopped = False
+        self._process = None
+        self._snapshot = {'errors': 0, 'last_error': None, 'scores': ShadowScores(disagreement_threshold).to_dict()}
+        self._start_process()
+
+    def _start_process(self):
+        context = multiprocessing.get_context(self.start_method)
+        self._pid = os.getpid()
+        self._offers = context.Queue(self.max_queue)
+        self._snapshots = context.Queue()
+        self._process = context.Process(
+            target=_shadow_worker,
+            args=(self.model_dir, self.challenger, self._offers, self._snapshots, self.max_batch_rows,
+                  self.disagreement_threshold, self.niceness, self.mmap_mode),
+            name=f'shadow-{self.challenger}', daemon=True
+        )
+        self._process.start()
+
+    def offer(self, rows: np.ndarray, champion_prices: np.ndarray = None, champion: str = None,
+              actual_prices: np.ndarray = None) -> bool:
+        """Queue rows the champion has priced (or, without champion_prices, will be priced by the scorer)"""
+        if self._stopped or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return False
+        if self._pid != os.getpid():
+            # A forked worker scores in its own process
+            self._start_process()
+
+        rows = np.atleast_2d(rows)
+        self.rows_offered += len(rows)
+        try:
+            self._offers.put_nowait((rows, champion_prices, champion, actual_prices))
+        except queue.Full:
+            self.rows_dropped += len(rows)
+            return False
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """Stop scoring after the rows already queued, waiting up to timeout for the final statistics"""
+        if self._stopped:
+            return
+        self._stopped = True
+        if self._pid != os.getpid():
+            return
+        try:
+            self._offers.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._drain_snapshots()
+
+    def _drain_snapshots(self):
+        while True:
+            try:
+                self._snapshot = self._snapshots.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        owned = self._pid == os.getpid()
+        if owned:
+            self._drain_snapshots()
+        errors, last_error = self._snapshot['errors'], self._snapshot['last_error']
+
+        if self._stopped:
+            state = 'stopped'
+        elif not owned:
+            # Copied into a forked worker, which starts its own scorer on the first offer
+            state = 'starting'
+        elif self._process.is_alive():
+            state = 'running'
+        else:
+            # The scorer exited without being stopped; that is a failure, not an idle shadow
+            state = 'failed'
+            if self._process.exitcode != 0 or last_error is None:
+                errors += 1
+                last_error = f'Shadow process exited with code {self._process.exitcode}'
+
+        stats = {
+            'challenger': self.challenger,
+            'state': state,
+            'running': state == 'running',
+            'started_at': self.started_at,
+            'sample_rate': self.sample_rate,
+            'max_queue': self.max_queue,
+            'rows_offered': self.rows_offered,
+            'rows_dropped': self.rows_dropped,
+            'errors': errors,
+            'last_error': last_error
+        }
+        stats.update(self._snapshot['scores'])
+        return stats
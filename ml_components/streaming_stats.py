@@ -0,0 +1,99 @@
+import numpy as np
+from typing import Dict, Any, Sequence
+
+
+class RunningStats:
+    """Streaming count, mean, variance, min and max in constant memory.
+
+    Batches are folded in with the parallel form of Welford's algorithm, so
+    updating with a whole array is as accurate as updating one value at a time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def update(self, values) -> 'RunningStats':
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return self
+
+        n = len(values)
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        total = self.count + n
+        delta = batch_mean - self.mean
+
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    def to_state(self) -> Dict[str, float]:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, float]) -> 'RunningStats':
+        stats = cls()
+        if state.get('count'):
+            stats.count, stats.mean, stats.m2 = int(state['count']), float(state['mean']), float(state['m2'])
+            stats.min, stats.max = float(state['min']), float(state['max'])
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        if not self.count:
+            return {'count': 0, 'mean': None, 'std': None, 'min': None, 'max': None}
+        return {
+            'count': self.count,
+            'mean': round(self.mean, 6),
+            'std': round(self.std, 6),
+            'min': round(self.min, 6),
+            'max': round(self.max, 6)
+        }
+
+
+class FixedBinHistogram:
+    """Counts of values in fixed bins: below the first edge, between each pair of edges, above the last"""
+
+    def __init__(self, edges: Sequence[float], counts: Sequence[int] = None):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        if counts is not None:
+            self.counts[:] = counts
+
+    def update(self, values) -> 'FixedBinHistogram':
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        # Bin i holds edges[i-1] < value <= edges[i]
+        self.counts += np.bincount(np.searchsorted(self.edges, values, side='left'), minlength=len(self.counts))
+        return self
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def proportions(self) -> np.ndarray:
+        total = self.counts.sum()
+        return self.counts / total if total else np.zeros(len(self.counts))
+
+
+def population_stability_index(expected: Sequence[float], actual: Sequence[float], floor: float = 1e-4) -> float:
+    """PSI between two binned distributions given as proportions; empty bins are floored to keep it finite"""
+    expected = np.maximum(np.asarray(expected, dtype=float), floor)
+    actual = np.maximum(np.asarray(actual, dtype=float), floor)
+    return float(((actual - expected) * np.log(actual / expected)).sum())
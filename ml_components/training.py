@@ -0,0 +1,292 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+from sklearn.metrics import mean_squared_error, r2_score
+from typing import Dict, Any, List, Tuple, Callable
+import logging
+from tree_inference import compile_ensemble
+
+logger = logging.getLogger(__name__)
+
+# Training data shared by every task in a worker process, set once by the pool initializer
+_worker_data = {}
+
+
+def _init_worker(data: Dict[str, np.ndarray]):
+    _worker_data.update(data)
+
+
+def _run_task(task: Tuple[str, str, int, Any, int]) -> Dict[str, Any]:
+    """Fit one estimator clone, either on the training split ('fit') or on one CV fold ('cv')"""
+    name, kind, fold, estimator, n_jobs = task
+    params = estimator.get_params()
+    # Spare cores go to estimators that parallelise internally, unless they set n_jobs themselves
+    borrow_cores = n_jobs > 1 and 'n_jobs' in params and params['n_jobs'] is None
+    if borrow_cores:
+        estimator.set_params(n_jobs=n_jobs)
+
+    started_at = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    data = _worker_data
+    if kind == 'fit':
+        estimator.fit(data['X_train'], data['y_train'])
+        y_pred = estimator.predict(data['X_test'])
+        mse = mean_squared_error(data['y_test'], y_pred)
+        result = {
+            'model': estimator,
+            'train_r2': estimator.score(data['X_train'], data['y_train']),
+            'test_r2': r2_score(data['y_test'], y_pred),
+            'rmse': np.sqrt(mse),
+            'r2': r2_score(data['y_test'], y_pred)
+        }
+    else:
+        train_idx, test_idx = data['folds'][fold]
+        estimator.fit(data['X'][train_idx], data['y'][train_idx])
+        result = {'cv_r2': estimator.score(data['X'][test_idx], data['y'][test_idx])}
+
+    if borrow_cores:
+        estimator.set_params(n_jobs=None)
+
+    result.update({
+        'name': name,
+        'kind': kind,
+        'started_at': started_at,
+        'finished_at': time.time(),
+        'wall_seconds': time.perf_counter() - wall_start,
+        'cpu_seconds': time.process_time() - cpu_start
+    })
+    return result
+
+
+class TrainingOrchestrator:
+    """Fits candidate models and their cross-validation folds in a process pool.
+
+    Every (candidate, fit-or-fold) pair is an independent task. Tasks are spread
+    over at most ``n_cores`` worker processes, and when there are fewer tasks
+    than cores the spare cores go to estimators that accept ``n_jobs``.
+    """
+
+    def __init__(self, n_cores: int = None, start_method: str = 'spawn'):
+        self.n_cores = max(1, n_cores or os.cpu_count() or 1)
+        # 'spawn' avoids forking a multi-threaded web server
+        self.start_method = start_method
+
+    def fit_candidates(self, candidates: Dict[str, Any], X_train: np.ndarray, y_train: np.ndarray,
+                       X_test: np.ndarray, y_test: np.ndarray, X: np.ndarray, y: np.ndarray,
+                       cv: int = 5, progress: Callable[[int, int], None] = None) -> Dict[str, Dict[str, Any]]:
+        """Fit every candidate on the training split and score it with k-fold CV on the full data
+
+        progress, if given, is called with (tasks done, total tasks) as tasks finish.
+        """
+
+        data = {
+            'X_train': X_train, 'y_train': y_train,
+            'X_test': X_test, 'y_test': y_test,
+            'X': X, 'y': y,
+            'folds': list(KFold(n_splits=cv).split(X))
+        }
+
+        tasks = [(name, 'fit', -1, clone(estimator)) for name, estimator in candidates.items()]
+        tasks += [(name, 'cv', fold, clone(estimator))
+                  for name, estimator in candidates.items() for fold in range(cv)]
+
+        workers = min(self.n_cores, len(tasks))
+        n_jobs = max(1, self.n_cores // workers)
+        tasks = [task + (n_jobs,) for task in tasks]
+
+        wall_start = time.perf_counter()
+        if workers == 1:
+            _init_worker(data)
+            try:
+                outputs = []
+                for task in tasks:
+                    outputs.append(_run_task(task))
+                    if progress is not None:
+                        progress(len(outputs), len(tasks))
+            finally:
+                _worker_data.clear()
+        else:
+            context = multiprocessing.get_context(self.start_method)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(data,)) as pool:
+                outputs = []
+                for future in as_completed([pool.submit(_run_task, task) for task in tasks]):
+                    outputs.append(future.result())
+                    if progress is not None:
+                        progress(len(outputs), len(tasks))
+        total_wall = time.perf_counter() - wall_start
+
+        results = self._collect(candidates, outputs)
+        total_cpu = sum(r['cpu_seconds'] for r in results.values())
+        logger.info(f"Trained {len(candidates)} candidates x {cv} folds on {workers} workers "
+                    f"(n_jobs={n_jobs}): wall={total_wall:.1f}s, cpu={total_cpu:.1f}s")
+
+        return results
+
+    def _collect(self, candidates: Dict[str, Any], outputs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Merge the fit and fold outputs of each candidate into one result with timings"""
+
+        results = {}
+        for name in candidates:
+            runs = [o for o in outputs if o['name'] == name]
+            fit = next(o for o in runs if o['kind'] == 'fit')
+            cv_scores = np.array([o['cv_r2'] for o in runs if o['kind'] == 'cv'])
+
+            # Wall time is the span the candidate's tasks occupied; CPU time is summed across processes
+            wall = max(o['finished_at'] for o in runs) - min(o['started_at'] for o in runs)
+            cpu = sum(o['cpu_seconds'] for o in runs)
+
+            results[name] = {
+                'model': fit['model'],
+                'train_r2': fit['train_r2'],
+                'test_r2': fit['test_r2'],
+                'cv_r2_mean': cv_scores.mean(),
+                'cv_r2_std': cv_scores.std(),
+                'rmse': fit['rmse'],
+                'r2': fit['r2'],
+                'wall_seconds': round(wall, 3),
+                'cpu_seconds': round(cpu, 3),
+                'task_seconds': round(sum(o['wall_seconds'] for o in runs), 3),
+                'parallel_speedup': round(cpu / wall, 2) if wall > 0 else None
+            }
+
+        return results
+
+
+def _run_trial(task: Tuple[int, Any, int, int]) -> Dict[str, Any]:
+    """Fit one search candidate on the first n_rows of the shuffled training data and score it"""
+    trial_id, estimator, n_rows, latency_repeats = task
+    data = _worker_data
+
+    start = time.perf_counter()
+    rows = data['order'][:n_rows]
+    estimator.fit(data['X_train'][rows], data['y_train'][rows])
+    fit_seconds = time.perf_counter() - start
+
+    r2 = r2_score(data['y_val'], estimator.predict(data['X_val']))
+
+    # Per-row latency on the path a single quote is served by
+    compiled = compile_ensemble(estimator)
+    predict = compiled.predict if compiled is not None else estimator.predict
+    row = data['X_val'][:1]
+    timings = []
+    for _ in range(latency_repeats):
+        t = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - t)
+
+    return {
+        'trial': trial_id,
+        'rows': n_rows,
+        'r2': float(r2),
+        'latency_ms': float(np.median(timings) * 1000),
+        'fit_seconds': round(fit_seconds, 3)
+    }
+
+
+class SuccessiveHalvingSearch:
+    """Successive halving over candidate estimators under a wall-clock budget.
+
+    Every rung fits the surviving candidates on a larger share of the training
+    rows (multiplied by ``eta`` each rung, ending at all of them), in parallel
+    across ``n_cores`` processes, and keeps the best 1/eta. Candidates are
+    ranked by held-out R² minus ``latency_weight`` per millisecond of single-row
+    prediction latency; ones slower than ``max_latency_ms`` are dropped.
+    Work still running when the budget runs out is abandoned and the best
+    candidate of the last completed rung wins.
+    """
+
+    def __init__(self, time_budget: float, n_cores: int = None, eta: int = 3,
+                 latency_weight: float = 0.01, max_latency_ms: float = 5.0,
+                 start_method: str = 'spawn', latency_repeats: int = 25):
+        self.time_budget = time_budget
+        self.n_cores = max(1, n_cores or os.cpu_count() or 1)
+        self.eta = eta
+        self.latency_weight = latency_weight
+        self.max_latency_ms = max_latency_ms
+        self.start_method = start_method
+        self.latency_repeats = latency_repeats
+
+    def score(self, trial: Dict[str, Any]) -> float:
+        if trial['latency_ms'] > self.max_latency_ms:
+            return float('-inf')
+        return trial['r2'] - self.latency_weight * trial['latency_ms']
+
+    def run(self, candidates: List[Any], X_train: np.ndarray, y_train: np.ndarray,
+            X_val: np.ndarray, y_val: np.ndarray, random_state: int = 42,
+            progress: Callable[[float, str], None] = None) -> Dict[str, Any]:
+        """Search the candidates; returns the winner's index, every trial and the rungs completed"""
+
+        deadline = time.perf_counter() + self.time_budget
+        n_rungs = max(1, int(np.ceil(np.log(len(candidates)) / np.log(self.eta))) + 1)
+        min_rows = max(50, int(len(X_train) / self.eta ** (n_rungs - 1)))
+        data = {
+            'X_train': X_train, 'y_train': y_train, 'X_val': X_val, 'y_val': y_val,
+            'order': np.random.default_rng(random_state).permutation(len(X_train))
+        }
+
+        survivors = list(range(len(candidates)))
+        trials, completed = [], []
+        context = multiprocessing.get_context(self.start_method)
+        pool = context.Pool(min(self.n_cores, len(candidates)), initializer=_init_worker, initargs=(data,))
+
+        try:
+            for rung in range(n_rungs):
+                n_rows = min(len(X_train), min_rows * self.eta ** rung)
+                pending = [
+                    pool.apply_async(_run_trial, ((i, clone(candidates[i]), n_rows, self.latency_repeats),))
+                    for i in survivors
+                ]
+
+                rung_trials = []
+                for result in pending:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        rung_trials.append(result.get(timeout=remaining))
+                    except multiprocessing.TimeoutError:
+                        break
+
+                if len(rung_trials) < len(pending):
+                    logger.info(f"Search budget of {self.time_budget}s ran out during rung {rung} ({n_rows} rows)")
+                    break
+
+                for trial in rung_trials:
+                    trial.update({'rung': rung, 'score': self.score(trial)})
+                trials.extend(rung_trials)
+                completed = sorted(rung_trials, key=lambda t: t['score'], reverse=True)
+                if progress is not None:
+                    progress((rung + 1) / n_rungs, f'rung {rung + 1}/{n_rungs}')
+
+                keep = max(1, len(survivors) // self.eta)
+                survivors = [t['trial'] for t in completed[:keep] if t['score'] > float('-inf')]
+                if not survivors or rung == n_rungs - 1 or n_rows == len(X_train):
+                    break
+        finally:
+            # Abandon anything still running once the budget is spent
+            pool.terminate()
+            pool.join()
+
+        if not completed:
+            raise RuntimeError(f"No search rung finished within {self.time_budget}s")
+        if completed[0]['score'] == float('-inf'):
+            raise RuntimeError(f"No candidate predicts a row within {self.max_latency_ms}ms")
+
+        winner = completed[0]
+        logger.info(f"Search finished {len(trials)} trials; winner #{winner['trial']} "
+                    f"R²={winner['r2']:.3f}, {winner['latency_ms']:.3f}ms/row on {winner['rows']} rows")
+
+        return {
+            'winner': winner['trial'],
+            'winner_trial': winner,
+            'trials': trials,
+            'rungs_completed': max(t['rung'] for t in trials) + 1,
+            'rungs_planned': n_rungs
+        }
@@ -0,0 +1,148 @@
+import numpy as np
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from typing import Dict, Any, Optional
+
+# Rows traversed per step; bounds the (rows x trees) index arrays for large batches
+PREDICT_CHUNK_ROWS = 8192
+
+
+class CompiledTreeEnsemble:
+    """A tree ensemble flattened into contiguous node arrays for vectorized inference.
+
+    All trees share one set of arrays (feature, threshold, left, right, value);
+    ``roots`` holds each tree's first node. Leaves point back at themselves, so
+    every row in every tree can take exactly ``max_depth`` branch-free steps.
+    The prediction is ``bias + scale * sum(leaf values)`` (scale is 1/n_trees
+    for a forest and the learning rate for gradient boosting).
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, n_features: int,
+                 scale: float, bias: float):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.scale = float(scale)
+        self.bias = float(bias)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict for a 2D feature matrix, matching the sklearn estimator it was compiled from"""
+        return self.bias + self.scale * self.predict_per_tree(X).sum(axis=1)
+
+    def predict_per_tree(self, X: np.ndarray) -> np.ndarray:
+        """Leaf value reached in every tree, as an (n_rows, n_trees) matrix"""
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+
+        out = np.empty((len(X), self.n_trees), dtype=np.float64)
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            chunk = X[start:start + PREDICT_CHUNK_ROWS]
+            out[start:start + len(chunk)] = self._leaf_values(chunk)
+        return out
+
+    def _leaf_values(self, X: np.ndarray) -> np.ndarray:
+        flat = X.ravel()
+        row_offsets = (np.arange(len(X), dtype=np.intp) * self.n_features)[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+
+        for _ in range(self.max_depth):
+            go_left = flat[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes]
+
+    def to_arrays(self) -> Dict[str, Any]:
+        """Export the node arrays and scalars, e.g. to store them alongside the model"""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        arrays.update({
+            'max_depth': self.max_depth,
+            'n_features': self.n_features,
+            'scale': self.scale,
+            'bias': self.bias
+        })
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Any]) -> 'CompiledTreeEnsemble':
+        return cls(**arrays)
+
+
+def compile_ensemble(model) -> Optional[CompiledTreeEnsemble]:
+    """Flatten a fitted RandomForestRegressor or GradientBoostingRegressor, or None for other models"""
+
+    if isinstance(model, RandomForestRegressor):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        scale, bias = 1.0 / len(trees), 0.0
+    elif isinstance(model, GradientBoostingRegressor):
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        scale = model.learning_rate
+        if isinstance(model.init_, str) and model.init_ == 'zero':
+            bias = 0.0
+        elif isinstance(model.init_, DummyRegressor):
+            bias = float(np.ravel(model.init_.constant_)[0])
+        else:
+            return None
+    else:
+        return None
+
+    if getattr(trees[0], 'n_outputs', 1) != 1:
+        return None
+
+    counts = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    n_nodes = int(counts.sum())
+
+    feature = np.empty(n_nodes, dtype=np.intp)
+    threshold = np.empty(n_nodes, dtype=np.float64)
+    left = np.empty(n_nodes, dtype=np.intp)
+    right = np.empty(n_nodes, dtype=np.intp)
+    value = np.empty(n_nodes, dtype=np.float64)
+
+    for tree, offset, count in zip(trees, offsets.tolist(), counts.tolist()):
+        nodes = slice(offset, offset + count)
+        own = np.arange(offset, offset + count)
+        is_leaf = tree.children_left == -1
+
+        # Leaves loop back to themselves: feature 0 is always <= +inf, so they stay put
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+        left[nodes] = np.where(is_leaf, own, tree.children_left + offset)
+        right[nodes] = np.where(is_leaf, own, tree.children_right + offset)
+        value[nodes] = tree.value[:, 0, 0]
+
+    compiled = CompiledTreeEnsemble(
+        feature=feature, threshold=threshold, left=left, right=right, value=value,
+        roots=offsets.astype(np.intp), max_depth=max(tree.max_depth for tree in trees),
+        n_features=model.n_features_in_, scale=scale, bias=bias
+    )
+    for name in CompiledTreeEnsemble.ARRAYS:
+        getattr(compiled, name).flags.writeable = False
+
+    return compiled
+
+
+def forest_tree_predictions(model: RandomForestRegressor, X: np.ndarray) -> np.ndarray:
+    """Every tree's prediction as an (n_rows, n_trees) matrix, skipping per-tree input validation"""
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    out = np.empty((len(X), len(model.estimators_)), dtype=np.float64)
+    for i, estimator in enumerate(model.estimators_):
+        out[:, i] = estimator.tree_.predict(X).reshape(len(X), -1)[:, 0]
+    return out